@@ -0,0 +1,35 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+async def retry_api_call(call: Callable[[], Awaitable[T]], max_retries: int = 5, backoff: float = 1.0,
+                         action: str = "llamar a la API", on_retry: Optional[Callable[[], None]] = None) -> T:
+    """Ejecuta ``call()`` reintentando ante un 429 o un error 5xx de Discord.
+
+    Se espera el ``retry_after`` indicado o, si no lo hay, un retroceso
+    exponencial (``backoff * 2 ** intento``). Los demás errores, y el último
+    si se agotan los ``max_retries`` intentos, se propagan a quien llama.
+    ``call`` se repite entera, así que no debe tener efectos que no puedan
+    repetirse.
+    """
+    for attempt in range(max_retries):
+        try:
+            return await call()
+        except (discord.RateLimited, discord.HTTPException) as e:
+            if isinstance(e, discord.HTTPException) and e.status != 429 and e.status < 500:
+                raise
+            if attempt + 1 >= max_retries:
+                raise
+            delay = getattr(e, "retry_after", None) or backoff * 2 ** attempt
+        logger.warning(f"Límite de la API al {action}; reintentando en {delay:.1f}s")
+        if on_retry is not None:
+            on_retry()
+        await asyncio.sleep(delay)
+    raise ValueError("max_retries debe ser al menos 1")
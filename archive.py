@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import config
+from data_manager import _fsync_dir, load_data, store
+from ticket_system import is_open
+from virtual_shop import virtual_shop
+
+# Carpeta de los archivos fríos, una subcarpeta por tipo y un .jsonl.gz por día
+ARCHIVE_DIR = getattr(config, "ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(config.DATA_FILE)), "archive"))
+# Días que un ticket cerrado o una compra inactiva siguen en el estado antes de archivarse
+ARCHIVE_TICKETS_AFTER_DAYS = getattr(config, "ARCHIVE_TICKETS_AFTER_DAYS", 30)
+ARCHIVE_PURCHASES_AFTER_DAYS = getattr(config, "ARCHIVE_PURCHASES_AFTER_DAYS", 30)
+# Cada cuántos segundos se archiva (0 lo desactiva)
+ARCHIVE_INTERVAL = getattr(config, "ARCHIVE_INTERVAL", 6 * 3600)
+
+TICKETS = "tickets"
+PURCHASES = "purchases"
+TRANSCRIPTS = "transcripts"
+
+# Mensajes que se acumulan antes de cada escritura de la transcripción
+TRANSCRIPT_CHUNK = 100
+
+logger = logging.getLogger(__name__)
+
+# (día de la partición, id, registro ya serializado)
+ArchiveLine = Tuple[str, str, str]
+
+
+def partition_path(kind: str, day: str) -> str:
+    return os.path.join(ARCHIVE_DIR, kind, f"{day}.jsonl.gz")
+
+
+def append_lines(kind: str, lines: List[ArchiveLine]):
+    """Añade los registros a sus particiones diarias y espera a que estén en disco.
+
+    Cada escritura añade un miembro gzip nuevo al final del archivo, así
+    que nunca se reescribe lo ya archivado.
+    """
+    by_day: Dict[str, List[str]] = {}
+    for day, _, line in lines:
+        by_day.setdefault(day, []).append(line)
+    for day, day_lines in sorted(by_day.items()):
+        path = partition_path(kind, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                gz.write(("\n".join(day_lines) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def iter_archive(kind: str, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Dict]:
+    """Recorre los registros archivados de ``kind`` en orden de fecha.
+
+    ``since`` y ``until`` son días ``AAAA-MM-DD`` (incluidos). Se lee línea
+    a línea, sin cargar particiones completas en memoria. Cada registro es
+    ``{"id", "archived_at", "record"}``; si el bot se cayó entre escribir
+    el archivo y quitar el registro del estado, puede aparecer dos veces
+    con el mismo ``id``.
+    """
+    folder = os.path.join(ARCHIVE_DIR, kind)
+    if not os.path.isdir(folder):
+        return
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".jsonl.gz"):
+            continue
+        day = name[:-len(".jsonl.gz")]
+        if (since and day < since) or (until and day > until):
+            continue
+        try:
+            with gzip.open(os.path.join(folder, name), "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, OSError, json.JSONDecodeError) as e:
+            # Un miembro final incompleto (caída durante la escritura) no invalida los anteriores
+            logger.warning(f"Partición {name} de {kind} incompleta: {e}")
+
+
+def transcript_path(ticket_id: str) -> str:
+    return os.path.join(ARCHIVE_DIR, TRANSCRIPTS, f"{ticket_id}.jsonl.gz")
+
+
+def _message_entry(message) -> Dict:
+    return {
+        "id": str(message.id),
+        "author_id": str(message.author.id),
+        "author": str(message.author),
+        "bot": message.author.bot,
+        "created_at": message.created_at.isoformat(),
+        "edited_at": message.edited_at.isoformat() if message.edited_at else None,
+        "content": message.content,
+        "attachments": [
+            {
+                "id": str(attachment.id),
+                "filename": attachment.filename,
+                "size": attachment.size,
+                "content_type": attachment.content_type,
+                "url": attachment.url
+            }
+            for attachment in message.attachments
+        ],
+        "embeds": [embed.to_dict() for embed in message.embeds],
+        "reply_to": str(message.reference.message_id) if message.reference and message.reference.message_id else None
+    }
+
+
+async def export_transcript(channel, ticket_id: str) -> Dict:
+    """Guarda el historial del canal en ``transcripts/<ticket_id>.jsonl.gz``.
+
+    ``channel.history()`` se recorre como generador asíncrono (Discord lo
+    pagina de 100 en 100) y los mensajes se escriben por bloques de
+    ``TRANSCRIPT_CHUNK``, así que la memoria usada no depende de la
+    longitud de la conversación. Se escribe en un temporal que, con fsync
+    del archivo y del directorio, solo reemplaza al definitivo si la
+    exportación termina bien. Devuelve los datos que se guardan en el
+    ticket.
+    """
+    path = transcript_path(ticket_id)
+    tmp_path = path + ".tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    loop = asyncio.get_running_loop()
+    count = 0
+    try:
+        with open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                chunk = []
+                async for message in channel.history(limit=None, oldest_first=True):
+                    chunk.append(json.dumps(_message_entry(message), ensure_ascii=False))
+                    count += 1
+                    if len(chunk) >= TRANSCRIPT_CHUNK:
+                        await loop.run_in_executor(None, f.write, ("\n".join(chunk) + "\n").encode("utf-8"))
+                        chunk = []
+                if chunk:
+                    await loop.run_in_executor(None, f.write, ("\n".join(chunk) + "\n").encode("utf-8"))
+            # El canal se borra justo después: la transcripción debe estar en disco antes del rename
+            raw.flush()
+            await loop.run_in_executor(None, os.fsync, raw.fileno())
+        os.replace(tmp_path, path)
+        await loop.run_in_executor(None, _fsync_dir, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {
+        "path": os.path.relpath(path, ARCHIVE_DIR),
+        "messages": count,
+        "exported_at": datetime.utcnow().isoformat()
+    }
+
+
+def iter_transcript(ticket_id: str) -> Iterator[Dict]:
+    """Mensajes de la transcripción de un ticket, del más antiguo al más reciente."""
+    path = transcript_path(ticket_id)
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _older_than(timestamp: Optional[str], cutoff: datetime) -> bool:
+    if not timestamp:
+        return False
+    try:
+        return datetime.fromisoformat(timestamp) < cutoff
+    except ValueError:
+        return False
+
+
+def _line(record_id: str, record: Dict, day: str, archived_at: str) -> ArchiveLine:
+    return day, record_id, json.dumps({"id": record_id, "archived_at": archived_at, "record": record}, ensure_ascii=False)
+
+
+class Archiver:
+    """Mueve tickets cerrados y compras inactivas antiguos a archivos fríos.
+
+    Primero se escriben los registros en los archivos (fuera del event
+    loop) y solo cuando ya están en disco se quitan del estado con un
+    único commit por tipo, de modo que el estado en memoria se mantiene
+    acotado por mucho tiempo que lleve funcionando el bot.
+
+    Las compras de productos con ``per_user_limit`` no se archivan: siguen
+    contando para el límite de cada usuario.
+    """
+
+    def __init__(self, tickets_after_days: int = ARCHIVE_TICKETS_AFTER_DAYS,
+                 purchases_after_days: int = ARCHIVE_PURCHASES_AFTER_DAYS):
+        self.tickets_after_days = tickets_after_days
+        self.purchases_after_days = purchases_after_days
+        self._task = None
+        self._running = False
+
+    def _ticket_lines(self, now: datetime, archived_at: str) -> List[ArchiveLine]:
+        cutoff = now - timedelta(days=self.tickets_after_days)
+        lines = []
+        for ticket_id, ticket in load_data().get("tickets", {}).items():
+            if not isinstance(ticket, dict) or is_open(ticket):
+                continue
+            closed_at = ticket.get("closed_at") or ticket.get("timestamp")
+            if _older_than(closed_at, cutoff):
+                lines.append(_line(ticket_id, ticket, closed_at[:10], archived_at))
+        return lines
+
+    def _purchase_lines(self, now: datetime, archived_at: str) -> List[ArchiveLine]:
+        cutoff = now - timedelta(days=self.purchases_after_days)
+        products = virtual_shop.get_virtual_products()
+        lines = []
+        for purchase_id, purchase in virtual_shop._get_purchases().items():
+            if not isinstance(purchase, dict) or purchase.get("active", True):
+                continue
+            if products.get(purchase.get("product_id"), {}).get("per_user_limit") is not None:
+                continue
+            ended_at = purchase.get("expires_at") or purchase.get("purchased_at")
+            if _older_than(ended_at, cutoff):
+                lines.append(_line(purchase_id, purchase, purchase.get("purchased_at", ended_at)[:10], archived_at))
+        return lines
+
+    async def run_once(self) -> Dict[str, int]:
+        """Archiva lo que toque ahora y devuelve cuántos registros de cada tipo se movieron."""
+        if self._running:
+            return {TICKETS: 0, PURCHASES: 0}
+        self._running = True
+        try:
+            now = datetime.utcnow()
+            archived_at = now.isoformat()
+            # Se serializa aquí, en el hilo del bot, para no leer el estado desde otro hilo
+            ticket_lines = self._ticket_lines(now, archived_at)
+            purchase_lines = self._purchase_lines(now, archived_at)
+            loop = asyncio.get_running_loop()
+            moved = {TICKETS: 0, PURCHASES: 0}
+
+            if ticket_lines:
+                await loop.run_in_executor(None, append_lines, TICKETS, ticket_lines)
+                tickets = load_data().get("tickets", {})
+                removed = [ticket_id for _, ticket_id, _ in ticket_lines if tickets.pop(ticket_id, None) is not None]
+                if removed:
+                    store.commit(*(("tickets", ticket_id) for ticket_id in removed))
+                moved[TICKETS] = len(removed)
+
+            if purchase_lines:
+                await loop.run_in_executor(None, append_lines, PURCHASES, purchase_lines)
+                moved[PURCHASES] = len(virtual_shop.remove_purchases([purchase_id for _, purchase_id, _ in purchase_lines]))
+
+            if any(moved.values()):
+                logger.info(f"Archivados {moved[TICKETS]} tickets y {moved[PURCHASES]} compras en {ARCHIVE_DIR}")
+            return moved
+        finally:
+            self._running = False
+
+    def start(self, interval: float = ARCHIVE_INTERVAL):
+        """Arranca el archivado periódico si no está ya en marcha."""
+        if interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop(interval))
+
+    async def _loop(self, interval: float):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error al archivar: {e}")
+            await asyncio.sleep(interval)
+
+
+# Instancia global del archivador
+archiver = Archiver()
+
+
+if __name__ == "__main__":
+    # Auditoría: python archive.py tickets --desde 2025-01-01 --usuario 123
+    #            python archive.py transcripts --ticket ticket-1a2b3c4d
+    parser = argparse.ArgumentParser(description="Lee los registros archivados como JSONL")
+    parser.add_argument("tipo", choices=[TICKETS, PURCHASES, TRANSCRIPTS])
+    parser.add_argument("--desde", help="Primer día (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="Último día (AAAA-MM-DD)")
+    parser.add_argument("--usuario", help="Solo registros de este user_id")
+    parser.add_argument("--ticket", help="ID del ticket (para transcripts)")
+    args = parser.parse_args()
+    if args.tipo == TRANSCRIPTS:
+        if not args.ticket:
+            parser.error("transcripts requiere --ticket")
+        for message in iter_transcript(args.ticket):
+            sys.stdout.write(json.dumps(message, ensure_ascii=False) + "\n")
+        sys.exit(0)
+    for entry in iter_archive(args.tipo, args.desde, args.hasta):
+        if args.usuario and entry["record"].get("user_id") != args.usuario:
+            continue
+        sys.stdout.write(json.dumps(entry, ensure_ascii=False) + "\n")
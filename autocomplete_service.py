@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from data_manager import load_data
+from economy_system import economy
+from search_index import catalog_index, VIRTUAL
+
+# Valores de un usuario nuevo, para no crear su registro al autocompletar
+_NEW_USER_LEVEL = 1
+_NEW_USER_COINS = 100
+
+Entry = Tuple[str, str]  # (texto visible, valor)
+
+
+class AutocompleteService:
+    """Opciones de autocompletado servidas desde instantáneas en memoria.
+
+    Los handlers de autocompletado se ejecutan en cada pulsación, así que
+    aquí solo se lee el estado compartido: nunca se crean usuarios, se
+    reinician tareas ni se guarda nada. Cada instantánea de usuario se
+    reutiliza durante ``user_ttl`` segundos o hasta que se invalida tras un
+    cambio; los productos salen del índice del catálogo, que se actualiza
+    con cada alta, edición o baja.
+    """
+
+    def __init__(self, user_ttl: float = 10.0, max_entries: int = 5000):
+        self.user_ttl = user_ttl
+        self.max_entries = max_entries
+        self._snapshots: "OrderedDict[Tuple[str, str], Tuple[float, List[Entry]]]" = OrderedDict()
+
+    def _cached(self, key: Tuple[str, str], ttl: float, build: Callable[[], List[Entry]]) -> List[Entry]:
+        now = time.monotonic()
+        cached = self._snapshots.get(key)
+        if cached is not None and cached[0] > now:
+            self._snapshots.move_to_end(key)
+            return cached[1]
+        entries = build()
+        self._snapshots[key] = (now + ttl, entries)
+        self._snapshots.move_to_end(key)
+        while len(self._snapshots) > self.max_entries:
+            self._snapshots.popitem(last=False)
+        return entries
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Descarta las instantáneas de un usuario, o todas si no se indica ninguno."""
+        if user_id is None:
+            self._snapshots.clear()
+            return
+        for kind in ("tasks", "jobs"):
+            self._snapshots.pop((kind, user_id), None)
+
+    def _user_record(self, user_id: str) -> Optional[Dict]:
+        return load_data().get("economy", {}).get("users", {}).get(user_id)
+
+    def _build_claimable_tasks(self, user_id: str) -> List[Entry]:
+        user_economy = self._user_record(user_id)
+        today = datetime.now().date().isoformat()
+        if user_economy is None or user_economy.get("last_daily") != today:
+            # Las tareas se reiniciarían al abrirlas: nada que reclamar todavía
+            return []
+
+        pending = economy._pending_progress.get(user_id, {})
+        entries = []
+        for task_id, task_data in user_economy.get("daily_tasks", {}).items():
+            task_info = economy.daily_tasks.get(task_id)
+            if task_info is None or task_data.get("claimed"):
+                continue
+            progress = task_data.get("progress", 0) + pending.get(task_id, 0)
+            if task_data.get("completed") or progress >= task_info["target"]:
+                entries.append((task_info["name"], task_id))
+        return entries
+
+    def _build_available_jobs(self, user_id: str) -> List[Entry]:
+        user_economy = self._user_record(user_id) or {}
+        level = user_economy.get("level", _NEW_USER_LEVEL)
+        coins = user_economy.get("coins", _NEW_USER_COINS)
+        return [
+            (job_info["name"], job_id)
+            for job_id, job_info in economy.jobs.items()
+            if level >= job_info["requirements"]["level"] and coins >= job_info["requirements"]["coins"]
+        ]
+
+    def claimable_tasks(self, user_id: str, current: str = "") -> List[Entry]:
+        """Tareas completadas y sin reclamar del usuario."""
+        entries = self._cached(("tasks", user_id), self.user_ttl, lambda: self._build_claimable_tasks(user_id))
+        return filter_entries(entries, current)
+
+    def available_jobs(self, user_id: str, current: str = "") -> List[Entry]:
+        """Trabajos cuyos requisitos cumple el usuario."""
+        entries = self._cached(("jobs", user_id), self.user_ttl, lambda: self._build_available_jobs(user_id))
+        return filter_entries(entries, current)
+
+    def products(self, current: str = "") -> List[Entry]:
+        """Productos de la tienda virtual, buscando por nombre o ID (con tolerancia a erratas)."""
+        return [(result["label"][:100], result["id"]) for result in catalog_index.search(current, kinds=(VIRTUAL,))]
+
+
+def filter_entries(entries: List[Entry], current: str, limit: int = 25) -> List[Entry]:
+    """Primeras ``limit`` opciones cuyo texto o valor contiene ``current`` (25 es el límite de Discord)."""
+    current = current.lower()
+    if not current:
+        return entries[:limit]
+    matches = []
+    for name, value in entries:
+        if current in name.lower() or current in value.lower():
+            matches.append((name, value))
+            if len(matches) >= limit:
+                break
+    return matches
+
+
+# Instancia global del servicio de autocompletado
+autocomplete = AutocompleteService()
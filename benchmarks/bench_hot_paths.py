@@ -0,0 +1,302 @@
+"""Benchmark de las rutas más usadas de la economía, la tienda y el almacenamiento.
+
+Genera un archivo de datos sintético (usuarios de economía, compras y
+tickets) y mide cada operación sin conectarse a Discord. Cada tamaño se
+ejecuta en un subproceso propio para que el pico de memoria (RSS) sea
+comparable.
+
+Uso:
+    python benchmarks/bench_hot_paths.py
+    python benchmarks/bench_hot_paths.py --users 1000 10000 --ops 500
+    python benchmarks/bench_hot_paths.py --backend sqlite --sync
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS = ("send_messages", "use_commands", "react_messages", "play_minigames", "send_many_messages")
+
+
+def synthesize(path: str, users: int, seed: int = 42):
+    """Escribe un archivo de datos con ``users`` usuarios, compras y tickets."""
+    rng = random.Random(seed)
+    today = datetime.now().date().isoformat()
+    now = datetime.utcnow()
+
+    economy_users = {}
+    for i in range(users):
+        coins = rng.randint(0, 50_000)
+        economy_users[str(100_000_000 + i)] = {
+            "coins": 1_000_000 + coins,
+            "level": rng.randint(1, 40),
+            "xp": rng.randint(0, 100_000),
+            "daily_tasks": {
+                task: {"progress": 0, "completed": False, "claimed": False} for task in TASKS
+            },
+            "last_daily": today,
+            "job": None,
+            "last_work": None,
+            "total_earned": coins + rng.randint(0, 100_000),
+            "total_spent": rng.randint(0, 50_000),
+            "games_played": rng.randint(0, 500),
+            "games_won": rng.randint(0, 250),
+            "streak": 0,
+            "achievements": [],
+            "created_at": now.isoformat()
+        }
+    user_ids = list(economy_users)
+
+    products = {}
+    for i in range(50):
+        product_id = f"prod-{i}"
+        products[product_id] = {
+            "id": product_id,
+            "name": f"Producto {i}",
+            "price": rng.randint(100, 5_000),
+            "description": "Producto sintético",
+            "category": rng.choice(["roles", "perks", "items", "cosmetics", "other"]),
+            "image_url": None,
+            "role_id": None,
+            "duration_days": rng.choice([None, 7, 30]),
+            "created_at": now.isoformat(),
+            "enabled": rng.random() > 0.1,
+            "purchases_count": 0
+        }
+
+    purchases = {}
+    for i in range(users // 2):
+        purchase_id = f"purchase-{i}"
+        product_id = rng.choice(list(products))
+        purchases[purchase_id] = {
+            "id": purchase_id,
+            "user_id": rng.choice(user_ids),
+            "product_id": product_id,
+            "product_name": products[product_id]["name"],
+            "price_paid": products[product_id]["price"],
+            "purchased_at": (now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))).isoformat(),
+            "active": rng.random() > 0.3
+        }
+        products[product_id]["purchases_count"] += 1
+
+    tickets = {}
+    for i in range(max(1, users // 10)):
+        tickets[str(i + 1)] = {
+            "user_id": rng.choice(user_ids),
+            "channel_id": str(900_000_000 + i),
+            "status": rng.choice(["abierto", "cerrado"]),
+            "timestamp": (now - timedelta(hours=rng.randint(0, 24 * 30))).isoformat()
+        }
+
+    data = {
+        "users": {},
+        "products": {},
+        "categories": {},
+        "tickets": tickets,
+        "ticket_counter": len(tickets),
+        "payment_info": {},
+        "gifts": {},
+        "shop": {"last_updated": ""},
+        "roblox_accounts": {},
+        "pending_verifications": {},
+        "reminded_users": [],
+        "economy": {
+            "users": economy_users,
+            "global_stats": {
+                "total_coins_in_circulation": 0,
+                "total_games_played": 0,
+                "total_jobs_completed": 0
+            }
+        },
+        "virtual_shop": {
+            "products": products,
+            "purchases": purchases,
+            "settings": {"enabled": True, "tax_rate": 0.0}
+        }
+    }
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return user_ids, list(products)
+
+
+def install_config(workdir: str, backend: str):
+    """Sustituye ``config`` por un módulo temporal que apunta a ``workdir``."""
+    config = types.ModuleType("config")
+    config.DATA_FILE = os.path.join(workdir, "data.json")
+    config.SQLITE_FILE = os.path.join(workdir, "data.db")
+    config.STORAGE_BACKEND = backend
+    sys.modules["config"] = config
+    return config
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(name: str, fn, ops: int):
+    samples = []
+    started = time.perf_counter()
+    for _ in range(ops):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+    return {
+        "name": name,
+        "ops": ops,
+        "ops_per_sec": ops / total if total else float("inf"),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000
+    }
+
+
+async def measure_in_loop(name: str, fn, ops: int, store):
+    """Como ``measure``, pero cada operación cuenta hasta que sus escrituras llegan al backend."""
+    samples = []
+    started = time.perf_counter()
+    for _ in range(ops):
+        t0 = time.perf_counter()
+        fn()
+        await store.drain()
+        samples.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+    return {
+        "name": name,
+        "ops": ops,
+        "ops_per_sec": ops / total if total else float("inf"),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KiB y macOS en bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def data_file_mb(config, backend: str) -> float:
+    """Tamaño en disco de los datos del backend (en SQLite, la base y su WAL)"""
+    if backend != "sqlite":
+        return os.path.getsize(config.DATA_FILE) / (1024 * 1024)
+    paths = [config.SQLITE_FILE, config.SQLITE_FILE + "-wal"]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / (1024 * 1024)
+
+
+def run_worker(users: int, ops: int, backend: str, sync: bool, seed: int):
+    # El directorio (data.json, data.db y journal) se borra al terminar
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        _run_worker(workdir, users, ops, backend, sync, seed)
+
+
+def _run_worker(workdir: str, users: int, ops: int, backend: str, sync: bool, seed: int):
+    config = install_config(workdir, backend)
+    sys.path.insert(0, ROOT)
+    user_ids, product_ids = synthesize(config.DATA_FILE, users, seed)
+
+    from data_manager import store
+    from economy_system import economy
+    from virtual_shop import virtual_shop
+
+    rng = random.Random(seed)
+    pick_user = lambda: rng.choice(user_ids)
+
+    started = time.perf_counter()
+    store.load()
+    load_ms = (time.perf_counter() - started) * 1000
+    shop_products = store.data["virtual_shop"]["products"]
+    enabled_products = [p for p in product_ids if shop_products[p].get("enabled", True)]
+
+    cases = [
+        ("get_user_economy", lambda: economy.get_user_economy(pick_user())),
+        ("add_coins", lambda: economy.add_coins(pick_user(), 10, "bench")),
+        ("update_task_progress", lambda: economy.update_task_progress(pick_user(), "send_messages")),
+        ("queue_task_progress", lambda: economy.queue_task_progress(pick_user(), "react_messages")),
+        ("get_leaderboard", lambda: economy.get_leaderboard("coins", 10)),
+        ("get_user_rank", lambda: economy.get_user_rank(pick_user(), "coins")),
+        ("purchase_virtual_product", lambda: virtual_shop.purchase_virtual_product(pick_user(), rng.choice(enabled_products))),
+        ("get_user_purchases_page", lambda: virtual_shop.get_user_purchases_page(pick_user(), 5)),
+        ("get_shop_stats", lambda: virtual_shop.get_shop_stats()),
+    ]
+
+    def run_cases():
+        return [measure(name, fn, ops) for name, fn in cases]
+
+    async def run_in_loop():
+        # Como en el bot las escrituras van al hilo de E/S, pero se espera a
+        # que terminen para que la latencia incluya el almacenamiento
+        return [await measure_in_loop(name, fn, ops, store) for name, fn in cases]
+
+    results = run_cases() if sync else asyncio.run(run_in_loop())
+    economy.flush_task_progress()
+    store.close()
+    print(json.dumps({
+        "users": users,
+        "backend": backend,
+        "mode": "sync" if sync else "loop",
+        "load_ms": load_ms,
+        "data_file_mb": data_file_mb(config, backend),
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results
+    }))
+
+
+def print_report(report):
+    rss = report["peak_rss_mb"]
+    rss_text = f"{rss:.1f} MB" if rss is not None else "n/a"
+    print(f"\n== {report['users']:,} usuarios | backend={report['backend']} | modo={report['mode']} "
+          f"| carga {report['load_ms']:.0f} ms | archivo {report['data_file_mb']:.1f} MB | RSS pico {rss_text}")
+    print(f"{'operación':<26}{'ops/s':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for row in report["results"]:
+        print(f"{row['name']:<26}{row['ops_per_sec']:>12,.0f}{row['p50_ms']:>12.3f}{row['p99_ms']:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--ops", type=int, default=1_000, help="operaciones por caso")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--sync", action="store_true", help="sin event loop: cada escritura espera al disco")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="imprimir los resultados en JSON")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args.worker, args.ops, args.backend, args.sync, args.seed)
+        return
+
+    reports = []
+    for users in args.users:
+        command = [sys.executable, os.path.abspath(__file__), "--worker", str(users),
+                   "--ops", str(args.ops), "--backend", args.backend, "--seed", str(args.seed)]
+        if args.sync:
+            command.append("--sync")
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        reports.append(report)
+        if not args.json:
+            print_report(report)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,22 +4,46 @@ from discord.ext import commands
 import asyncio
 from datetime import datetime, timedelta
 from economy_system import economy
+from data_manager import store
+from autocomplete_service import autocomplete
+from embed_cache import embed_cache
 
 from typing import Optional
 import random
 from views.virtual_shop_view import VirtualShopView, MyPurchasesView
 
+
+def build_games_embed() -> discord.Embed:
+    """Embed de /games (estático: la configuración de los minijuegos no cambia en ejecución)"""
+    embed = discord.Embed(
+        title="🎮 Casino GameMid",
+        description="¡Juega y gana GameCoins! (O piérdelos... 😅)",
+        color=0xe74c3c
+    )
+    
+    for game_id, game_info in economy.minigames.items():
+        embed.add_field(
+            name=game_info['name'],
+            value=f"💰 Apuesta: {game_info['min_bet']}-{game_info['max_bet']} GameCoins",
+            inline=True
+        )
+    
+    embed.add_field(
+        name="🎯 Comandos Disponibles",
+        value="`/coinflip` - Cara o cruz\n`/dice` - Adivina el número\n`/slots` - Tragamonedas\n`/blackjack` - Blackjack interactivo con botones\n`/ruleta` - Ruleta europea\n`/transfer` - Transferir GameCoins",
+        inline=False
+    )
+    
+    embed.set_footer(text="¡Juega responsablemente!")
+    return embed
+
 def setup(tree: app_commands.CommandTree, client: discord.Client):
     
     @tree.command(name="balance", description="🪙 Muestra tu balance de GameCoins")
     async def balance(interaction: discord.Interaction, usuario: Optional[discord.Member] = None):
         target_user = usuario or interaction.user
-        # Forzar recarga de datos frescos
-        from data_manager import load_data
-        data = load_data()
-        if "economy" in data and "users" in data["economy"] and str(target_user.id) in data["economy"]["users"]:
-            user_economy = data["economy"]["users"][str(target_user.id)]
-        else:
+        user_economy = await store.get_user(str(target_user.id))
+        if user_economy is None:
             user_economy = economy.get_user_economy(str(target_user.id))
         
         embed = discord.Embed(
@@ -137,6 +161,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         task_id = tarea
         
         reward = economy.claim_task_reward(user_id, task_id)
+        autocomplete.invalidate(user_id)
         
         if reward:
             embed = discord.Embed(
@@ -162,16 +187,12 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     
     @claim_task.autocomplete('tarea')
     async def claim_task_autocomplete(interaction: discord.Interaction, current: str):
+        # Solo lectura: se ejecuta en cada pulsación y nunca debe guardar
         user_id = str(interaction.user.id)
-        daily_tasks = economy.get_daily_tasks(user_id)
-        
-        choices = []
-        for task_id, task_data in daily_tasks.items():
-            if task_data['completed'] and not task_data['claimed']:
-                task_name = economy.daily_tasks[task_id]['name']
-                choices.append(app_commands.Choice(name=task_name, value=task_id))
-        
-        return choices[:25]  # Discord limit
+        return [
+            app_commands.Choice(name=name, value=task_id)
+            for name, task_id in autocomplete.claimable_tasks(user_id, current)
+        ]
     
     @tree.command(name="jobs", description="💼 Muestra los trabajos disponibles")
     async def jobs(interaction: discord.Interaction):
@@ -257,13 +278,10 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     @apply_job.autocomplete('trabajo')
     async def apply_job_autocomplete(interaction: discord.Interaction, current: str):
         user_id = str(interaction.user.id)
-        available_jobs = economy.get_available_jobs(user_id)
-        
-        choices = []
-        for job in available_jobs:
-            choices.append(app_commands.Choice(name=job['name'], value=job['id']))
-        
-        return choices[:25]
+        return [
+            app_commands.Choice(name=name, value=job_id)
+            for name, job_id in autocomplete.available_jobs(user_id, current)
+        ]
     
     @tree.command(name="work", description="⚒️ Trabaja para ganar GameCoins")
     async def work(interaction: discord.Interaction):
@@ -316,27 +334,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     
     @tree.command(name="games", description="🎮 Muestra los minijuegos disponibles")
     async def games(interaction: discord.Interaction):
-        embed = discord.Embed(
-            title="🎮 Casino GameMid",
-            description="¡Juega y gana GameCoins! (O piérdelos... 😅)",
-            color=0xe74c3c
-        )
-        
-        for game_id, game_info in economy.minigames.items():
-            embed.add_field(
-                name=game_info['name'],
-                value=f"💰 Apuesta: {game_info['min_bet']}-{game_info['max_bet']} GameCoins",
-                inline=True
-            )
-        
-        embed.add_field(
-            name="🎯 Comandos Disponibles",
-            value="`/coinflip` - Cara o cruz\n`/dice` - Adivina el número\n`/slots` - Tragamonedas\n`/blackjack` - Blackjack interactivo con botones\n`/ruleta` - Ruleta europea\n`/transfer` - Transferir GameCoins",
-            inline=False
-        )
-        
-        embed.set_footer(text="¡Juega responsablemente!")
-        
+        embed = embed_cache.get(("games",), build_games_embed)
         await interaction.response.send_message(embed=embed)
     
     @tree.command(name="coinflip", description="🪙 Juega cara o cruz")
@@ -355,6 +353,12 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                     description=f"La apuesta debe estar entre {economy.minigames['coinflip']['min_bet']} y {economy.minigames['coinflip']['max_bet']} GameCoins",
                     color=0xff0000
                 )
+            elif result["error"] == "busy":
+                embed = discord.Embed(
+                    title="⏳ Operación en Curso",
+                    description="Tienes otra operación en curso; inténtalo de nuevo en un momento",
+                    color=0xff0000
+                )
             else:
                 embed = discord.Embed(
                     title="❌ Fondos Insuficientes",
@@ -424,6 +428,12 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                     description=f"La apuesta debe estar entre {economy.minigames['dice']['min_bet']} y {economy.minigames['dice']['max_bet']} GameCoins",
                     color=0xff0000
                 )
+            elif result["error"] == "busy":
+                embed = discord.Embed(
+                    title="⏳ Operación en Curso",
+                    description="Tienes otra operación en curso; inténtalo de nuevo en un momento",
+                    color=0xff0000
+                )
             else:
                 embed = discord.Embed(
                     title="❌ Fondos Insuficientes",
@@ -478,6 +488,12 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                     description=f"La apuesta debe estar entre {economy.minigames['slots']['min_bet']} y {economy.minigames['slots']['max_bet']} GameCoins",
                     color=0xff0000
                 )
+            elif result["error"] == "busy":
+                embed = discord.Embed(
+                    title="⏳ Operación en Curso",
+                    description="Tienes otra operación en curso; inténtalo de nuevo en un momento",
+                    color=0xff0000
+                )
             else:
                 embed = discord.Embed(
                     title="❌ Fondos Insuficientes",
@@ -595,7 +611,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         user_id = str(interaction.user.id)
         target_id = str(usuario.id)
         
-        if economy.transfer_coins(user_id, target_id, cantidad):
+        if await economy.transfer_coins(user_id, target_id, cantidad):
             embed = discord.Embed(
                 title="✅ Transferencia Exitosa",
                 description=f"Has transferido **{cantidad:,} GameCoins** a {usuario.mention}",
@@ -763,7 +779,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             return
         
         user_id = str(message.author.id)
-        economy.update_task_progress(user_id, "send_messages")
+        economy.queue_task_progress(user_id, "send_messages")
 
     async def handle_economy_interaction(interaction: discord.Interaction):
         if interaction.user.bot:
@@ -771,14 +787,14 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         
         if interaction.type == discord.InteractionType.application_command:
             user_id = str(interaction.user.id)
-            economy.update_task_progress(user_id, "use_commands")
+            economy.queue_task_progress(user_id, "use_commands")
 
     async def handle_economy_reaction(reaction: discord.Reaction, user: discord.User):
         if user.bot:
             return
 
         user_id = str(user.id)
-        economy.update_task_progress(user_id, "react_messages")
+        economy.queue_task_progress(user_id, "react_messages")
 
     # Register event listeners using the event decorator approach
     @client.event
@@ -2,7 +2,9 @@ import discord
 from discord import app_commands
 import logging
 
-from data_manager import load_data, save_data
+from config import OWNER_ROLE_ID
+from data_manager import load_data, store
+from embed_cache import embed_cache
 from utils import is_owner
 
 # Configuración del logging
@@ -63,19 +65,22 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             await interaction.response.send_message("No hay información de pago disponible. Contacta a un Owner.", ephemeral=True)
             return
         
-        embed = discord.Embed(
-            title="💳 Información de Pago",
-            description="Aquí tienes los detalles para realizar el pago:",
-            color=0xA100F2
-        )
-        
-        for method, info in payment_info.items():
-            embed.add_field(
-                name=method,
-                value=info,
-                inline=False
+        def build_embed():
+            embed = discord.Embed(
+                title="💳 Información de Pago",
+                description="Aquí tienes los detalles para realizar el pago:",
+                color=0xA100F2
             )
-        
+            
+            for method, info in payment_info.items():
+                embed.add_field(
+                    name=method,
+                    value=info,
+                    inline=False
+                )
+            return embed
+        
+        embed = embed_cache.get(("pago", store.version("payment_info")), build_embed)
         await interaction.response.send_message(embed=embed, ephemeral=False)
 
     @tree.command(name="add_payment_info", description="Añade o actualiza la información de un método de pago")
@@ -87,7 +92,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             data["payment_info"] = {}
         
         data["payment_info"][method] = info
-        save_data(data)
+        await store.commit(("payment_info", method))
         logger.info(f"Información de pago actualizada exitosamente para el método {method}")
         await interaction.response.send_message(f"Información de pago para '{method}' actualizada: {info}", ephemeral=True)
 
@@ -102,7 +107,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             return
         
         del data["payment_info"][method]
-        save_data(data)
+        await store.commit(("payment_info", method))
         logger.info(f"Información de pago eliminada exitosamente para el método {method}")
         await interaction.response.send_message(f"Información de pago para '{method}' eliminada.", ephemeral=True)
 
@@ -110,77 +115,82 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     async def help(interaction: discord.Interaction):
         logger.info(f"Usuario {interaction.user.name} (ID: {interaction.user.id}) solicitó ayuda con los comandos")
         
-        # Embed principal con todos los comandos organizados
-        embed = discord.Embed(
-            title="📚 Centro de Ayuda - GameMid",
-            description="**¡Todos los comandos disponibles organizados por categorías!**\n*GameMid v2.0 - 34 comandos activos*",
-            color=0xffd700
-        )
+        # Los owners ven además sus comandos; el embed de cada caso se construye una vez
+        is_owner_user = discord.utils.get(getattr(interaction.user, "roles", []), id=OWNER_ROLE_ID) is not None
         
-        # Economía Virtual
-        embed.add_field(
-            name="🪙 **ECONOMÍA VIRTUAL**",
-            value="**💰 Personal:** `/balance` `/daily` `/jobs`\n**⚒️ Trabajo:** `/work` `/apply_job` `/claim_task`\n**🎮 Juegos:** `/games` `/coinflip` `/dice` `/slots` `/blackjack` (interactivo) `/ruleta`\n**🏆 Social:** `/transfer` `/leaderboard`\n**🛒 Tienda:** `/tienda_virtual` `/mis_compras`",
-            inline=True
-        )
-        
-        # Tienda y Productos
-        embed.add_field(
-            name="🛒 **TIENDA & PRODUCTOS**",
-            value="**👥 Usuario:** `/products` `/ticket` `/pago`\n**👑 Admin:** `/add-product` `/edit-product` `/delete-product` `/close` `/ticket-panel`\n**💳 Pagos:** `/add-payment-info` `/remove-payment-info`",
-            inline=True
-        )
-        
-
+        def build_embed():
+            # Embed principal con todos los comandos organizados
+            embed = discord.Embed(
+                title="📚 Centro de Ayuda - GameMid",
+                description="**¡Todos los comandos disponibles organizados por categorías!**\n*GameMid v2.0 - 34 comandos activos*",
+                color=0xffd700
+            )
         
-        # Comandos Generales
-        embed.add_field(
-            name="⚙️ **COMANDOS GENERALES**",
-            value="**📚 Ayuda:** `/help`\n**🔍 Info:** Comandos de información\n**🛠️ Utilidades:** Herramientas varias",
-            inline=True
-        )
+            # Economía Virtual
+            embed.add_field(
+                name="🪙 **ECONOMÍA VIRTUAL**",
+                value="**💰 Personal:** `/balance` `/daily` `/jobs`\n**⚒️ Trabajo:** `/work` `/apply_job` `/claim_task`\n**🎮 Juegos:** `/games` `/coinflip` `/dice` `/slots` `/blackjack` (interactivo) `/ruleta`\n**🏆 Social:** `/transfer` `/leaderboard`\n**🛒 Tienda:** `/tienda_virtual` `/mis_compras`",
+                inline=True
+            )
         
-        # Características destacadas
-        embed.add_field(
-            name="✨ **CARACTERÍSTICAS DESTACADAS**",
-            value="🪙 **Sistema de GameCoins** completo\n🎮 **Minijuegos** interactivos\n🎫 **Sistema de tickets** automático\n📊 **Rankings** y estadísticas\n⏰ **Recordatorios** personalizados",
-            inline=True
-        )
+            # Tienda y Productos
+            embed.add_field(
+                name="🛒 **TIENDA & PRODUCTOS**",
+                value="**👥 Usuario:** `/products` `/ticket` `/pago`\n**👑 Admin:** `/add-product` `/edit-product` `/delete-product` `/close` `/ticket-panel`\n**💳 Pagos:** `/add-payment-info` `/remove-payment-info`",
+                inline=True
+            )
         
-        # Enlaces y documentación
-        embed.add_field(
-            name="📖 **DOCUMENTACIÓN**",
-            value="📋 [Economía Virtual](https://github.com/tu-repo/ECONOMIA_VIRTUAL.md)\n⏰ [Sistema Recordatorios](https://github.com/tu-repo/REMINDER_SYSTEM.md)",
-            inline=True
-        )
+
         
-        # Comandos de Owner (solo visible para owners)
-        from utils import OWNER_IDS
-        if str(interaction.user.id) in OWNER_IDS:
+            # Comandos Generales
             embed.add_field(
-                name="👑 Comandos de Owner",
-                value="`/add_gamecoins` - Añadir GameCoins a un usuario\n"
-                      "`/remove_gamecoins` - Quitar GameCoins a un usuario\n"
-                      "`/set_gamecoins` - Establecer GameCoins de un usuario\n"
-                      "`/reset_daily` - Resetear daily de un usuario\n"
-                      "`/backup_data` - Crear respaldo de datos\n"
-                      "`/restore_data` - Restaurar datos desde respaldo\n"
-                      "`/clear_data` - Limpiar datos de usuario\n"
-                      "`/bot_stats` - Estadísticas del bot",
-                inline=False
+                name="⚙️ **COMANDOS GENERALES**",
+                value="**📚 Ayuda:** `/help`\n**🔍 Info:** Comandos de información\n**🛠️ Utilidades:** Herramientas varias",
+                inline=True
             )
-            
+        
+            # Características destacadas
             embed.add_field(
-                name="🛒 Gestión de Tienda Virtual",
-                value="`/añadir_producto_virtual` - Añadir producto\n"
-                      "`/editar_producto_virtual` - Editar producto\n"
-                      "`/eliminar_producto_virtual` - Eliminar producto\n"
-                      "`/listar_productos_virtuales` - Ver todos los productos\n"
-                      "`/gestionar_tienda_virtual` - Panel de gestión",
-                inline=False
+                name="✨ **CARACTERÍSTICAS DESTACADAS**",
+                value="🪙 **Sistema de GameCoins** completo\n🎮 **Minijuegos** interactivos\n🎫 **Sistema de tickets** automático\n📊 **Rankings** y estadísticas\n⏰ **Recordatorios** personalizados",
+                inline=True
             )
         
-        embed.set_footer(text="💡 GameMid - Tu asistente completo para Discord | Desarrollado con ❤️")
-        embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1234567890/gamemid-logo.png")
+            # Enlaces y documentación
+            embed.add_field(
+                name="📖 **DOCUMENTACIÓN**",
+                value="📋 [Economía Virtual](https://github.com/tu-repo/ECONOMIA_VIRTUAL.md)\n⏰ [Sistema Recordatorios](https://github.com/tu-repo/REMINDER_SYSTEM.md)",
+                inline=True
+            )
         
+            # Comandos de Owner (solo visible para owners)
+            if is_owner_user:
+                embed.add_field(
+                    name="👑 Comandos de Owner",
+                    value="`/add_gamecoins` - Añadir GameCoins a un usuario\n"
+                          "`/remove_gamecoins` - Quitar GameCoins a un usuario\n"
+                          "`/set_gamecoins` - Establecer GameCoins de un usuario\n"
+                          "`/reset_daily` - Resetear daily de un usuario\n"
+                          "`/backup_data` - Crear respaldo de datos\n"
+                          "`/restore_data` - Restaurar datos desde respaldo\n"
+                          "`/clear_data` - Limpiar datos de usuario\n"
+                          "`/bot_stats` - Estadísticas del bot",
+                    inline=False
+                )
+            
+                embed.add_field(
+                    name="🛒 Gestión de Tienda Virtual",
+                    value="`/añadir_producto_virtual` - Añadir producto\n"
+                          "`/editar_producto_virtual` - Editar producto\n"
+                          "`/eliminar_producto_virtual` - Eliminar producto\n"
+                          "`/listar_productos_virtuales` - Ver todos los productos\n"
+                          "`/gestionar_tienda_virtual` - Panel de gestión",
+                    inline=False
+                )
+        
+            embed.set_footer(text="💡 GameMid - Tu asistente completo para Discord | Desarrollado con ❤️")
+            embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1234567890/gamemid-logo.png")
+            return embed
+        
+        embed = embed_cache.get(("help", is_owner_user), build_embed)
         await interaction.response.send_message(embed=embed, ephemeral=True)
\ No newline at end of file
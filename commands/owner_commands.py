@@ -3,10 +3,12 @@ from discord import app_commands
 from typing import Optional
 import uuid
 import asyncio
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
-from data_manager import load_data, save_data
+from data_manager import load_data, store
 from utils import is_owner
+from search_index import catalog_index
+from ticket_system import ticket_index
 from reminder_system import get_reminder_system
 
 
@@ -31,7 +33,8 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             "description": description,
             "image_url": image_url
         }
-        save_data(data)
+        await store.commit(("products", product_id))
+        catalog_index.update_product(product_id)
         logger.info(f"Producto {name} (ID: {product_id}) añadido exitosamente - Precio: ${price:.2f} MXN")
         await interaction.response.send_message(f"Producto '{name}' añadido (ID: {product_id}).", ephemeral=True)
 
@@ -57,7 +60,8 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             data["products"][product_id]["description"] = description
         if image_url is not None:
             data["products"][product_id]["image_url"] = image_url
-        save_data(data)
+        await store.commit(("products", product_id))
+        catalog_index.update_product(product_id)
         logger.info(f"Producto {product_id} actualizado exitosamente")
         await interaction.response.send_message(f"Producto {product_id} actualizado.", ephemeral=True)
 
@@ -74,7 +78,8 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             return
         product_name = data["products"][product_id]["name"]
         del data["products"][product_id]
-        save_data(data)
+        await store.commit(("products", product_id))
+        catalog_index.update_product(product_id)
         logger.info(f"Producto {product_name} (ID: {product_id}) eliminado exitosamente")
         await interaction.response.send_message(f"Producto {product_id} eliminado.", ephemeral=True)
 
@@ -330,12 +335,11 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 await interaction.response.send_message("❌ La cantidad debe ser positiva.", ephemeral=True)
                 return
             
-            # Obtener balance anterior
-            user_economy = economy.get_user_economy(str(user.id))
-            old_balance = user_economy["coins"]
-            
-            # Añadir las monedas
-            new_balance = economy.add_coins(str(user.id), amount, reason)
+            # Añadir las monedas; la transacción asíncrona espera a que
+            # termine cualquier otra operación en curso del usuario
+            async with economy.transaction(str(user.id)) as tx:
+                old_balance = tx.balance(str(user.id))
+                new_balance = tx.credit(str(user.id), amount, reason)
             
             # Crear embed de confirmación
             embed = discord.Embed(
@@ -366,4 +370,124 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             
         except Exception as e:
             logger.error(f"Error en add_coins: {e}")
-            await interaction.response.send_message(f"❌ Error al añadir GameCoins: {str(e)}", ephemeral=True)
\ No newline at end of file
+            await interaction.response.send_message(f"❌ Error al añadir GameCoins: {str(e)}", ephemeral=True)
+
+    @tree.command(name="perf", description="Muestra el tiempo que tarda cada comando (Owner only)")
+    @app_commands.describe(
+        orden="Métrica por la que ordenar",
+        limite="Número de comandos a mostrar",
+        reiniciar="Reiniciar las métricas después de mostrarlas"
+    )
+    @app_commands.choices(orden=[
+        app_commands.Choice(name="Tiempo total", value="total_ms"),
+        app_commands.Choice(name="Percentil 95", value="p95_ms"),
+        app_commands.Choice(name="Almacenamiento", value="storage_ms"),
+        app_commands.Choice(name="API de Discord", value="api_ms"),
+        app_commands.Choice(name="Llamadas", value="calls")
+    ])
+    @app_commands.default_permissions(administrator=True)
+    @is_owner()
+    async def perf(interaction: discord.Interaction, orden: str = "total_ms", limite: app_commands.Range[int, 1, 25] = 10, reiniciar: bool = False):
+        """Muestra las métricas de latencia por comando."""
+        from perf_metrics import metrics
+
+        rows = metrics.summary(sort_by=orden, limit=limite)
+        queues = metrics.queue_stats()
+        if not rows and not any(any(stats.values()) for stats in queues.values()):
+            await interaction.response.send_message("📊 Aún no hay métricas registradas.", ephemeral=True)
+            return
+
+        lines = [f"{'comando':<22}{'n':>6}{'p50':>8}{'p95':>8}{'alm.':>8}{'api':>8}"]
+        for name, row in rows:
+            calls = row["calls"] or 1
+            lines.append(
+                f"{name[:21]:<22}{row['calls']:>6}{row['p50_ms']:>8.0f}{row['p95_ms']:>8.0f}"
+                f"{row['storage_ms'] / calls:>8.1f}{row['api_ms'] / calls:>8.0f}"
+            )
+        embed = discord.Embed(
+            title="⏱️ Rendimiento de Comandos",
+            description="```\n" + "\n".join(lines) + "\n```",
+            color=0x3498DB
+        )
+        embed.add_field(
+            name="ℹ️ Leyenda",
+            value="Tiempos en ms. **alm.** y **api** son la media por llamada de almacenamiento y de la API de Discord.",
+            inline=False
+        )
+        # Cada cola registrada define sus propias claves; se muestran tal cual
+        for name, stats in queues.items():
+            value = "\n".join(
+                f"{key}: **{stat:.0f}**" if isinstance(stat, float) else f"{key}: **{stat}**"
+                for key, stat in stats.items()
+            )
+            embed.add_field(name=f"📥 Cola de {name}", value=value or "Sin datos", inline=False)
+        embed.set_footer(text=f"Desde {metrics.since.strftime('%d/%m/%Y %H:%M')} UTC • GameMid")
+        embed.timestamp = datetime.utcnow()
+
+        if reiniciar:
+            metrics.reset()
+            logger.info(f"Owner {interaction.user.name} (ID: {interaction.user.id}) reinició las métricas de rendimiento")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @tree.command(name="tickets_abiertos", description="Lista los tickets abiertos, del más antiguo al más reciente (Owner only)")
+    @app_commands.describe(
+        estado="Filtrar por estado detallado (p. ej. esperando_revision)",
+        limite="Número de tickets a mostrar"
+    )
+    @app_commands.default_permissions(administrator=True)
+    @is_owner()
+    async def tickets_abiertos(interaction: discord.Interaction, estado: Optional[str] = None, limite: app_commands.Range[int, 1, 25] = 15):
+        """Lista los tickets abiertos usando el índice en memoria."""
+        tickets = ticket_index.open_tickets(status=estado, limit=limite)
+        counts = ticket_index.status_counts()
+        if not tickets:
+            await interaction.response.send_message("🎫 No hay tickets abiertos.", ephemeral=True)
+            return
+
+        lines = []
+        for ticket_id, ticket in tickets:
+            try:
+                opened = f"<t:{int(datetime.fromisoformat(ticket['timestamp']).replace(tzinfo=timezone.utc).timestamp())}:R>"
+            except (KeyError, ValueError):
+                opened = "fecha desconocida"
+            channel = f"<#{ticket['channel_id']}>" if ticket.get("channel_id") else f"`{ticket_id}`"
+            lines.append(
+                f"{channel} • <@{ticket.get('user_id')}> • {ticket.get('product_name', 'Producto')} • "
+                f"`{ticket.get('estado_detallado', 'abierto')}` • {opened}"
+            )
+
+        embed = discord.Embed(
+            title="🎫 Tickets Abiertos",
+            description="\n".join(lines),
+            color=0xA100F2
+        )
+        embed.add_field(
+            name="📊 Por estado",
+            value="\n".join(f"`{status}`: {count}" for status, count in sorted(counts.items())),
+            inline=False
+        )
+        embed.set_footer(text=f"{len(ticket_index)} tickets abiertos • GameMid")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @tickets_abiertos.autocomplete("estado")
+    async def tickets_abiertos_estado_autocomplete(interaction: discord.Interaction, current: str):
+        return [
+            app_commands.Choice(name=f"{status} ({count})", value=status)
+            for status, count in sorted(ticket_index.status_counts().items())
+            if current.lower() in status.lower()
+        ][:25]
+
+    @tree.command(name="archivar", description="Archiva ahora los tickets cerrados y compras inactivas antiguos (Owner only)")
+    @app_commands.default_permissions(administrator=True)
+    @is_owner()
+    async def archivar(interaction: discord.Interaction):
+        """Ejecuta el archivado sin esperar al siguiente ciclo."""
+        from archive import archiver, ARCHIVE_DIR, TICKETS, PURCHASES
+
+        await interaction.response.defer(ephemeral=True)
+        moved = await archiver.run_once()
+        logger.info(f"Owner {interaction.user.name} (ID: {interaction.user.id}) ejecutó el archivado: {moved}")
+        await interaction.followup.send(
+            f"🗄️ Archivados **{moved[TICKETS]}** tickets y **{moved[PURCHASES]}** compras en `{ARCHIVE_DIR}`.",
+            ephemeral=True
+        )
@@ -8,7 +8,7 @@ import random
 import string
 
 import logging
-from data_manager import (load_data, save_data, get_next_ticket_id, 
+from data_manager import (load_data, store, get_next_ticket_id, 
                          get_roblox_account, link_roblox_account, 
                          get_pending_verification, add_pending_verification, 
                          remove_pending_verification, cleanup_expired_verifications)
@@ -16,6 +16,8 @@ from views.enhanced_product_view import EnhancedProductView
 from views.enhanced_ticket_view import EnhancedTicketView
 from views.shop_view import ShopView
 from utils import sync_fortnite_shop, cache_fortnite_shop
+from search_index import catalog_index, VIRTUAL, PRODUCT, GIFT
+from ticket_system import ticket_index
 from config import (TICKET_CHANNEL_ID, OWNER_ROLE_ID, FORTNITE_API_KEY, FORTNITE_API_URL, 
                    FORTNITE_HEADERS, ROBLOX_GROUP_ID, ROBLOX_API_BASE, ROBLOX_GROUPS_API)
 
@@ -69,12 +71,9 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         user_id = str(interaction.user.id)
         
         # Verificar si ya tiene un ticket abierto
-        has_open_ticket = False
-        for ticket_id, ticket in data["tickets"].items():
-            if ticket["user_id"] == user_id and ticket["status"] == "abierto" and ticket.get("estado_detallado") not in ["cerrado_por_owner", "cerrado"]:
-                has_open_ticket = True
-                await interaction.followup.send("Ya tienes un ticket abierto. Por favor, espera a que se resuelva.", ephemeral=True)
-                return
+        if ticket_index.has_open_ticket(user_id):
+            await interaction.followup.send("Ya tienes un ticket abierto. Por favor, espera a que se resuelva.", ephemeral=True)
+            return
         
         if not data["products"]:
             await interaction.followup.send("No hay productos disponibles. Contacta a un Owner.", ephemeral=True)
@@ -88,6 +87,46 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         embed = view.create_embed()
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
+    @tree.command(name="buscar", description="Busca productos, artículos de la tienda virtual y regalos")
+    @app_commands.describe(texto="Nombre o parte del nombre (admite erratas)", tipo="Dónde buscar")
+    @app_commands.choices(tipo=[
+        app_commands.Choice(name="Todo", value="todo"),
+        app_commands.Choice(name="Productos", value=PRODUCT),
+        app_commands.Choice(name="Tienda virtual", value=VIRTUAL),
+        app_commands.Choice(name="Regalos de Fortnite", value=GIFT)
+    ])
+    async def buscar(interaction: discord.Interaction, texto: str, tipo: str = "todo"):
+        kinds = None if tipo == "todo" else (tipo,)
+        results = [r for r in catalog_index.search(texto, kinds=kinds, limit=25) if r.get("enabled", True)][:10]
+        if not results:
+            await interaction.response.send_message(f"🔍 No se encontró nada para **{texto}**.", ephemeral=True)
+            return
+
+        sections = {
+            PRODUCT: ("🛍️ Productos", "Usa `/ticket` para comprarlo"),
+            VIRTUAL: ("🪙 Tienda Virtual", "Usa `/tienda_virtual` para comprarlo"),
+            GIFT: ("🎁 Regalos de Fortnite", "Usa `/ver_tienda` para verlos")
+        }
+        embed = discord.Embed(
+            title=f"🔍 Resultados para \"{texto}\"",
+            color=0x3498DB
+        )
+        for kind, (title, hint) in sections.items():
+            lines = [f"• {r['label']}" for r in results if r["kind"] == kind]
+            if lines:
+                embed.add_field(name=title, value="\n".join(lines) + f"\n*{hint}*", inline=False)
+        embed.set_footer(text="Búsqueda • GameMid")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @buscar.autocomplete('texto')
+    async def buscar_autocomplete(interaction: discord.Interaction, current: str):
+        if not current:
+            return []
+        return [
+            app_commands.Choice(name=result["label"][:100], value=result["name"][:100])
+            for result in catalog_index.search(current, limit=25)
+        ]
+
     @tree.command(name="ver_tienda", description="Muestra los regalos disponibles de la tienda de Fortnite")
     async def ver_tienda(interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
@@ -98,7 +137,12 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             
             if cached_data:
                 logger.info("Usando datos en caché de la tienda de Fortnite")
-                data["gifts"].update(cached_data)
+                gifts = data.setdefault("gifts", {})
+                # Solo se guarda (y sube store.version("gifts")) si la caché trae cambios
+                if any(gifts.get(gift_id) != gift for gift_id, gift in cached_data.items()):
+                    gifts.update(cached_data)
+                    await store.commit(("gifts",))
+                    catalog_index.refresh_gifts()
                 sync_success = True
             else:
                 logger.info("Sincronizando datos frescos de la tienda de Fortnite")
@@ -114,7 +158,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 data["shop"] = {}
             if "gifts" not in data:
                 data["gifts"] = {}
-                save_data(data)
+                await store.commit(("gifts",))
             
             gifts = data["gifts"]
             if not gifts:
@@ -218,7 +262,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 expires_at = datetime.fromisoformat(pending["expires_at"])
                 if datetime.now() > expires_at:
                     del data["pending_verifications"][self.user_id]
-                    save_data(data)
+                    await store.commit(("pending_verifications", self.user_id))
                     await interaction.followup.send("❌ La verificación ha expirado. Usa `/vincular` nuevamente.", ephemeral=True)
                     return
                 
@@ -262,7 +306,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 
                 # Limpiar verificación pendiente
                 del data["pending_verifications"][self.user_id]
-                save_data(data)
+                await store.commit(("roblox_accounts", self.user_id), ("pending_verifications", self.user_id))
                 
                 # Crear embed de éxito con diseño mejorado
                 embed = discord.Embed(
@@ -314,7 +358,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 data = load_data()
                 if "pending_verifications" in data and self.user_id in data["pending_verifications"]:
                     del data["pending_verifications"][self.user_id]
-                    save_data(data)
+                    await store.commit(("pending_verifications", self.user_id))
                 
                 embed = discord.Embed(
                     title="❌ Verificación Cancelada",
@@ -358,7 +402,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 
                 # Eliminar la cuenta vinculada
                 del data["roblox_accounts"][self.user_id]
-                save_data(data)
+                await store.commit(("roblox_accounts", self.user_id))
                 
                 # Crear embed de confirmación
                 embed = discord.Embed(
@@ -473,7 +517,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 "expires_at": (datetime.now() + timedelta(minutes=10)).isoformat()
             }
             
-            save_data(data)
+            await store.commit(("pending_verifications", user_id))
             
             # Crear embed con diseño mejorado
             embed = discord.Embed(
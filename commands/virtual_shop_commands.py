@@ -3,6 +3,7 @@ from discord import app_commands
 from discord.ext import commands
 import logging
 from virtual_shop import virtual_shop
+from autocomplete_service import autocomplete
 from views.virtual_shop_view import VirtualShopView
 from config import OWNER_ROLE_ID
 
@@ -28,7 +29,9 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
         categoria="Categoría del producto",
         imagen_url="URL de la imagen (opcional)",
         rol_id="ID del rol a otorgar (opcional)",
-        duracion_dias="Duración en días para productos temporales (opcional)"
+        duracion_dias="Duración en días para productos temporales (opcional)",
+        stock="Unidades disponibles (opcional, sin límite si no se indica)",
+        limite_por_usuario="Máximo de compras por usuario (opcional, 0 para no permitir compras)"
     )
     @app_commands.choices(categoria=[
         app_commands.Choice(name="🎭 Roles", value="roles"),
@@ -40,7 +43,8 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
     @is_owner()
     async def añadir_producto_virtual(interaction: discord.Interaction, nombre: str, precio: int, 
                                     descripcion: str, categoria: str, imagen_url: str = None, 
-                                    rol_id: str = None, duracion_dias: int = None):
+                                    rol_id: str = None, duracion_dias: int = None,
+                                    stock: int = None, limite_por_usuario: int = None):
         """Añade un producto virtual a la tienda"""
         try:
             await interaction.response.defer()
@@ -58,6 +62,14 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
                 await interaction.followup.send("❌ La descripción no puede exceder 500 caracteres.", ephemeral=True)
                 return
             
+            if stock is not None and stock < 0:
+                await interaction.followup.send("❌ El stock no puede ser negativo.", ephemeral=True)
+                return
+            
+            if limite_por_usuario is not None and limite_por_usuario < 0:
+                await interaction.followup.send("❌ El límite por usuario no puede ser negativo.", ephemeral=True)
+                return
+            
             # Validar rol si se proporciona
             role = None
             if rol_id:
@@ -78,7 +90,9 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
                 category=categoria,
                 image_url=imagen_url,
                 role_id=rol_id,
-                duration_days=duracion_dias
+                duration_days=duracion_dias,
+                stock=stock,
+                per_user_limit=limite_por_usuario
             )
             
             # Crear embed de confirmación
@@ -101,6 +115,12 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
             if duracion_dias:
                 embed.add_field(name="⏰ Duración", value=f"{duracion_dias} días", inline=True)
             
+            if stock is not None:
+                embed.add_field(name="📦 Stock", value=f"{stock:,} unidades", inline=True)
+            
+            if limite_por_usuario is not None:
+                embed.add_field(name="👤 Límite por usuario", value=str(limite_por_usuario), inline=True)
+            
             if imagen_url:
                 embed.set_thumbnail(url=imagen_url)
             
@@ -119,12 +139,15 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
         nombre="Nuevo nombre (opcional)",
         precio="Nuevo precio (opcional)",
         descripcion="Nueva descripción (opcional)",
-        habilitado="Habilitar/deshabilitar producto"
+        habilitado="Habilitar/deshabilitar producto",
+        stock="Nuevas unidades disponibles (-1 para quitar el límite)",
+        limite_por_usuario="Máximo de compras por usuario (0 para no permitir compras, -1 para quitar el límite)"
     )
     @is_owner()
     async def editar_producto_virtual(interaction: discord.Interaction, product_id: str, 
                                      nombre: str = None, precio: int = None, 
-                                     descripcion: str = None, habilitado: bool = None):
+                                     descripcion: str = None, habilitado: bool = None,
+                                     stock: int = None, limite_por_usuario: int = None):
         """Edita un producto virtual existente"""
         try:
             await interaction.response.defer()
@@ -158,6 +181,12 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
             if habilitado is not None:
                 update_data['enabled'] = habilitado
             
+            if stock is not None:
+                update_data['stock'] = stock
+            
+            if limite_por_usuario is not None:
+                update_data['per_user_limit'] = limite_por_usuario
+            
             if not update_data:
                 await interaction.followup.send("❌ No se especificaron cambios.", ephemeral=True)
                 return
@@ -184,6 +213,10 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
                     elif field == 'enabled':
                         status = "✅ Habilitado" if value else "❌ Deshabilitado"
                         changes.append(f"🔄 Estado: {status}")
+                    elif field == 'stock':
+                        changes.append(f"📦 Stock: {value:,} unidades" if value >= 0 else "📦 Stock: sin límite")
+                    elif field == 'per_user_limit':
+                        changes.append(f"👤 Límite por usuario: {value}" if value >= 0 else "👤 Límite por usuario: sin límite")
                 
                 embed.add_field(name="Cambios realizados", value="\n".join(changes), inline=False)
                 embed.set_footer(text=f"Editado por {interaction.user.display_name}")
@@ -237,7 +270,6 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
         try:
             await interaction.response.defer()
             
-            products = virtual_shop.get_virtual_products()
             stats = virtual_shop.get_shop_stats()
             
             embed = discord.Embed(
@@ -255,13 +287,17 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
                 inline=True
             )
             
-            # Productos por categoría
-            categorized = virtual_shop.get_products_by_category()
+            # Productos e ingresos por categoría (agregados mantenidos en cada compra)
+            by_category = stats.get("by_category", {})
             category_summary = []
+            revenue_summary = []
             for category_id, category_info in virtual_shop.categories.items():
-                count = len(categorized.get(category_id, []))
+                category_stats = by_category.get(category_id, {})
+                count = category_stats.get("products", 0)
                 if count > 0:
                     category_summary.append(f"{category_info['emoji']} {category_info['name']}: {count}")
+                if category_stats.get("revenue", 0) > 0:
+                    revenue_summary.append(f"{category_info['emoji']} {category_info['name']}: {category_stats['revenue']:,}")
             
             if category_summary:
                 embed.add_field(
@@ -269,6 +305,22 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
                     value="\n".join(category_summary),
                     inline=True
                 )
+            if revenue_summary:
+                embed.add_field(
+                    name="💹 Ingresos por Categoría",
+                    value="\n".join(revenue_summary),
+                    inline=True
+                )
+            
+            # Ventas de la última semana
+            daily_sales = virtual_shop.get_daily_sales(7)
+            embed.add_field(
+                name="📅 Últimos 7 días",
+                value="\n".join(
+                    f"`{day[5:]}` 🛍️ {sales['purchases']} · 💰 {sales['revenue']:,}" for day, sales in daily_sales
+                ),
+                inline=False
+            )
             
             # Comandos disponibles
             embed.add_field(
@@ -314,6 +366,8 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
                 value = f"💰 **{product['price']:,}** GameCoins\n"
                 value += f"📂 {category_info['emoji']} {category_info['name']}\n"
                 value += f"🛍️ Compras: {product.get('purchases_count', 0)}\n"
+                if product.get('stock') is not None:
+                    value += f"📦 Stock: {product['stock']:,}\n"
                 value += f"🆔 `{product_id}`"
                 
                 embed.add_field(
@@ -334,19 +388,9 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
     @eliminar_producto_virtual.autocomplete('product_id')
     @editar_producto_virtual.autocomplete('product_id')
     async def product_autocomplete(interaction: discord.Interaction, current: str):
-        products = virtual_shop.get_virtual_products()
-        choices = []
-        
-        for product_id, product in products.items():
-            if current.lower() in product['name'].lower() or current.lower() in product_id.lower():
-                choices.append(app_commands.Choice(
-                    name=f"{product['name']} ({product['price']:,} GameCoins)",
-                    value=product_id
-                ))
-                
-                if len(choices) >= 25:  # Discord limit
-                    break
-        
-        return choices
+        return [
+            app_commands.Choice(name=name, value=product_id)
+            for name, product_id in autocomplete.products(current)
+        ]
     
     logger.info("Comandos de tienda virtual cargados exitosamente")
\ No newline at end of file
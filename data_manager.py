@@ -1,15 +1,27 @@
+import asyncio
+import atexit
 import json
+import logging
 import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import config
 from config import DATA_FILE
 
+# Backend de persistencia: "json" (archivo + journal) o "sqlite"
+STORAGE_BACKEND = getattr(config, "STORAGE_BACKEND", "json")
+SQLITE_FILE = getattr(config, "SQLITE_FILE", os.path.splitext(DATA_FILE)[0] + ".db")
+
+logger = logging.getLogger(__name__)
+
 # Global ticket counter
 TICKET_COUNTER = 0
 
-def load_data():
-    global TICKET_COUNTER
-    default_data = {
+def _default_data():
+    return {
         "users": {},
         "products": {},
         "categories": {},  
@@ -34,33 +46,686 @@ def load_data():
             }
         }
     }
+
+class DataFileCorruptedError(Exception):
+    """El archivo de datos y su respaldo están dañados."""
+
+
+def _fill_defaults(data):
+    default_data = _default_data()
+    # Ensure all keys exist
+    for key in default_data:
+        if key not in data:
+            data[key] = default_data[key]
+    return data
+
+def _read_snapshot(path):
+    """Lee una instantánea; devuelve None si no existe y lanza ValueError si está dañada."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _fsync_dir(path):
+    """Sincroniza el directorio para que el rename sobreviva a un corte de energía."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
     try:
-        with open(DATA_FILE, "r") as f:
-            data = json.load(f)
-            # Ensure all keys exist
-            for key in default_data:
-                if key not in data:
-                    data[key] = default_data[key]
-            TICKET_COUNTER = data["ticket_counter"]
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_atomic(path, payload):
+    """Escribe un archivo completo mediante archivo temporal + fsync + rename."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path):
+        # Conservar la instantánea anterior como respaldo
+        os.replace(path, f"{path}.bak")
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+def _get_path(data, path):
+    node = data
+    for key in path:
+        if not isinstance(node, dict) or key not in node:
+            return None, False
+        node = node[key]
+    return node, True
+
+def _set_path(data, path, value):
+    node = data
+    for key in path[:-1]:
+        node = node.setdefault(key, {})
+    node[path[-1]] = value
+
+def _delete_path(data, path):
+    node, found = _get_path(data, path[:-1])
+    if found and isinstance(node, dict):
+        node.pop(path[-1], None)
+
+
+class StorageBackend:
+    """Interfaz de persistencia usada por ``DataStore``.
+
+    Cada escritura tiene dos fases: ``prepare_*`` se ejecuta en el hilo del
+    event loop y serializa el estado en ese instante, y ``apply_*`` hace la
+    E/S bloqueante en el hilo de E/S del almacén. ``load`` y ``close``
+    también se ejecutan en ese hilo.
+    """
+
+    def load(self) -> dict:
+        raise NotImplementedError
+
+    def prepare_write(self, paths, data):
+        """Serializa las rutas indicadas; devuelve la carga para ``apply_write``."""
+        raise NotImplementedError
+
+    def apply_write(self, payload):
+        raise NotImplementedError
+
+    def prepare_snapshot(self, data):
+        """Serializa el estado completo; devuelve la carga para ``apply_snapshot``."""
+        raise NotImplementedError
+
+    def apply_snapshot(self, payload):
+        raise NotImplementedError
+
+    def wants_compaction(self) -> bool:
+        """Indica si conviene volcar el estado completo."""
+        return False
+
+    def has_pending(self) -> bool:
+        """Indica si hay cambios que solo se compactan al cerrar."""
+        return False
+
+    def close(self):
+        pass
+
+
+class JsonBackend(StorageBackend):
+    """Archivo JSON con journal de cambios y compactación periódica.
+
+    Los cambios puntuales se añaden como registros pequeños a un journal;
+    periódicamente el estado completo se compacta en una instantánea escrita
+    con archivo temporal + fsync + rename y el journal se vacía.
+    """
+
+    def __init__(self, path: str, compact_every: int = 1000):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.compact_every = compact_every
+        self._journal = None
+        self._journal_seq = 0
+        self._journal_records = 0
+
+    def load(self) -> dict:
+        data = self._load_snapshot()
+        self._journal_seq = data.pop("_journal_seq", 0)
+        self._replay_journal(data)
+        return data
+
+    def _load_snapshot(self) -> dict:
+        try:
+            data = _read_snapshot(self.path)
+        except ValueError as e:
+            corrupt_path = f"{self.path}.corrupt-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+            logger.error(f"Archivo de datos dañado ({e}); se conserva como {corrupt_path}")
+            os.replace(self.path, corrupt_path)
+            data = None
+            if not os.path.exists(f"{self.path}.bak"):
+                raise DataFileCorruptedError(f"{self.path} está dañado y no existe respaldo")
+        if data is None:
+            # Sin instantánea principal (primera ejecución o caída durante el rename)
+            try:
+                data = _read_snapshot(f"{self.path}.bak")
+            except ValueError as e:
+                raise DataFileCorruptedError(f"{self.path} y su respaldo están dañados: {e}")
+            if data is not None:
+                logger.warning(f"Usando la instantánea de respaldo {self.path}.bak")
+        return data if data is not None else _default_data()
+
+    def _replay_journal(self, data):
+        """Aplica los registros del journal posteriores a la instantánea."""
+        try:
+            with open(self.journal_path, "r") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        if lines and not lines[-1].endswith("\n"):
+            # Descartar el registro incompleto para que el siguiente no quede pegado a él
+            logger.warning("Se descarta un registro incompleto al final del journal")
+            lines.pop()
+            os.truncate(self.journal_path, len("".join(lines).encode()))
+        replayed = 0
+        for line_number, line in enumerate(lines, 1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"Registro del journal ilegible en la línea {line_number}, se omite")
+                continue
+            if record["seq"] <= self._journal_seq:
+                continue
+            for op in record["ops"]:
+                if op.get("deleted"):
+                    _delete_path(data, op["path"])
+                else:
+                    _set_path(data, op["path"], op["value"])
+            self._journal_seq = record["seq"]
+            replayed += 1
+        self._journal_records = replayed
+        if replayed:
+            logger.info(f"Se aplicaron {replayed} registros del journal")
+
+    def prepare_write(self, paths, data):
+        ops = []
+        for path in paths:
+            value, found = _get_path(data, path)
+            if found:
+                ops.append({"path": list(path), "value": value})
+            else:
+                ops.append({"path": list(path), "deleted": True})
+        self._journal_seq += 1
+        self._journal_records += 1
+        return json.dumps({"seq": self._journal_seq, "ops": ops}) + "\n"
+
+    def apply_write(self, line):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a")
+        self._journal.write(line)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def prepare_snapshot(self, data):
+        # Sin indentación: el codificador en C es varias veces más rápido
+        self._journal_records = 0
+        return json.dumps({**data, "_journal_seq": self._journal_seq})
+
+    def apply_snapshot(self, payload):
+        _write_atomic(self.path, payload)
+        # Los registros ya están incluidos en la instantánea
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        with open(self.journal_path, "w"):
+            pass
+
+    def wants_compaction(self) -> bool:
+        return self._journal_records >= self.compact_every
+
+    def has_pending(self) -> bool:
+        return self._journal_records > 0
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+# Colecciones que SQLite guarda como una fila por elemento:
+# ruta en el estado -> (tabla, clave primaria, columnas indexadas)
+SQLITE_TABLES = {
+    ("economy", "users"): ("economy_users", "user_id", ("coins", "level", "total_earned", "games_won")),
+    ("virtual_shop", "purchases"): ("virtual_purchases", "purchase_id", ("user_id", "product_id", "purchased_at", "active")),
+    ("tickets",): ("tickets", "ticket_id", ("user_id", "status", "estado_detallado", "timestamp")),
+    ("roblox_accounts",): ("roblox_accounts", "discord_user_id", ()),
+    ("pending_verifications",): ("pending_verifications", "discord_user_id", ("expires_at",)),
+}
+
+SQLITE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_economy_coins ON economy_users(coins DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_economy_level ON economy_users(level DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_economy_total_earned ON economy_users(total_earned DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_economy_games_won ON economy_users(games_won DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_purchases_user ON virtual_purchases(user_id, purchased_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_user_status ON tickets(user_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_verifications_expires ON pending_verifications(expires_at)",
+)
+
+
+class SqliteBackend(StorageBackend):
+    """Base de datos SQLite en modo WAL con una fila por usuario, compra y ticket.
+
+    Las colecciones grandes (``SQLITE_TABLES``) tienen tablas propias con
+    columnas indexadas; el resto del estado se guarda por clave de primer
+    nivel en la tabla ``kv``. Un ``commit`` reescribe solo las filas
+    afectadas dentro de una transacción.
+    """
+
+    def __init__(self, path: str, json_path: str = None):
+        self.path = path
+        self.json_path = json_path
+        # Solo el hilo de E/S del almacén usa la conexión, nunca en paralelo
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # FULL mantiene la durabilidad de cada commit igual que el journal JSON
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            for table, key_column, columns in SQLITE_TABLES.values():
+                extra = "".join(f", {column}" for column in columns)
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ({key_column} TEXT PRIMARY KEY{extra}, data TEXT NOT NULL)"
+                )
+            for statement in SQLITE_INDEXES:
+                self.conn.execute(statement)
+
+    def load(self) -> dict:
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'initialized'").fetchone() is None:
+            data = self._initial_data()
+            self.apply_snapshot(self.prepare_snapshot(data))
+            return data
+        data = {}
+        for key, value in self.conn.execute("SELECT key, value FROM kv"):
+            data[key] = json.loads(value)
+        for prefix, (table, key_column, _) in SQLITE_TABLES.items():
+            rows = self.conn.execute(f"SELECT {key_column}, data FROM {table} ORDER BY rowid")
+            parent = data
+            for key in prefix[:-1]:
+                parent = parent.setdefault(key, {})
+            parent[prefix[-1]] = {row_key: json.loads(row_data) for row_key, row_data in rows}
+        return data
+
+    def _initial_data(self) -> dict:
+        """Primera ejecución: importar el archivo JSON existente si lo hay."""
+        if self.json_path and any(os.path.exists(self.json_path + suffix) for suffix in ("", ".bak", ".journal")):
+            logger.info(f"Migrando {self.json_path} a {self.path}")
+            data = JsonBackend(self.json_path).load()
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)", (self.json_path,)
+                )
             return data
-    except (FileNotFoundError, json.JSONDecodeError):
-        return default_data
+        return _default_data()
 
+    @staticmethod
+    def _row(key, record, columns):
+        fields = record if isinstance(record, dict) else {}
+        return (str(key), *[fields.get(column) for column in columns], json.dumps(record))
+
+    # Las sentencias se preparan como (sql, parámetros, executemany)
+    def _upsert(self, prefix, key, record):
+        table, key_column, columns = SQLITE_TABLES[prefix]
+        names = ", ".join((key_column, *columns, "data"))
+        marks = ", ".join("?" * (len(columns) + 2))
+        return (f"INSERT OR REPLACE INTO {table} ({names}) VALUES ({marks})",
+                self._row(key, record, columns), False)
+
+    def _replace_table(self, prefix, collection):
+        table, key_column, columns = SQLITE_TABLES[prefix]
+        statements = [(f"DELETE FROM {table}", (), False)]
+        if isinstance(collection, list):
+            collection = {str(i): item for i, item in enumerate(collection)}
+        if not isinstance(collection, dict):
+            return statements
+        names = ", ".join((key_column, *columns, "data"))
+        marks = ", ".join("?" * (len(columns) + 2))
+        statements.append((
+            f"INSERT OR REPLACE INTO {table} ({names}) VALUES ({marks})",
+            [self._row(key, record, columns) for key, record in collection.items()], True
+        ))
+        return statements
+
+    def _write_kv(self, data, key):
+        if key not in data:
+            return ("DELETE FROM kv WHERE key = ?", (key,), False)
+        value = data[key]
+        # Quitar las colecciones que tienen tabla propia
+        nested = [prefix[1] for prefix in SQLITE_TABLES if len(prefix) == 2 and prefix[0] == key]
+        if nested and isinstance(value, dict):
+            value = {k: v for k, v in value.items() if k not in nested}
+        return ("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(value)), False)
+
+    def prepare_write(self, paths, data):
+        statements = []
+        written_kv = set()
+        for path in paths:
+            path = tuple(path)
+            prefix = next((p for p in SQLITE_TABLES if path[:len(p)] == p), None)
+            if prefix is not None and len(path) > len(prefix):
+                # Cambio dentro de un elemento: reescribir solo su fila
+                key = path[len(prefix)]
+                record, found = _get_path(data, prefix + (key,))
+                if found:
+                    statements.append(self._upsert(prefix, key, record))
+                else:
+                    table, key_column, _ = SQLITE_TABLES[prefix]
+                    statements.append((f"DELETE FROM {table} WHERE {key_column} = ?", (str(key),), False))
+            elif prefix is not None:
+                statements.extend(self._replace_table(prefix, _get_path(data, prefix)[0]))
+            else:
+                if path[0] not in written_kv:
+                    # Varias rutas bajo la misma clave comparten una sola fila kv
+                    written_kv.add(path[0])
+                    statements.append(self._write_kv(data, path[0]))
+                # Una ruta padre (p. ej. ("economy",)) también cubre sus tablas
+                for nested in SQLITE_TABLES:
+                    if nested[:len(path)] == path:
+                        statements.extend(self._replace_table(nested, _get_path(data, nested)[0]))
+        return statements
+
+    def apply_write(self, statements):
+        with self.conn:
+            for sql, params, many in statements:
+                if many:
+                    self.conn.executemany(sql, params)
+                else:
+                    self.conn.execute(sql, params)
+
+    def prepare_snapshot(self, data):
+        statements = [("DELETE FROM kv", (), False)]
+        for key in data:
+            if (key,) not in SQLITE_TABLES:
+                statements.append(self._write_kv(data, key))
+        for prefix in SQLITE_TABLES:
+            statements.extend(self._replace_table(prefix, _get_path(data, prefix)[0]))
+        statements.append(("INSERT OR REPLACE INTO meta (key, value) VALUES ('initialized', '1')", (), False))
+        return statements
+
+    def apply_snapshot(self, statements):
+        self.apply_write(statements)
+
+    def close(self):
+        self.conn.close()
+
+
+def create_backend(kind: str = None) -> StorageBackend:
+    """Crea el backend configurado en ``STORAGE_BACKEND`` ("json" o "sqlite")."""
+    kind = (kind or STORAGE_BACKEND).lower()
+    if kind == "json":
+        return JsonBackend(DATA_FILE)
+    if kind == "sqlite":
+        return SqliteBackend(SQLITE_FILE, json_path=DATA_FILE)
+    raise ValueError(f"STORAGE_BACKEND desconocido: {kind}")
+
+def migrate_json_to_sqlite(json_path: str = DATA_FILE, sqlite_path: str = SQLITE_FILE) -> int:
+    """Copia el archivo JSON (instantánea + journal) a una base SQLite nueva o existente.
+
+    Devuelve el número de usuarios de la economía migrados.
+    """
+    data = _fill_defaults(JsonBackend(json_path).load())
+    backend = SqliteBackend(sqlite_path)
+    try:
+        backend.apply_snapshot(backend.prepare_snapshot(data))
+        with backend.conn:
+            backend.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)", (json_path,)
+            )
+    finally:
+        backend.close()
+    migrated = len(data.get("economy", {}).get("users", {}))
+    logger.info(f"Migración a SQLite completada: {migrated} usuarios de economía")
+    return migrated
+
+
+class DataStore:
+    """Estado global del bot en memoria con persistencia segura ante caídas.
+
+    El estado se lee una sola vez y las lecturas se sirven desde memoria.
+    Los cambios puntuales (``commit``) se persisten en el backend
+    configurado tocando solo las rutas indicadas; los cambios masivos
+    (``mark_dirty``) se vuelcan completos tras un breve retraso.
+
+    Toda la E/S del backend corre en un único hilo dedicado, de modo que las
+    escrituras se aplican en orden sin bloquear el event loop. Dentro del
+    loop, ``commit`` devuelve un awaitable que se completa cuando el cambio
+    ya está en disco.
+
+    Si ``observer`` está definido se llama como ``observer(operación, segundos)``
+    tras cada acceso al almacén, para medir cuánto tiempo pasa cada comando
+    esperando al almacenamiento.
+
+    ``version(sección)`` cambia cada vez que se confirma un cambio en esa
+    sección del estado (p. ej. ``"products"``), para que las cachés sepan
+    si lo que guardaron sigue al día.
+    """
+
+    def __init__(self, backend_factory=create_backend, flush_delay: float = 2.0):
+        self._backend_factory = backend_factory
+        self.backend = None
+        self.flush_delay = flush_delay
+        self._data = None
+        self._dirty = False
+        self._flush_handle = None
+        self._executor = None
+        self.observer = None
+        self._versions = {}
+        self._generation = 0
+
+    @property
+    def data(self) -> dict:
+        return self.load()
+
+    def _observe(self, operation: str, started: float):
+        if self.observer is not None:
+            self.observer(operation, time.perf_counter() - started)
+
+    def _observe_future(self, operation: str, started: float, future):
+        """Mide una escritura asíncrona desde que se encola hasta que llega al disco."""
+        if self.observer is not None:
+            future.add_done_callback(lambda f: self._observe(operation, started))
+        return future
+
+    def _io(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="data-io")
+        return self._executor
+
+    @staticmethod
+    def _run_io(fn, *args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            logger.error(f"Error de E/S en el almacén de datos: {e}")
+            raise
+
+    def _submit(self, fn, *args):
+        """Ejecuta ``fn`` en el hilo de E/S.
+
+        Dentro del event loop devuelve un future de asyncio sin esperar;
+        fuera de él espera el resultado y lo devuelve.
+        """
+        future = self._io().submit(self._run_io, fn, *args)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return future.result()
+        wrapped = asyncio.wrap_future(future, loop=loop)
+        # El error ya se registró en el hilo de E/S; no avisar si nadie lo espera
+        wrapped.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return wrapped
+
+    def _read_backend(self) -> dict:
+        if self._data is not None:
+            return self._data
+        if self.backend is None:
+            self.backend = self._backend_factory()
+        return self.backend.load()
+
+    def _set_loaded(self, data) -> dict:
+        global TICKET_COUNTER
+        if self._data is None:
+            self._data = _fill_defaults(data)
+            TICKET_COUNTER = self._data["ticket_counter"]
+        return self._data
+
+    def load(self) -> dict:
+        """Carga el estado la primera vez y devuelve el diccionario compartido."""
+        started = time.perf_counter()
+        if self._data is None:
+            self._set_loaded(self._io().submit(self._read_backend).result())
+        self._observe("load", started)
+        return self._data
+
+    async def load_async(self) -> dict:
+        """Como ``load`` pero sin bloquear el event loop durante la lectura inicial."""
+        started = time.perf_counter()
+        if self._data is None:
+            data = await asyncio.get_running_loop().run_in_executor(self._io(), self._read_backend)
+            self._set_loaded(data)
+        self._observe("load", started)
+        return self._data
+
+    async def get(self, *path, default=None):
+        """Devuelve el valor en ``path`` (p. ej. ``"tickets", ticket_id``) o ``default``."""
+        value, found = _get_path(await self.load_async(), path)
+        return value if found else default
+
+    async def get_user(self, user_id: str):
+        """Devuelve el registro económico de un usuario o None si no tiene."""
+        return await self.get("economy", "users", user_id)
+
+    def version(self, section: str):
+        """Versión de una sección del estado; cambia con cada commit que la toca."""
+        return self._generation, self._versions.get(section, 0)
+
+    def bump_versions(self):
+        """Cambia la versión de todas las secciones (tras modificar el estado completo)."""
+        self._generation += 1
+
+    def commit(self, *paths):
+        """Persiste solo las rutas indicadas como un cambio atómico.
+
+        Cada ruta es una tupla de claves (p. ej. ``("economy", "users", user_id)``);
+        se guarda su valor actual en memoria o su eliminación si ya no existe.
+        El valor se serializa en el momento de la llamada y la escritura se
+        hace en el hilo de E/S.
+        """
+        data = self.load()
+        if not paths:
+            return None
+        started = time.perf_counter()
+        for path in paths:
+            self._versions[path[0]] = self._versions.get(path[0], 0) + 1
+        payload = self.backend.prepare_write(paths, data)
+        if self.backend.wants_compaction():
+            self.mark_dirty()
+        result = self._submit(self.backend.apply_write, payload)
+        if isinstance(result, asyncio.Future):
+            return self._observe_future("commit", started, result)
+        self._observe("commit", started)
+        return result
+
+    def mark_dirty(self):
+        """Marca el estado completo como modificado y programa un volcado."""
+        started = time.perf_counter()
+        self._dirty = True
+        self._schedule_flush()
+        self._observe("save", started)
+
+    def _schedule_flush(self):
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sin event loop (scripts, migraciones): escribir de inmediato
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self.flush_delay, self._flush_from_loop)
+
+    def _flush_from_loop(self):
+        self._flush_handle = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error al guardar los datos: {e}")
+            # Reintentar en el siguiente ciclo
+            self._schedule_flush()
+
+    def _snapshot_done(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            # Reintentar el volcado completo
+            self.mark_dirty()
+
+    def flush(self):
+        """Vuelca el estado completo en el backend."""
+        if not self._dirty or self._data is None:
+            return None
+        started = time.perf_counter()
+        self._data["ticket_counter"] = TICKET_COUNTER
+        payload = self.backend.prepare_snapshot(self._data)
+        self._dirty = False
+        try:
+            result = self._submit(self.backend.apply_snapshot, payload)
+        except Exception:
+            self._dirty = True
+            raise
+        if isinstance(result, asyncio.Future):
+            result.add_done_callback(self._snapshot_done)
+            return self._observe_future("flush", started, result)
+        self._observe("flush", started)
+        return result
+
+    def drain(self):
+        """Espera a que terminen las escrituras ya encoladas.
+
+        Dentro del event loop devuelve un future de asyncio; fuera de él
+        bloquea hasta que el hilo de E/S las haya aplicado.
+        """
+        return self._submit(lambda: None)
+
+    def close(self):
+        """Cancela el volcado programado, compacta los cambios pendientes y cierra el backend."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._executor is not None:
+            # Esperar a que el hilo de E/S termine todas las escrituras en cola
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.backend is None:
+            return
+        if self._dirty or self.backend.has_pending():
+            # El volcado final se hace en este hilo: al salir del intérprete
+            # el ejecutor ya no acepta trabajos
+            self._data["ticket_counter"] = TICKET_COUNTER
+            self.backend.apply_snapshot(self.backend.prepare_snapshot(self._data))
+            self._dirty = False
+        self.backend.close()
+        self.backend = None
+        self._data = None
+
+
+# Instancia global del almacén de datos
+store = DataStore()
+atexit.register(store.close)
+
+def load_data():
+    """Devuelve el estado compartido en memoria (se lee del disco una sola vez)."""
+    return store.load()
 
 def update_product_availability(product_id, is_available):
     """Actualiza la disponibilidad de un producto."""
     data = load_data()
     if product_id in data["products"]:
         data["products"][product_id]["available"] = is_available
-        save_data(data)
+        store.commit(("products", product_id))
         return True
     return False
 
 def save_data(data):
+    """Marca todo el estado como modificado; se persiste en la siguiente instantánea.
+
+    Para cambios puntuales es preferible ``store.commit(ruta)``, que solo
+    añade un registro pequeño al journal.
+    """
     global TICKET_COUNTER
     data["ticket_counter"] = TICKET_COUNTER
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    store.bump_versions()
+    store.mark_dirty()
 
 def get_next_ticket_id():
     """Obtiene el siguiente ID de ticket disponible."""
@@ -68,7 +733,7 @@ def get_next_ticket_id():
     TICKET_COUNTER += 1
     data = load_data()
     data["ticket_counter"] = TICKET_COUNTER
-    save_data(data)
+    store.commit(("ticket_counter",))
     return TICKET_COUNTER
 
 def get_category_by_id(category_id: str):
@@ -94,7 +759,7 @@ def add_category(name: str, description: str = "", icon: str = ""):
         "products": []  # Lista de IDs de productos en esta categoría
     }
     
-    save_data(data)
+    store.commit(("categories", category_id))
     return category_id
 
 def update_category(category_id: str, name: str = None, description: str = None, icon: str = None):
@@ -110,7 +775,7 @@ def update_category(category_id: str, name: str = None, description: str = None,
     if icon is not None:
         data['categories'][category_id]['icon'] = icon
         
-    save_data(data)
+    store.commit(("categories", category_id))
     return True
 
 def delete_category(category_id: str):
@@ -120,12 +785,14 @@ def delete_category(category_id: str):
         return False
         
     # Eliminar la categoría de todos los productos asociados
+    changed = [("categories", category_id)]
     for product_id in data['categories'][category_id]['products']:
         if product_id in data['products']:
             data['products'][product_id]['category_id'] = None
+            changed.append(("products", product_id))
             
     del data['categories'][category_id]
-    save_data(data)
+    store.commit(*changed)
     return True
 
 def assign_product_to_category(product_id: str, category_id: str):
@@ -135,16 +802,18 @@ def assign_product_to_category(product_id: str, category_id: str):
         return False
         
     # Remover el producto de su categoría actual si tiene una
+    changed = [("products", product_id), ("categories", category_id)]
     current_category_id = data['products'][product_id].get('category_id')
     if current_category_id and current_category_id in data['categories']:
         data['categories'][current_category_id]['products'].remove(product_id)
+        changed.append(("categories", current_category_id))
         
     # Asignar el producto a la nueva categoría
     data['products'][product_id]['category_id'] = category_id
     if product_id not in data['categories'][category_id]['products']:
         data['categories'][category_id]['products'].append(product_id)
         
-    save_data(data)
+    store.commit(*changed)
     return True
 
 # Funciones para manejar cuentas de Roblox
@@ -160,7 +829,7 @@ def link_roblox_account(discord_user_id: str, roblox_data: dict):
         data['roblox_accounts'] = {}
     
     data['roblox_accounts'][discord_user_id] = roblox_data
-    save_data(data)
+    store.commit(('roblox_accounts', discord_user_id))
     return True
 
 def unlink_roblox_account(discord_user_id: str):
@@ -168,7 +837,7 @@ def unlink_roblox_account(discord_user_id: str):
     data = load_data()
     if 'roblox_accounts' in data and discord_user_id in data['roblox_accounts']:
         del data['roblox_accounts'][discord_user_id]
-        save_data(data)
+        store.commit(('roblox_accounts', discord_user_id))
         return True
     return False
 
@@ -184,7 +853,7 @@ def add_pending_verification(discord_user_id: str, verification_data: dict):
         data['pending_verifications'] = {}
     
     data['pending_verifications'][discord_user_id] = verification_data
-    save_data(data)
+    store.commit(('pending_verifications', discord_user_id))
     return True
 
 def remove_pending_verification(discord_user_id: str):
@@ -192,7 +861,7 @@ def remove_pending_verification(discord_user_id: str):
     data = load_data()
     if 'pending_verifications' in data and discord_user_id in data['pending_verifications']:
         del data['pending_verifications'][discord_user_id]
-        save_data(data)
+        store.commit(('pending_verifications', discord_user_id))
         return True
     return False
 
@@ -223,6 +892,6 @@ def cleanup_expired_verifications():
         del data['pending_verifications'][key]
     
     if expired_keys:
-        save_data(data)
+        store.commit(*[('pending_verifications', key) for key in expired_keys])
     
     return len(expired_keys)
\ No newline at end of file
@@ -1,11 +1,264 @@
+import bisect
+import copy
 import json
 import random
 import asyncio
+import weakref
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from data_manager import load_data, save_data
-import discord
-from discord import app_commands
+from typing import Callable, Dict, List, Optional, Tuple
+from data_manager import load_data, store
+
+class LeaderboardIndex:
+    """Ranking ordenado por categoría mantenido de forma incremental.
+
+    Cada categoría guarda una lista ordenada de claves
+    ``(-valor, orden_de_alta, user_id)``; el desempate por orden de alta
+    reproduce el orden estable del ``sorted`` original. El top-N se lee
+    recorriendo la lista y el rango de un usuario se obtiene con búsqueda
+    binaria.
+    """
+
+    CATEGORIES = ("coins", "level", "total_earned", "games_won")
+
+    def __init__(self):
+        self._users = None
+        self._order: Dict[str, int] = {}
+        self._keys: Dict[str, Dict[str, Tuple]] = {}
+        self._sorted: Dict[str, List[Tuple]] = {}
+
+    def _ensure_built(self, users: Dict):
+        # Reconstruir si el estado se volvió a cargar desde disco
+        if self._users is users:
+            return
+        self._users = users
+        self._order = {user_id: i for i, user_id in enumerate(users)}
+        self._keys = {category: {} for category in self.CATEGORIES}
+        self._sorted = {}
+        for category in self.CATEGORIES:
+            keys = self._keys[category]
+            for user_id, user_data in users.items():
+                keys[user_id] = (-user_data[category], self._order[user_id], user_id)
+            self._sorted[category] = sorted(keys.values())
+
+    def update(self, users: Dict, user_id: str):
+        """Reubica a un usuario tras cambiar su registro (o lo quita si ya no existe)"""
+        if self._users is not users:
+            # Aún no construido o estado recargado: se hará completo en la próxima consulta
+            return
+        user_data = users.get(user_id)
+        if user_data is not None and user_id not in self._order:
+            self._order[user_id] = len(self._order)
+        for category in self.CATEGORIES:
+            keys = self._keys[category]
+            ordered = self._sorted[category]
+            old_key = keys.pop(user_id, None)
+            new_key = None
+            if user_data is not None:
+                new_key = (-user_data[category], self._order[user_id], user_id)
+                keys[user_id] = new_key
+            if old_key == new_key:
+                continue
+            if old_key is not None:
+                del ordered[bisect.bisect_left(ordered, old_key)]
+            if new_key is not None:
+                bisect.insort(ordered, new_key)
+
+    def top(self, users: Dict, category: str, limit: int) -> List[str]:
+        self._ensure_built(users)
+        return [user_id for _, _, user_id in self._sorted[category][:limit]]
+
+    def rank(self, users: Dict, category: str, user_id: str) -> Optional[int]:
+        self._ensure_built(users)
+        key = self._keys[category].get(user_id)
+        if key is None:
+            return None
+        return bisect.bisect_left(self._sorted[category], key) + 1
+
+
+class EconomyTransaction:
+    """Agrupa los cambios económicos de una operación en un único commit.
+
+    Uso asíncrono: toma un lock por usuario, siempre en el mismo orden para
+    evitar interbloqueos, y lo mantiene aunque el bloque haga ``await``::
+
+        async with economy.transaction(user_a, user_b) as tx:
+            if tx.debit(user_a, 100, "Transferencia"):
+                tx.credit(user_b, 100, "Transferencia")
+
+    Uso síncrono (``with``): para bloques que no ceden el control al event
+    loop y que por tanto ya son atómicos respecto al resto del bot. El
+    bloque no debe contener ``await`` (no hay ``async`` que lo permita) y,
+    como no puede esperar a los locks, falla con ``RuntimeError`` si una
+    transacción asíncrona sobre alguno de sus usuarios está a medias.
+
+    Al salir sin errores se guardan juntos todos los registros tocados; si
+    el bloque lanza una excepción se restauran y no se guarda nada. Los
+    cambios hechos en el bloque fuera de la economía se deshacen con las
+    funciones registradas en ``on_rollback``.
+    """
+
+    def __init__(self, economy: "EconomySystem", user_ids):
+        self.economy = economy
+        self.user_ids = sorted(set(user_ids))
+        self.result = None  # Escritura pendiente (awaitable dentro del event loop)
+        self._locks = []
+        self._originals = {}
+        self._paths = []
+        self._undo = []
+        # Progreso de tareas retirado de la cola en esta transacción
+        self._taken_progress: Dict[str, Dict[str, int]] = {}
+
+    def user(self, user_id: str) -> Dict:
+        """Registro económico del usuario dentro de la transacción"""
+        user_economy, created = self.economy._ensure_user(user_id)
+        if user_id not in self._originals:
+            self._originals[user_id] = None if created else copy.deepcopy(user_economy)
+        if created:
+            self._touch_user(user_id)
+        return user_economy
+
+    def balance(self, user_id: str) -> int:
+        return self.user(user_id)["coins"]
+
+    def debit(self, user_id: str, amount: int, reason: str = "Unknown") -> bool:
+        """Descuenta GameCoins si el saldo alcanza; devuelve False si no"""
+        user_economy = self.user(user_id)
+        if user_economy["coins"] < amount:
+            return False
+        user_economy["coins"] -= amount
+        user_economy["total_spent"] += amount
+        self._touch_user(user_id)
+        return True
+
+    def credit(self, user_id: str, amount: int, reason: str = "Unknown") -> int:
+        """Añade GameCoins (con XP y bonus de nivel) y devuelve el nuevo saldo"""
+        user_economy = self.user(user_id)
+        user_economy["coins"] += amount
+        user_economy["total_earned"] += amount
+        
+        # Añadir XP (1 XP por cada 10 coins ganados)
+        xp_gained = amount // 10
+        user_economy["xp"] += xp_gained
+        
+        # Verificar subida de nivel
+        old_level = user_economy["level"]
+        new_level = self.economy._calculate_level(user_economy["xp"])
+        if new_level > old_level:
+            user_economy["level"] = new_level
+            # Bonus por subir de nivel
+            bonus = new_level * 50
+            user_economy["coins"] += bonus
+            user_economy["total_earned"] += bonus
+        
+        self._touch_user(user_id)
+        return user_economy["coins"]
+
+    def record_game(self, user_id: str, won: bool, streak: bool = True):
+        """Actualiza las estadísticas de juegos del usuario"""
+        user_economy = self.user(user_id)
+        user_economy["games_played"] += 1
+        if won:
+            user_economy["games_won"] += 1
+        if streak:
+            user_economy["streak"] = user_economy["streak"] + 1 if won else 0
+        self._touch_user(user_id)
+
+    def daily_tasks(self, user_id: str) -> Dict:
+        """Tareas del día del usuario, con el progreso acumulado ya aplicado"""
+        self.user(user_id)
+        daily_tasks, updated = self.economy._load_daily_tasks(user_id)
+        taken = self.economy._take_pending_progress(user_id).get(user_id, {})
+        if taken:
+            self._taken_progress[user_id] = taken
+        for task_id, amount in taken.items():
+            if self.economy._apply_task_progress(daily_tasks, task_id, amount):
+                updated = True
+        if updated:
+            self._touch_user(user_id)
+        return daily_tasks
+
+    def progress_task(self, user_id: str, task_id: str, amount: int = 1) -> bool:
+        """Suma progreso a una tarea diaria; devuelve False si ya estaba completada"""
+        if task_id not in self.economy.daily_tasks:
+            return False
+        if self.economy._apply_task_progress(self.daily_tasks(user_id), task_id, amount):
+            self._touch_user(user_id)
+            return True
+        return False
+
+    def touch(self, *paths):
+        """Incluye rutas adicionales del estado (p. ej. una compra) en el commit"""
+        for path in paths:
+            if path not in self._paths:
+                self._paths.append(path)
+
+    def on_rollback(self, undo: Callable[[], None]):
+        """Registra cómo deshacer un cambio fuera de la economía (p. ej. una compra) si se revierte"""
+        self._undo.append(undo)
+
+    def _touch_user(self, user_id: str):
+        self.touch(("economy", "users", user_id))
+
+    def commit(self):
+        if self._paths:
+            self.result = store.commit(*self._paths)
+            users = load_data()["economy"]["users"]
+            for path in self._paths:
+                if path[:2] == ("economy", "users"):
+                    self.economy.leaderboard.update(users, path[2])
+            self._paths = []
+        self._originals = {}
+        self._undo = []
+        self._taken_progress = {}
+
+    def rollback(self):
+        users = load_data()["economy"]["users"]
+        for user_id, original in self._originals.items():
+            if original is None:
+                users.pop(user_id, None)
+            elif user_id in users:
+                # Restaurar en el mismo dict para no invalidar referencias
+                users[user_id].clear()
+                users[user_id].update(original)
+        # Deshacer en orden inverso los cambios registrados con on_rollback
+        for undo in reversed(self._undo):
+            undo()
+        # El progreso aplicado a los registros restaurados vuelve a la cola
+        self.economy._restore_pending_progress(self._taken_progress)
+        self._originals = {}
+        self._paths = []
+        self._undo = []
+        self._taken_progress = {}
+
+    def __enter__(self) -> "EconomyTransaction":
+        for user_id in self.user_ids:
+            lock = self.economy._user_locks.get(user_id)
+            if lock is not None and lock.locked():
+                raise RuntimeError(f"Hay otra operación en curso para el usuario {user_id}; inténtalo de nuevo")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    async def __aenter__(self) -> "EconomyTransaction":
+        for user_id in self.user_ids:
+            lock = self.economy._user_lock(user_id)
+            await lock.acquire()
+            self._locks.append(lock)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            return self.__exit__(exc_type, exc, tb)
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+            self._locks = []
+
 
 class EconomySystem:
     def __init__(self):
@@ -55,10 +308,43 @@ class EconomySystem:
             "blackjack": {"name": "🃏 Blackjack", "min_bet": 30, "max_bet": 800},
             "roulette": {"name": "🎯 Ruleta", "min_bet": 25, "max_bet": 600}
         }
+        
+        # Progreso de tareas acumulado en memoria: usuario -> tarea -> incremento
+        self._pending_progress: Dict[str, Dict[str, int]] = {}
+        self._pending_day: Optional[str] = None
+        self._pending_events = 0
+        self._progress_flush_handle = None
+        self.progress_flush_interval = 5.0  # segundos
+        self.progress_flush_events = 500
+        
+        # Locks por usuario para las transacciones asíncronas
+        self._user_locks = weakref.WeakValueDictionary()
+        
+        # Ranking incremental por categoría
+        self.leaderboard = LeaderboardIndex()
+
+    def transaction(self, *user_ids: str) -> EconomyTransaction:
+        """Abre una transacción sobre los usuarios indicados (ver ``EconomyTransaction``)"""
+        return EconomyTransaction(self, user_ids)
+
+    def _user_lock(self, user_id: str) -> asyncio.Lock:
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._user_locks[user_id] = lock
+        return lock
 
     def get_user_economy(self, user_id: str) -> Dict:
         """Obtiene los datos económicos de un usuario"""
-        # Siempre cargar datos frescos
+        # El estado vive en memoria: el registro devuelto es el compartido
+        user_economy, created = self._ensure_user(user_id)
+        if created:
+            store.commit(("economy", "users", user_id))
+            self.leaderboard.update(load_data()["economy"]["users"], user_id)
+        return user_economy
+
+    def _ensure_user(self, user_id: str) -> Tuple[Dict, bool]:
+        """Devuelve el registro del usuario creándolo si no existe (sin guardar)"""
         data = load_data()
         if "economy" not in data:
             data["economy"] = {
@@ -74,96 +360,40 @@ class EconomySystem:
         if "users" not in data["economy"]:
             data["economy"]["users"] = {}
         
-        if user_id not in data["economy"]["users"]:
-            data["economy"]["users"][user_id] = {
-                "coins": 100,  # GameCoins iniciales
-                "level": 1,
-                "xp": 0,
-                "daily_tasks": {},
-                "last_daily": None,
-                "job": None,
-                "last_work": None,
-                "total_earned": 100,
-                "total_spent": 0,
-                "games_played": 0,
-                "games_won": 0,
-                "streak": 0,
-                "achievements": [],
-                "created_at": datetime.now().isoformat()
-            }
-            save_data(data)
-        
-        # Devolver una copia fresca de los datos
-        fresh_data = load_data()
-        return fresh_data["economy"]["users"][user_id]
+        if user_id in data["economy"]["users"]:
+            return data["economy"]["users"][user_id], False
+        
+        data["economy"]["users"][user_id] = {
+            "coins": 100,  # GameCoins iniciales
+            "level": 1,
+            "xp": 0,
+            "daily_tasks": {},
+            "last_daily": None,
+            "job": None,
+            "last_work": None,
+            "total_earned": 100,
+            "total_spent": 0,
+            "games_played": 0,
+            "games_won": 0,
+            "streak": 0,
+            "achievements": [],
+            "created_at": datetime.now().isoformat()
+        }
+        return data["economy"]["users"][user_id], True
+
+    def get_balance(self, user_id: str) -> int:
+        """Obtiene el saldo de GameCoins de un usuario"""
+        return self.get_user_economy(user_id)["coins"]
 
     def add_coins(self, user_id: str, amount: int, reason: str = "Unknown") -> int:
         """Añade GameCoins a un usuario"""
-        data = load_data()
-        user_economy = self.get_user_economy(user_id)
-        user_economy["coins"] += amount
-        user_economy["total_earned"] += amount
-        
-        # Añadir XP (1 XP por cada 10 coins ganados)
-        xp_gained = amount // 10
-        user_economy["xp"] += xp_gained
-        
-        # Verificar subida de nivel
-        old_level = user_economy["level"]
-        new_level = self._calculate_level(user_economy["xp"])
-        if new_level > old_level:
-            user_economy["level"] = new_level
-            # Bonus por subir de nivel
-            bonus = new_level * 50
-            user_economy["coins"] += bonus
-            user_economy["total_earned"] += bonus
-        
-        data["economy"]["users"][user_id] = user_economy
-        save_data(data)
-        return user_economy["coins"]
+        with self.transaction(user_id) as tx:
+            return tx.credit(user_id, amount, reason)
 
     def remove_coins(self, user_id: str, amount: int, reason: str = "Unknown") -> bool:
         """Remueve GameCoins de un usuario"""
-        # Cargar datos frescos para evitar condiciones de carrera
-        data = load_data()
-        
-        # Asegurar que la estructura existe
-        if "economy" not in data:
-            data["economy"] = {"users": {}}
-        if "users" not in data["economy"]:
-            data["economy"]["users"] = {}
-        
-        # Obtener datos del usuario directamente de data
-        if user_id not in data["economy"]["users"]:
-            # Crear usuario si no existe
-            data["economy"]["users"][user_id] = {
-                "coins": 100,
-                "level": 1,
-                "xp": 0,
-                "daily_tasks": {},
-                "last_daily": None,
-                "job": None,
-                "last_work": None,
-                "total_earned": 100,
-                "total_spent": 0,
-                "games_played": 0,
-                "games_won": 0,
-                "streak": 0,
-                "achievements": [],
-                "created_at": datetime.now().isoformat()
-            }
-        
-        user_economy = data["economy"]["users"][user_id]
-        
-        if user_economy["coins"] >= amount:
-            user_economy["coins"] -= amount
-            user_economy["total_spent"] += amount
-            
-            # Guardar inmediatamente y forzar escritura
-            save_data(data)
-            return True
-        
-        return False
+        with self.transaction(user_id) as tx:
+            return tx.debit(user_id, amount, reason)
 
     def _calculate_level(self, xp: int) -> int:
         """Calcula el nivel basado en XP"""
@@ -171,6 +401,17 @@ class EconomySystem:
 
     def get_daily_tasks(self, user_id: str) -> Dict:
         """Obtiene las tareas diarias del usuario"""
+        if user_id in self._pending_progress:
+            # Aplicar antes el progreso acumulado para mostrar el estado real
+            self.flush_task_progress(user_id)
+        
+        daily_tasks, updated = self._load_daily_tasks(user_id)
+        if updated:
+            store.commit(("economy", "users", user_id))
+        return daily_tasks
+
+    def _load_daily_tasks(self, user_id: str) -> Tuple[Dict, bool]:
+        """Devuelve las tareas del día del usuario y si hubo que reiniciarlas o completarlas"""
         user_economy = self.get_user_economy(user_id)
         today = datetime.now().date().isoformat()
         
@@ -184,38 +425,26 @@ class EconomySystem:
                     "claimed": False
                 }
             user_economy["last_daily"] = today
-            
-            data = load_data()
-            data["economy"]["users"][user_id] = user_economy
-            save_data(data)
-        else:
-            # Verificar si hay nuevas tareas que agregar
-            if "daily_tasks" not in user_economy:
-                user_economy["daily_tasks"] = {}
-            
-            updated = False
-            for task_id, task_info in self.daily_tasks.items():
-                if task_id not in user_economy["daily_tasks"]:
-                    user_economy["daily_tasks"][task_id] = {
-                        "progress": 0,
-                        "completed": False,
-                        "claimed": False
-                    }
-                    updated = True
-            
-            if updated:
-                data = load_data()
-                data["economy"]["users"][user_id] = user_economy
-                save_data(data)
+            return user_economy["daily_tasks"], True
         
-        return user_economy["daily_tasks"]
-
-    def update_task_progress(self, user_id: str, task_id: str, amount: int = 1) -> bool:
-        """Actualiza el progreso de una tarea"""
-        if task_id not in self.daily_tasks:
-            return False
+        # Verificar si hay nuevas tareas que agregar
+        if "daily_tasks" not in user_economy:
+            user_economy["daily_tasks"] = {}
+        
+        updated = False
+        for task_id, task_info in self.daily_tasks.items():
+            if task_id not in user_economy["daily_tasks"]:
+                user_economy["daily_tasks"][task_id] = {
+                    "progress": 0,
+                    "completed": False,
+                    "claimed": False
+                }
+                updated = True
         
-        daily_tasks = self.get_daily_tasks(user_id)
+        return user_economy["daily_tasks"], updated
+
+    def _apply_task_progress(self, daily_tasks: Dict, task_id: str, amount: int) -> bool:
+        """Suma progreso a una tarea sin guardar; devuelve False si ya estaba completada"""
         task = daily_tasks.get(task_id)
         
         if task and not task["completed"]:
@@ -225,29 +454,112 @@ class EconomySystem:
             if task["progress"] >= target:
                 task["progress"] = target
                 task["completed"] = True
-            
-            data = load_data()
-            data["economy"]["users"][user_id]["daily_tasks"] = daily_tasks
-            save_data(data)
             return True
         
         return False
 
+    def update_task_progress(self, user_id: str, task_id: str, amount: int = 1) -> bool:
+        """Actualiza el progreso de una tarea"""
+        if task_id not in self.daily_tasks:
+            return False
+        
+        with self.transaction(user_id) as tx:
+            return tx.progress_task(user_id, task_id, amount)
+
+    def queue_task_progress(self, user_id: str, task_id: str, amount: int = 1):
+        """Acumula progreso de una tarea y lo guarda por lotes.
+
+        Pensado para eventos muy frecuentes (mensajes, reacciones, comandos):
+        los incrementos se agrupan por usuario y se aplican juntos cada
+        ``progress_flush_interval`` segundos o cada ``progress_flush_events``
+        eventos, con un único commit para todo el lote.
+        """
+        if task_id not in self.daily_tasks:
+            return
+        
+        today = datetime.now().date().isoformat()
+        if self._pending_day != today:
+            # El progreso del día anterior se perdería igualmente al reiniciar las tareas
+            self._pending_progress.clear()
+            self._pending_events = 0
+            self._pending_day = today
+        
+        user_pending = self._pending_progress.setdefault(user_id, {})
+        user_pending[task_id] = user_pending.get(task_id, 0) + amount
+        self._pending_events += 1
+        
+        if self._pending_events >= self.progress_flush_events:
+            self.flush_task_progress()
+        else:
+            self._schedule_progress_flush()
+
+    def _schedule_progress_flush(self):
+        if self._progress_flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sin event loop: aplicar de inmediato
+            self.flush_task_progress()
+            return
+        self._progress_flush_handle = loop.call_later(self.progress_flush_interval, self.flush_task_progress)
+
+    def _take_pending_progress(self, user_id: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Retira el progreso acumulado (de un usuario o de todos) para aplicarlo"""
+        if self._pending_day != datetime.now().date().isoformat():
+            # Incrementos de un día que ya terminó
+            self._pending_progress.clear()
+        
+        if user_id is None:
+            batch = self._pending_progress
+            self._pending_progress = {}
+        else:
+            increments = self._pending_progress.pop(user_id, None)
+            batch = {user_id: increments} if increments else {}
+        if not self._pending_progress:
+            self._pending_events = 0
+        return batch
+
+    def _restore_pending_progress(self, batch: Dict[str, Dict[str, int]]):
+        """Devuelve a la cola el progreso retirado por una transacción revertida"""
+        if not batch or self._pending_day != datetime.now().date().isoformat():
+            return
+        for user_id, increments in batch.items():
+            user_pending = self._pending_progress.setdefault(user_id, {})
+            for task_id, amount in increments.items():
+                user_pending[task_id] = user_pending.get(task_id, 0) + amount
+                self._pending_events += 1
+        self._schedule_progress_flush()
+
+    def flush_task_progress(self, user_id: Optional[str] = None):
+        """Aplica el progreso acumulado (de un usuario o de todos) en un único commit"""
+        if user_id is None and self._progress_flush_handle is not None:
+            self._progress_flush_handle.cancel()
+        if user_id is None:
+            self._progress_flush_handle = None
+        
+        changed = []
+        for batch_user_id, increments in self._take_pending_progress(user_id).items():
+            daily_tasks, updated = self._load_daily_tasks(batch_user_id)
+            for task_id, amount in increments.items():
+                if self._apply_task_progress(daily_tasks, task_id, amount):
+                    updated = True
+            if updated:
+                changed.append(("economy", "users", batch_user_id))
+        
+        if changed:
+            store.commit(*changed)
+
     def claim_task_reward(self, user_id: str, task_id: str) -> Optional[int]:
         """Reclama la recompensa de una tarea completada"""
-        daily_tasks = self.get_daily_tasks(user_id)
-        task = daily_tasks.get(task_id)
-        
-        if task and task["completed"] and not task["claimed"]:
-            reward = self.daily_tasks[task_id]["reward"]
-            self.add_coins(user_id, reward, f"Tarea diaria: {self.daily_tasks[task_id]['name']}")
+        with self.transaction(user_id) as tx:
+            task = tx.daily_tasks(user_id).get(task_id)
             
-            task["claimed"] = True
-            data = load_data()
-            data["economy"]["users"][user_id]["daily_tasks"] = daily_tasks
-            save_data(data)
-            
-            return reward
+            if task and task["completed"] and not task["claimed"]:
+                reward = self.daily_tasks[task_id]["reward"]
+                tx.credit(user_id, reward, f"Tarea diaria: {self.daily_tasks[task_id]['name']}")
+                task["claimed"] = True
+                return reward
         
         return None
 
@@ -273,256 +585,253 @@ class EconomySystem:
         if not any(job["id"] == job_id for job in available_jobs):
             return False
         
-        data = load_data()
-        user_economy = self.get_user_economy(user_id)
-        user_economy["job"] = job_id
-        data["economy"]["users"][user_id] = user_economy
-        save_data(data)
+        with self.transaction(user_id) as tx:
+            tx.user(user_id)["job"] = job_id
+            tx.touch(("economy", "users", user_id))
         return True
 
     def work(self, user_id: str) -> Optional[Dict]:
         """Permite al usuario trabajar y ganar dinero"""
-        user_economy = self.get_user_economy(user_id)
-        job_id = user_economy.get("job")
-        
-        if not job_id or job_id not in self.jobs:
-            return None
-        
-        # Verificar cooldown
-        last_work = user_economy.get("last_work")
-        if last_work:
-            last_work_time = datetime.fromisoformat(last_work)
-            cooldown_hours = self.jobs[job_id]["cooldown"]
-            if datetime.now() < last_work_time + timedelta(hours=cooldown_hours):
-                time_left = (last_work_time + timedelta(hours=cooldown_hours)) - datetime.now()
-                return {"error": "cooldown", "time_left": time_left}
-        
-        # Calcular salario con variación aleatoria (±20%)
-        base_salary = self.jobs[job_id]["salary"]
-        variation = random.uniform(0.8, 1.2)
-        salary = int(base_salary * variation)
-        
-        # Bonus por nivel
-        level_bonus = user_economy["level"] * 5
-        total_earned = salary + level_bonus
-        
-        self.add_coins(user_id, total_earned, f"Trabajo: {self.jobs[job_id]['name']}")
-        
-        data = load_data()
-        user_economy["last_work"] = datetime.now().isoformat()
-        data["economy"]["users"][user_id] = user_economy
-        save_data(data)
-        
-        return {
-            "success": True,
-            "earned": total_earned,
-            "base_salary": salary,
-            "level_bonus": level_bonus,
-            "job_name": self.jobs[job_id]["name"]
-        }
+        with self.transaction(user_id) as tx:
+            user_economy = tx.user(user_id)
+            job_id = user_economy.get("job")
+            
+            if not job_id or job_id not in self.jobs:
+                return None
+            
+            # Verificar cooldown
+            last_work = user_economy.get("last_work")
+            if last_work:
+                last_work_time = datetime.fromisoformat(last_work)
+                cooldown_hours = self.jobs[job_id]["cooldown"]
+                if datetime.now() < last_work_time + timedelta(hours=cooldown_hours):
+                    time_left = (last_work_time + timedelta(hours=cooldown_hours)) - datetime.now()
+                    return {"error": "cooldown", "time_left": time_left}
+            
+            # Calcular salario con variación aleatoria (±20%)
+            base_salary = self.jobs[job_id]["salary"]
+            variation = random.uniform(0.8, 1.2)
+            salary = int(base_salary * variation)
+            
+            # Bonus por nivel
+            level_bonus = user_economy["level"] * 5
+            total_earned = salary + level_bonus
+            
+            tx.credit(user_id, total_earned, f"Trabajo: {self.jobs[job_id]['name']}")
+            user_economy["last_work"] = datetime.now().isoformat()
+            
+            return {
+                "success": True,
+                "earned": total_earned,
+                "base_salary": salary,
+                "level_bonus": level_bonus,
+                "job_name": self.jobs[job_id]["name"]
+            }
 
     def play_coinflip(self, user_id: str, bet: int, choice: str) -> Dict:
         """Juego de cara o cruz"""
         if not self._validate_bet("coinflip", bet):
             return {"error": "invalid_bet"}
         
-        if not self.remove_coins(user_id, bet, "Coinflip bet"):
-            return {"error": "insufficient_funds"}
-        
-        result = random.choice(["cara", "cruz"])
-        won = choice.lower() == result
-        
-        if won:
-            winnings = bet * 2
-            self.add_coins(user_id, winnings, "Coinflip win")
-            self._update_game_stats(user_id, True)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": True, "winnings": winnings}
-        else:
-            self._update_game_stats(user_id, False)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": False, "lost": bet}
+        try:
+            with self.transaction(user_id) as tx:
+                if not tx.debit(user_id, bet, "Coinflip bet"):
+                    return {"error": "insufficient_funds"}
+            
+                result = random.choice(["cara", "cruz"])
+                won = choice.lower() == result
+            
+                if won:
+                    winnings = bet * 2
+                    self._settle_game(tx, user_id, True, [(winnings, "Coinflip win")])
+                    return {"success": True, "result": result, "won": True, "winnings": winnings}
+                else:
+                    self._settle_game(tx, user_id, False)
+                    return {"success": True, "result": result, "won": False, "lost": bet}
+        except RuntimeError:
+            # Una transacción asíncrona del usuario está a medias
+            return {"error": "busy"}
 
     def play_dice(self, user_id: str, bet: int, guess: int) -> Dict:
         """Juego de dados"""
         if not self._validate_bet("dice", bet) or guess < 1 or guess > 6:
             return {"error": "invalid_bet"}
         
-        if not self.remove_coins(user_id, bet, "Dice bet"):
-            return {"error": "insufficient_funds"}
-        
-        result = random.randint(1, 6)
-        won = guess == result
-        
-        if won:
-            winnings = bet * 6  # 6x multiplier for exact guess
-            self.add_coins(user_id, winnings, "Dice win")
-            self._update_game_stats(user_id, True)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": True, "winnings": winnings}
-        else:
-            self._update_game_stats(user_id, False)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": False, "lost": bet}
+        try:
+            with self.transaction(user_id) as tx:
+                if not tx.debit(user_id, bet, "Dice bet"):
+                    return {"error": "insufficient_funds"}
+            
+                result = random.randint(1, 6)
+                won = guess == result
+            
+                if won:
+                    winnings = bet * 6  # 6x multiplier for exact guess
+                    self._settle_game(tx, user_id, True, [(winnings, "Dice win")])
+                    return {"success": True, "result": result, "won": True, "winnings": winnings}
+                else:
+                    self._settle_game(tx, user_id, False)
+                    return {"success": True, "result": result, "won": False, "lost": bet}
+        except RuntimeError:
+            # Una transacción asíncrona del usuario está a medias
+            return {"error": "busy"}
 
     def play_slots(self, user_id: str, bet: int) -> Dict:
         """Juego de tragamonedas"""
         if not self._validate_bet("slots", bet):
             return {"error": "invalid_bet"}
         
-        if not self.remove_coins(user_id, bet, "Slots bet"):
-            return {"error": "insufficient_funds"}
-        
-        symbols = ["🍒", "🍋", "🍊", "🍇", "⭐", "💎"]
-        result = [random.choice(symbols) for _ in range(3)]
-        
-        # Calcular multiplicador
-        if result[0] == result[1] == result[2]:  # Tres iguales
-            if result[0] == "💎":
-                multiplier = 10
-            elif result[0] == "⭐":
-                multiplier = 5
-            else:
-                multiplier = 3
-        elif result[0] == result[1] or result[1] == result[2] or result[0] == result[2]:  # Dos iguales
-            multiplier = 1.5
-        else:
-            multiplier = 0
-        
-        if multiplier > 0:
-            winnings = int(bet * multiplier)
-            self.add_coins(user_id, winnings, "Slots win")
-            self._update_game_stats(user_id, True)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": True, "winnings": winnings, "multiplier": multiplier}
-        else:
-            self._update_game_stats(user_id, False)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": False, "lost": bet}
+        try:
+            with self.transaction(user_id) as tx:
+                if not tx.debit(user_id, bet, "Slots bet"):
+                    return {"error": "insufficient_funds"}
+            
+                symbols = ["🍒", "🍋", "🍊", "🍇", "⭐", "💎"]
+                result = [random.choice(symbols) for _ in range(3)]
+            
+                # Calcular multiplicador
+                if result[0] == result[1] == result[2]:  # Tres iguales
+                    if result[0] == "💎":
+                        multiplier = 10
+                    elif result[0] == "⭐":
+                        multiplier = 5
+                    else:
+                        multiplier = 3
+                elif result[0] == result[1] or result[1] == result[2] or result[0] == result[2]:  # Dos iguales
+                    multiplier = 1.5
+                else:
+                    multiplier = 0
+            
+                if multiplier > 0:
+                    winnings = int(bet * multiplier)
+                    self._settle_game(tx, user_id, True, [(winnings, "Slots win")])
+                    return {"success": True, "result": result, "won": True, "winnings": winnings, "multiplier": multiplier}
+                else:
+                    self._settle_game(tx, user_id, False)
+                    return {"success": True, "result": result, "won": False, "lost": bet}
+        except RuntimeError:
+            # Una transacción asíncrona del usuario está a medias
+            return {"error": "busy"}
 
     def play_blackjack(self, user_id: str, bet: int) -> Dict:
         """Juego de Blackjack"""
         if not self._validate_bet("blackjack", bet):
             return {"error": "invalid_bet"}
         
-        if not self.remove_coins(user_id, bet, "Blackjack bet"):
-            return {"error": "insufficient_funds"}
-        
-        # Crear baraja
-        suits = ["♠️", "♥️", "♦️", "♣️"]
-        ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-        deck = [(rank, suit) for suit in suits for rank in ranks]
-        random.shuffle(deck)
-        
-        # Repartir cartas iniciales
-        player_hand = [deck.pop(), deck.pop()]
-        dealer_hand = [deck.pop(), deck.pop()]
-        
-        # Calcular valores
-        def calculate_hand_value(hand):
-            value = 0
-            aces = 0
-            for card, _ in hand:
-                if card in ["J", "Q", "K"]:
-                    value += 10
-                elif card == "A":
-                    aces += 1
-                    value += 11
-                else:
-                    value += int(card)
+        with self.transaction(user_id) as tx:
+            if not tx.debit(user_id, bet, "Blackjack bet"):
+                return {"error": "insufficient_funds"}
             
-            # Ajustar ases
-            while value > 21 and aces > 0:
-                value -= 10
-                aces -= 1
+            # Crear baraja
+            suits = ["♠️", "♥️", "♦️", "♣️"]
+            ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+            deck = [(rank, suit) for suit in suits for rank in ranks]
+            random.shuffle(deck)
             
-            return value
-        
-        player_value = calculate_hand_value(player_hand)
-        dealer_value = calculate_hand_value(dealer_hand)
-        
-        # Verificar blackjack natural
-        player_blackjack = player_value == 21
-        dealer_blackjack = dealer_value == 21
-        
-        if player_blackjack and dealer_blackjack:
-            # Empate
-            self.add_coins(user_id, bet, "Blackjack tie")
-            self._update_game_stats(user_id, False)
-            return {
-                "success": True, "result": "tie", "won": False, "tied": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "returned": bet
-            }
-        elif player_blackjack:
-            # Blackjack del jugador
-            winnings = int(bet * 2.5)  # Blackjack paga 3:2
-            self.add_coins(user_id, winnings, "Blackjack win")
-            self._update_game_stats(user_id, True)
-            return {
-                "success": True, "result": "blackjack", "won": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "winnings": winnings
-            }
-        elif dealer_blackjack:
-            # Blackjack del dealer
-            self._update_game_stats(user_id, False)
-            return {
-                "success": True, "result": "dealer_blackjack", "won": False,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "lost": bet
-            }
-        
-        # Juego normal - el dealer toma cartas hasta 17
-        while dealer_value < 17:
-            dealer_hand.append(deck.pop())
+            # Repartir cartas iniciales
+            player_hand = [deck.pop(), deck.pop()]
+            dealer_hand = [deck.pop(), deck.pop()]
+            
+            # Calcular valores
+            def calculate_hand_value(hand):
+                value = 0
+                aces = 0
+                for card, _ in hand:
+                    if card in ["J", "Q", "K"]:
+                        value += 10
+                    elif card == "A":
+                        aces += 1
+                        value += 11
+                    else:
+                        value += int(card)
+            
+                # Ajustar ases
+                while value > 21 and aces > 0:
+                    value -= 10
+                    aces -= 1
+            
+                return value
+            
+            player_value = calculate_hand_value(player_hand)
             dealer_value = calculate_hand_value(dealer_hand)
-        
-        # Determinar ganador
-        if dealer_value > 21:
-            # Dealer se pasa
-            winnings = bet * 2
-            self.add_coins(user_id, winnings, "Blackjack win")
-            self._update_game_stats(user_id, True)
-            return {
-                "success": True, "result": "dealer_bust", "won": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "winnings": winnings
-            }
-        elif player_value > dealer_value:
-            # Jugador gana
-            winnings = bet * 2
-            self.add_coins(user_id, winnings, "Blackjack win")
-            self._update_game_stats(user_id, True)
-            return {
-                "success": True, "result": "player_wins", "won": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "winnings": winnings
-            }
-        elif player_value == dealer_value:
-            # Empate
-            self.add_coins(user_id, bet, "Blackjack tie")
-            self._update_game_stats(user_id, False)
-            return {
-                "success": True, "result": "tie", "won": False, "tied": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "returned": bet
-            }
-        else:
-            # Dealer gana
-            self._update_game_stats(user_id, False)
-            return {
-                "success": True, "result": "dealer_wins", "won": False,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "lost": bet
-            }
+            
+            # Verificar blackjack natural
+            player_blackjack = player_value == 21
+            dealer_blackjack = dealer_value == 21
+            
+            if player_blackjack and dealer_blackjack:
+                # Empate
+                self._settle_game(tx, user_id, False, [(bet, "Blackjack tie")], task=False)
+                return {
+                    "success": True, "result": "tie", "won": False, "tied": True,
+                    "player_hand": player_hand, "dealer_hand": dealer_hand,
+                    "player_value": player_value, "dealer_value": dealer_value,
+                    "returned": bet
+                }
+            elif player_blackjack:
+                # Blackjack del jugador
+                winnings = int(bet * 2.5)  # Blackjack paga 3:2
+                self._settle_game(tx, user_id, True, [(winnings, "Blackjack win")], task=False)
+                return {
+                    "success": True, "result": "blackjack", "won": True,
+                    "player_hand": player_hand, "dealer_hand": dealer_hand,
+                    "player_value": player_value, "dealer_value": dealer_value,
+                    "winnings": winnings
+                }
+            elif dealer_blackjack:
+                # Blackjack del dealer
+                self._settle_game(tx, user_id, False, task=False)
+                return {
+                    "success": True, "result": "dealer_blackjack", "won": False,
+                    "player_hand": player_hand, "dealer_hand": dealer_hand,
+                    "player_value": player_value, "dealer_value": dealer_value,
+                    "lost": bet
+                }
+            
+            # Juego normal - el dealer toma cartas hasta 17
+            while dealer_value < 17:
+                dealer_hand.append(deck.pop())
+                dealer_value = calculate_hand_value(dealer_hand)
+            
+            # Determinar ganador
+            if dealer_value > 21:
+                # Dealer se pasa
+                winnings = bet * 2
+                self._settle_game(tx, user_id, True, [(winnings, "Blackjack win")], task=False)
+                return {
+                    "success": True, "result": "dealer_bust", "won": True,
+                    "player_hand": player_hand, "dealer_hand": dealer_hand,
+                    "player_value": player_value, "dealer_value": dealer_value,
+                    "winnings": winnings
+                }
+            elif player_value > dealer_value:
+                # Jugador gana
+                winnings = bet * 2
+                self._settle_game(tx, user_id, True, [(winnings, "Blackjack win")], task=False)
+                return {
+                    "success": True, "result": "player_wins", "won": True,
+                    "player_hand": player_hand, "dealer_hand": dealer_hand,
+                    "player_value": player_value, "dealer_value": dealer_value,
+                    "winnings": winnings
+                }
+            elif player_value == dealer_value:
+                # Empate
+                self._settle_game(tx, user_id, False, [(bet, "Blackjack tie")], task=False)
+                return {
+                    "success": True, "result": "tie", "won": False, "tied": True,
+                    "player_hand": player_hand, "dealer_hand": dealer_hand,
+                    "player_value": player_value, "dealer_value": dealer_value,
+                    "returned": bet
+                }
+            else:
+                # Dealer gana
+                self._settle_game(tx, user_id, False, task=False)
+                return {
+                    "success": True, "result": "dealer_wins", "won": False,
+                    "player_hand": player_hand, "dealer_hand": dealer_hand,
+                    "player_value": player_value, "dealer_value": dealer_value,
+                    "lost": bet
+                }
 
     def _validate_bet(self, game: str, bet: int) -> bool:
         """Valida si la apuesta es válida para el juego"""
@@ -540,116 +849,100 @@ class EconomySystem:
         if bet_amount < self.minigames["roulette"]["min_bet"] or bet_amount > self.minigames["roulette"]["max_bet"]:
             return {"error": "invalid_bet"}
         
-        user_economy = self.get_user_economy(user_id)
-        if user_economy["coins"] < bet_amount:
-            return {"error": "insufficient_funds"}
-        
-        # Quitar la apuesta
-        self.remove_coins(user_id, bet_amount, "Roulette bet")
-        
-        # Generar número ganador (0-36)
-        winning_number = random.randint(0, 36)
-        
-        # Determinar color del número ganador
-        red_numbers = [1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36]
-        black_numbers = [2, 4, 6, 8, 10, 11, 13, 15, 17, 20, 22, 24, 26, 28, 29, 31, 33, 35]
-        
-        if winning_number == 0:
-            winning_color = "green"
-        elif winning_number in red_numbers:
-            winning_color = "red"
-        else:
-            winning_color = "black"
-        
-        # Calcular ganancia según el tipo de apuesta
-        winnings = 0
-        win = False
-        
-        if bet_type == "number" and bet_value:
-            # Apuesta a número específico (paga 35:1)
-            if int(bet_value) == winning_number:
-                winnings = bet_amount * 36  # 35:1 + apuesta original
-                win = True
-        elif bet_type == "color":
-            # Apuesta a color (paga 1:1)
-            if bet_value == winning_color and winning_number != 0:
-                winnings = bet_amount * 2  # 1:1 + apuesta original
-                win = True
-        elif bet_type == "even_odd":
-            # Apuesta a par/impar (paga 1:1)
-            if winning_number != 0:
-                is_even = winning_number % 2 == 0
-                if (bet_value == "even" and is_even) or (bet_value == "odd" and not is_even):
-                    winnings = bet_amount * 2
+        with self.transaction(user_id) as tx:
+            # Quitar la apuesta
+            if not tx.debit(user_id, bet_amount, "Roulette bet"):
+                return {"error": "insufficient_funds"}
+            
+            # Generar número ganador (0-36)
+            winning_number = random.randint(0, 36)
+            
+            # Determinar color del número ganador
+            red_numbers = [1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36]
+            black_numbers = [2, 4, 6, 8, 10, 11, 13, 15, 17, 20, 22, 24, 26, 28, 29, 31, 33, 35]
+            
+            if winning_number == 0:
+                winning_color = "green"
+            elif winning_number in red_numbers:
+                winning_color = "red"
+            else:
+                winning_color = "black"
+            
+            # Calcular ganancia según el tipo de apuesta
+            winnings = 0
+            win = False
+            
+            if bet_type == "number" and bet_value:
+                # Apuesta a número específico (paga 35:1)
+                if int(bet_value) == winning_number:
+                    winnings = bet_amount * 36  # 35:1 + apuesta original
                     win = True
-        elif bet_type == "high_low":
-            # Apuesta a alto/bajo (paga 1:1)
-            if winning_number != 0:
-                if (bet_value == "low" and 1 <= winning_number <= 18) or (bet_value == "high" and 19 <= winning_number <= 36):
-                    winnings = bet_amount * 2
+            elif bet_type == "color":
+                # Apuesta a color (paga 1:1)
+                if bet_value == winning_color and winning_number != 0:
+                    winnings = bet_amount * 2  # 1:1 + apuesta original
                     win = True
-        
-        # Añadir ganancias si ganó
-        if win:
-            self.add_coins(user_id, winnings, "Roulette win")
-        
-        # Actualizar estadísticas
-        user_economy = self.get_user_economy(user_id)
-        user_economy["games_played"] += 1
-        if win:
-            user_economy["games_won"] += 1
-        
-        # Actualizar progreso de tarea de minijuegos
-        self.update_task_progress(user_id, "play_minigames")
-        
-        data = load_data()
-        data["economy"]["users"][user_id] = user_economy
-        save_data(data)
-        
-        return {
-            "result": "win" if win else "lose",
-            "winning_number": winning_number,
-            "winning_color": winning_color,
-            "bet_type": bet_type,
-            "bet_value": bet_value,
-            "winnings": winnings if win else 0,
-            "new_balance": user_economy["coins"]
-        }
+            elif bet_type == "even_odd":
+                # Apuesta a par/impar (paga 1:1)
+                if winning_number != 0:
+                    is_even = winning_number % 2 == 0
+                    if (bet_value == "even" and is_even) or (bet_value == "odd" and not is_even):
+                        winnings = bet_amount * 2
+                        win = True
+            elif bet_type == "high_low":
+                # Apuesta a alto/bajo (paga 1:1)
+                if winning_number != 0:
+                    if (bet_value == "low" and 1 <= winning_number <= 18) or (bet_value == "high" and 19 <= winning_number <= 36):
+                        winnings = bet_amount * 2
+                        win = True
+            
+            # Pagar ganancias, estadísticas y tarea (la ruleta no afecta la racha)
+            new_balance = self._settle_game(
+                tx, user_id, win, [(winnings, "Roulette win")] if win else [], streak=False
+            )
+            
+            return {
+                "result": "win" if win else "lose",
+                "winning_number": winning_number,
+                "winning_color": winning_color,
+                "bet_type": bet_type,
+                "bet_value": bet_value,
+                "winnings": winnings if win else 0,
+                "new_balance": new_balance
+            }
+
+    def _settle_game(self, tx: EconomyTransaction, user_id: str, won: bool,
+                     payouts: List[Tuple[int, str]] = (), streak: bool = True, task: bool = True) -> int:
+        """Liquida una partida cuya apuesta ya se cobró en ``tx``.
+        
+        Aplica sobre el mismo registro y en una sola pasada los pagos (cada
+        uno con su XP y bonus de nivel), las estadísticas, la racha y el
+        progreso de la tarea de minijuegos; el commit lo hace la transacción
+        al cerrarse. Devuelve el saldo final.
+        """
+        for amount, reason in payouts:
+            tx.credit(user_id, amount, reason)
+        tx.record_game(user_id, won, streak=streak)
+        if task:
+            tx.progress_task(user_id, "play_minigames")
+        return tx.balance(user_id)
 
     def _update_game_stats(self, user_id: str, won: bool):
         """Actualiza las estadísticas de juegos del usuario"""
-        data = load_data()
-        user_economy = self.get_user_economy(user_id)
-        
-        user_economy["games_played"] += 1
-        if won:
-            user_economy["games_won"] += 1
-            user_economy["streak"] += 1
-        else:
-            user_economy["streak"] = 0
-        
-        data["economy"]["users"][user_id] = user_economy
-        save_data(data)
+        with self.transaction(user_id) as tx:
+            tx.record_game(user_id, won)
 
     def get_leaderboard(self, category: str = "coins", limit: int = 10) -> List[Dict]:
         """Obtiene el leaderboard de la economía"""
         data = load_data()
         economy_data = data.get("economy", {}).get("users", {})
         
-        # Ordenar usuarios según la categoría
-        if category == "coins":
-            sorted_users = sorted(economy_data.items(), key=lambda x: x[1]["coins"], reverse=True)
-        elif category == "level":
-            sorted_users = sorted(economy_data.items(), key=lambda x: x[1]["level"], reverse=True)
-        elif category == "total_earned":
-            sorted_users = sorted(economy_data.items(), key=lambda x: x[1]["total_earned"], reverse=True)
-        elif category == "games_won":
-            sorted_users = sorted(economy_data.items(), key=lambda x: x[1]["games_won"], reverse=True)
-        else:
+        if category not in LeaderboardIndex.CATEGORIES:
             return []
         
         leaderboard = []
-        for i, (user_id, user_data) in enumerate(sorted_users[:limit]):
+        for i, user_id in enumerate(self.leaderboard.top(economy_data, category, limit)):
+            user_data = economy_data[user_id]
             leaderboard.append({
                 "rank": i + 1,
                 "user_id": user_id,
@@ -660,32 +953,24 @@ class EconomySystem:
         
         return leaderboard
 
-    def transfer_coins(self, from_user: str, to_user: str, amount: int) -> bool:
+    async def transfer_coins(self, from_user: str, to_user: str, amount: int) -> bool:
         """Transfiere GameCoins entre usuarios"""
         if amount <= 0:
             return False
         
-        # Verificar que el usuario tenga suficientes coins
-        from_economy = self.get_user_economy(from_user)
-        if from_economy["coins"] < amount:
-            return False
-        
-        # Realizar la transferencia
-        if self.remove_coins(from_user, amount, f"Transfer to {to_user}"):
-            self.add_coins(to_user, amount, f"Transfer from {from_user}")
+        # Débito y crédito en la misma transacción: se guardan juntos o ninguno
+        async with self.transaction(from_user, to_user) as tx:
+            if not tx.debit(from_user, amount, f"Transfer to {to_user}"):
+                return False
+            tx.credit(to_user, amount, f"Transfer from {from_user}")
             return True
-        
-        return False
 
     def get_user_rank(self, user_id: str, category: str = "coins") -> Optional[int]:
         """Obtiene el ranking de un usuario en una categoría específica"""
-        leaderboard = self.get_leaderboard(category, limit=1000)  # Obtener más usuarios para encontrar el rank
-        
-        for entry in leaderboard:
-            if entry["user_id"] == user_id:
-                return entry["rank"]
-        
-        return None
+        if category not in LeaderboardIndex.CATEGORIES:
+            return None
+        users = load_data().get("economy", {}).get("users", {})
+        return self.leaderboard.rank(users, category, user_id)
 
 # Instancia global del sistema de economía
 economy = EconomySystem()
\ No newline at end of file
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+import discord
+
+
+class EmbedCache:
+    """Embeds ya construidos, guardados como diccionarios en un LRU.
+
+    La clave incluye todo lo que determina el contenido: tipo de vista,
+    página, filtro y versión de los datos (``store.version`` o la versión
+    del catálogo). Cuando los datos cambian la clave es otra, así que no
+    hace falta invalidar a mano: la entrada antigua sale sola del LRU.
+
+    ``get`` devuelve siempre un ``discord.Embed`` nuevo para que quien lo
+    recibe pueda superponer los datos del usuario (saldo, avisos) sin
+    modificar la copia guardada.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], discord.Embed]) -> discord.Embed:
+        payload = self._entries.get(key)
+        if payload is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self.misses += 1
+            payload = self._entries[key] = build().to_dict()
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return discord.Embed.from_dict(_copy_payload(payload))
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _copy_payload(payload: Dict) -> Dict:
+    # ``from_dict`` reutiliza las listas del diccionario; los campos se copian
+    # para que ``add_field``/``set_field_at`` no alteren la entrada cacheada
+    if "fields" not in payload:
+        return dict(payload)
+    return {**payload, "fields": [dict(field) for field in payload["fields"]]}
+
+
+# Instancia global de la caché de embeds
+embed_cache = EmbedCache()
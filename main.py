@@ -1,5 +1,4 @@
 import discord
-from discord import app_commands
 import sys
 import os
 
@@ -15,15 +14,27 @@ from commands.economy_commands import setup as setup_economy_commands
 from commands.virtual_shop_commands import setup as setup_virtual_shop_commands
 
 from utils import setup_error_handlers
+from data_manager import store
+from economy_system import economy
+from perf_metrics import InstrumentedCommandTree, metrics
+from role_queue import RoleChange, role_queue
+from purchase_expiry import expiry_scheduler
+from archive import archiver
+from virtual_shop import virtual_shop
+from views.ticket_management_view import CloseTicketButton
 
 from reminder_system import initialize_reminder_system
 
 # Inicializar cliente y árbol de comandos
 client = discord.Client(intents=intents)
-tree = app_commands.CommandTree(client)
+# El árbol instrumentado mide el tiempo de cada comando (ver /perf)
+tree = InstrumentedCommandTree(client)
 
 # Configurar los comandos y manejadores de errores
 async def setup():
+    # Cargar el estado una sola vez; el resto del bot lo lee desde memoria
+    await store.load_async()
+
     setup_owner_commands(tree, client)
     setup_user_commands(tree, client)
     setup_general_commands(tree, client)
@@ -31,15 +42,42 @@ async def setup():
     setup_economy_commands(tree, client)
     setup_virtual_shop_commands(tree, client)
 
+    # Botones persistentes: un único manejador para los botones de cerrar de todos los tickets
+    client.add_dynamic_items(CloseTicketButton)
+
+    # Se procesan cuando la cola arranque en on_ready
+    requeue_pending_role_grants()
+
     await setup_error_handlers(tree)
 
 # La configuración se ejecutará en la función main
 
+def requeue_pending_role_grants():
+    """Vuelve a encolar los roles de compras que quedaron pendientes antes de reiniciar."""
+    pending = virtual_shop.pending_role_grants()
+    for purchase in pending:
+        try:
+            role_queue.enqueue(RoleChange(
+                purchase["guild_id"], purchase["user_id"], purchase["role_id"], "add",
+                reason=f"Compra de {purchase['product_name']} en la tienda virtual",
+                on_done=virtual_shop.role_status_callback(purchase["id"], "granted", "failed")
+            ))
+        except (KeyError, ValueError) as e:
+            print(f"Compra {purchase.get('id')} con rol pendiente no válida: {e}")
+    if pending:
+        print(f"Roles pendientes de compras reencolados: {len(pending)}")
+
 @client.event
 async def on_ready():
     print(f"Bot conectado como {client.user}")
     activity = discord.Activity(type=discord.ActivityType.playing, name="Gestionando Tickets y Productos")
     await client.change_presence(activity=activity)
+    metrics.start_dump_task()
+    # Retirada de roles de compras temporales caducadas
+    role_queue.start(client)
+    expiry_scheduler.start()
+    # Tickets cerrados y compras inactivas antiguos pasan a los archivos fríos
+    archiver.start()
     try:
         synced = await tree.sync()
         print(f"Comandos sincronizados: {len(synced)}")
@@ -63,7 +101,14 @@ if not DISCORD_TOKEN:
 
 async def main():
     await setup()
-    await client.start(DISCORD_TOKEN)
+    try:
+        await client.start(DISCORD_TOKEN)
+    finally:
+        # Escribir los cambios pendientes antes de salir
+        economy.flush_task_progress()
+        store.close()
+        if metrics.commands:
+            metrics.dump()
 
 if __name__ == "__main__":
     import asyncio
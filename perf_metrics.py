@@ -0,0 +1,236 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.webhook.async_ import AsyncWebhookAdapter
+
+import config
+from data_manager import store
+
+# Cada cuántos segundos se registra el resumen y se vuelca a JSON (0 lo desactiva)
+PERF_DUMP_INTERVAL = getattr(config, "PERF_DUMP_INTERVAL", 300)
+PERF_DUMP_FILE = getattr(config, "PERF_DUMP_FILE", os.path.join(os.path.dirname(os.path.abspath(config.DATA_FILE)), "perf_metrics.json"))
+
+logger = logging.getLogger(__name__)
+
+# Medición de la interacción que se está atendiendo en la tarea actual
+_current = contextvars.ContextVar("perf_invocation", default=None)
+
+
+def percentile(samples, pct: float) -> float:
+    """Percentil ``pct`` (0-100) de las muestras por el rango más cercano; 0 si no hay."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class _Invocation:
+    __slots__ = ("storage_time", "storage_calls", "api_time", "api_calls", "stats")
+
+    def __init__(self):
+        self.storage_time = 0.0
+        self.storage_calls = 0
+        self.api_time = 0.0
+        self.api_calls = 0
+        # Acumulado del comando una vez terminada la interacción
+        self.stats = None
+
+
+class CommandStats:
+    """Acumulado de tiempos de un comando."""
+
+    def __init__(self, samples: int = 512):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.storage_time = 0.0
+        self.storage_calls = 0
+        self.api_time = 0.0
+        self.api_calls = 0
+        # Últimas duraciones, para los percentiles
+        self.samples = deque(maxlen=samples)
+
+    def add(self, elapsed: float, invocation: _Invocation, failed: bool):
+        self.calls += 1
+        self.errors += int(failed)
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.storage_time += invocation.storage_time
+        self.storage_calls += invocation.storage_calls
+        self.api_time += invocation.api_time
+        self.api_calls += invocation.api_calls
+        self.samples.append(elapsed)
+
+    def percentile(self, pct: float) -> float:
+        return percentile(self.samples, pct)
+
+    def to_dict(self) -> dict:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": self.total_time / calls * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "max_ms": self.max_time * 1000,
+            "total_ms": self.total_time * 1000,
+            "storage_ms": self.storage_time * 1000,
+            "storage_calls": self.storage_calls,
+            "api_ms": self.api_time * 1000,
+            "api_calls": self.api_calls
+        }
+
+
+class PerfMetrics:
+    """Tiempos por comando: total, almacenamiento y llamadas a la API de Discord."""
+
+    def __init__(self):
+        self.commands = {}
+        self.since = datetime.utcnow()
+        self._dump_task = None
+        # Colas en segundo plano: nombre -> función que devuelve su estado actual
+        self.queues = {}
+
+    def record_storage(self, operation: str, seconds: float):
+        invocation = _current.get()
+        if invocation is None:
+            return
+        # Una escritura encolada por el comando puede llegar al disco después de que responda
+        target = invocation.stats if invocation.stats is not None else invocation
+        target.storage_time += seconds
+        target.storage_calls += 1
+
+    def record_api(self, seconds: float):
+        invocation = _current.get()
+        if invocation is not None:
+            invocation.api_time += seconds
+            invocation.api_calls += 1
+
+    def register_queue(self, name: str, stats):
+        """Añade una cola cuyo estado (``stats()``) se incluye en ``/perf`` y en el volcado."""
+        self.queues[name] = stats
+
+    def queue_stats(self) -> dict:
+        return {name: stats() for name, stats in self.queues.items()}
+
+    def finish(self, name: str, invocation: _Invocation, elapsed: float, failed: bool):
+        stats = self.commands.get(name)
+        if stats is None:
+            stats = self.commands[name] = CommandStats()
+        stats.add(elapsed, invocation, failed)
+        invocation.stats = stats
+
+    def summary(self, sort_by: str = "total_ms", limit: Optional[int] = None) -> list:
+        """Lista de ``(comando, métricas)`` ordenada de mayor a menor por ``sort_by``."""
+        rows = [(name, stats.to_dict()) for name, stats in self.commands.items()]
+        rows.sort(key=lambda row: row[1][sort_by], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def reset(self):
+        self.commands.clear()
+        self.since = datetime.utcnow()
+
+    def dump(self, path: str = PERF_DUMP_FILE):
+        """Escribe el resumen actual en ``path`` como JSON."""
+        payload = {
+            "since": self.since.isoformat(),
+            "generated_at": datetime.utcnow().isoformat(),
+            "commands": dict(self.summary()),
+            "queues": self.queue_stats()
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def log_summary(self, limit: int = 5):
+        for name, row in self.summary(limit=limit):
+            logger.info(
+                f"/{name}: {row['calls']} llamadas, media {row['avg_ms']:.1f} ms, p95 {row['p95_ms']:.1f} ms, "
+                f"almacenamiento {row['storage_ms']:.1f} ms ({row['storage_calls']} accesos), "
+                f"API {row['api_ms']:.1f} ms ({row['api_calls']} llamadas)"
+            )
+
+    async def _dump_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            if not self.commands:
+                continue
+            self.log_summary()
+            try:
+                await asyncio.to_thread(self.dump)
+            except Exception as e:
+                logger.error(f"Error al guardar las métricas de rendimiento: {e}")
+
+    def start_dump_task(self, interval: float = PERF_DUMP_INTERVAL):
+        """Arranca el volcado periódico si no está ya en marcha."""
+        if interval <= 0 or (self._dump_task is not None and not self._dump_task.done()):
+            return
+        self._dump_task = asyncio.get_running_loop().create_task(self._dump_loop(interval))
+
+
+def _timed_api(request):
+    async def wrapper(*args, **kwargs):
+        if _current.get() is None:
+            return await request(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await request(*args, **kwargs)
+        finally:
+            metrics.record_api(time.perf_counter() - started)
+    wrapper.__wrapped__ = request
+    return wrapper
+
+
+def _invocation_name(interaction: discord.Interaction) -> str:
+    command = interaction.command
+    name = command.qualified_name if command is not None else (interaction.data or {}).get("name", "desconocido")
+    if interaction.type is discord.InteractionType.autocomplete:
+        name += " (autocompletado)"
+    return name
+
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """CommandTree que mide cada interacción de comando de aplicación.
+
+    La medición empieza en ``interaction_check`` (que discord.py llama
+    antes de cada comando o autocompletado, en la misma tarea) y se cierra
+    cuando esa tarea termina, así que no depende de métodos privados de
+    ``CommandTree``.
+    """
+
+    def __init__(self, client: discord.Client, *args, **kwargs):
+        super().__init__(client, *args, **kwargs)
+        # Las peticiones REST y las respuestas a interacciones van por caminos distintos
+        client.http.request = _timed_api(client.http.request)
+        if not hasattr(AsyncWebhookAdapter.request, "__wrapped__"):
+            AsyncWebhookAdapter.request = _timed_api(AsyncWebhookAdapter.request)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        task = asyncio.current_task()
+        if task is not None and _current.get() is None:
+            invocation = _Invocation()
+            _current.set(invocation)
+            started = time.perf_counter()
+            task.add_done_callback(lambda done: _finish_invocation(interaction, invocation, started, done))
+        return await super().interaction_check(interaction)
+
+
+def _finish_invocation(interaction: discord.Interaction, invocation: _Invocation, started: float, task: asyncio.Task):
+    failed = interaction.command_failed or task.cancelled() or task.exception() is not None
+    metrics.finish(_invocation_name(interaction), invocation, time.perf_counter() - started, failed)
+
+
+# Instancia global de métricas
+metrics = PerfMetrics()
+store.observer = metrics.record_storage
@@ -0,0 +1,151 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import config
+from role_queue import RoleChange, role_queue
+from virtual_shop import virtual_shop, purchase_expiry
+
+logger = logging.getLogger(__name__)
+
+# Estados de rol que todavía pueden estar asignados en Discord
+_ROLE_HELD = ("granted", "pending")
+
+
+class ExpiryScheduler:
+    """Caducidad de las compras temporales de la tienda virtual.
+
+    Las compras con fecha de caducidad se guardan en un montículo
+    ``(expires_at, purchase_id)``: al arrancar se recorren una sola vez y
+    después cada compra nueva se añade con ``schedule``. El bucle duerme
+    hasta la siguiente caducidad (o hasta que llega una compra que caduca
+    antes), desactiva todas las vencidas en un único commit y encola la
+    retirada de sus roles en ``role_queue``.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, str]] = []
+        self._wakeup = None
+        self._task = None
+        self._loaded = False
+
+    def load(self):
+        """Carga las compras activas con caducidad (una vez, al arrancar)."""
+        if self._loaded:
+            return
+        products = virtual_shop.get_virtual_products()
+        for purchase_id, purchase in virtual_shop._get_purchases().items():
+            if not isinstance(purchase, dict) or not purchase.get("active", True):
+                continue
+            expires_at = purchase_expiry(purchase, products)
+            if expires_at is not None:
+                self._heap.append((expires_at, purchase_id))
+        heapq.heapify(self._heap)
+        self._loaded = True
+        logger.info(f"Caducidad: {len(self._heap)} compras temporales programadas")
+
+    def schedule(self, purchase: dict):
+        """Programa la caducidad de una compra recién hecha."""
+        expires_at = purchase_expiry(purchase)
+        if expires_at is None:
+            return
+        is_next = not self._heap or expires_at < self._heap[0][0]
+        heapq.heappush(self._heap, (expires_at, purchase["id"]))
+        if is_next and self._wakeup is not None:
+            # Caduca antes que todo lo demás: recalcular cuánto dormir
+            self._wakeup.set()
+
+    def start(self):
+        """Arranca el bucle de caducidad si no está ya en marcha."""
+        if self._task is not None and not self._task.done():
+            return
+        self.load()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _next_delay(self) -> Optional[float]:
+        if not self._heap:
+            return None
+        return max(0.0, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._next_delay()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                self.expire_due()
+            except Exception as e:
+                logger.error(f"Error al procesar compras caducadas: {e}")
+
+    def expire_due(self, now: Optional[datetime] = None) -> List[dict]:
+        """Desactiva las compras vencidas y encola la retirada de sus roles."""
+        now = now or datetime.utcnow()
+        purchases = virtual_shop._get_purchases()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, purchase_id = heapq.heappop(self._heap)
+            purchase = purchases.get(purchase_id)
+            # Descartar entradas obsoletas: compra borrada, ya inactiva o con otra fecha
+            if purchase is None or not purchase.get("active", True):
+                continue
+            if purchase.get("expires_at") and datetime.fromisoformat(purchase["expires_at"]) != expires_at:
+                continue
+            due.append(purchase_id)
+        if not due:
+            return []
+
+        expired = virtual_shop.deactivate_purchases(due)
+        logger.info(f"Caducidad: {len(expired)} compras desactivadas")
+        for purchase in expired:
+            try:
+                self._revoke_role(purchase)
+            except Exception as e:
+                logger.error(f"No se pudo encolar la retirada del rol de la compra {purchase.get('id')}: {e}")
+        return expired
+
+    @staticmethod
+    def _default_guild_id() -> Optional[int]:
+        """Servidor de las compras antiguas, que no guardaban ``guild_id``."""
+        guild_id = getattr(config, "GUILD_ID", None)
+        if guild_id:
+            return guild_id
+        guilds = role_queue.client.guilds if role_queue.client is not None else []
+        return guilds[0].id if len(guilds) == 1 else None
+
+    def _purchase_role(self, purchase: dict, products: dict) -> Tuple[Optional[str], Optional[str]]:
+        """Rol y servidor (como texto) de una compra; las anteriores a la cola de roles los toman del producto."""
+        role_id = purchase.get("role_id") or products.get(purchase.get("product_id"), {}).get("role_id")
+        guild_id = purchase.get("guild_id") or self._default_guild_id()
+        return (str(role_id) if role_id else None), (str(guild_id) if guild_id else None)
+
+    def _revoke_role(self, purchase: dict):
+        products = virtual_shop.get_virtual_products()
+        role_id, guild_id = self._purchase_role(purchase, products)
+        # Sin ``role_status`` es una compra antigua cuyo rol se entregó al comprar
+        if not role_id or purchase.get("role_status", "granted") not in _ROLE_HELD:
+            return
+        if not guild_id:
+            logger.warning(f"Compra {purchase.get('id')} sin servidor conocido; no se retira el rol {role_id}")
+            return
+        # Otra compra activa del mismo rol lo mantiene
+        for other in virtual_shop.get_user_purchases(purchase["user_id"]):
+            if self._purchase_role(other, products) == (role_id, guild_id):
+                return
+        role_queue.enqueue(RoleChange(
+            guild_id, purchase["user_id"], role_id, "remove",
+            reason=f"Caducó la compra de {purchase.get('product_name', 'un producto')}",
+            on_done=virtual_shop.role_status_callback(purchase["id"], "revoked")
+        ))
+
+
+# Instancia global del programador de caducidad
+expiry_scheduler = ExpiryScheduler()
+virtual_shop.expiry_listener = expiry_scheduler.schedule
@@ -1,7 +1,7 @@
 import asyncio
 import discord
 from datetime import datetime, timedelta
-from data_manager import get_all_roblox_accounts, load_data, save_data
+from data_manager import get_all_roblox_accounts, load_data, store
 import logging
 
 # Configurar logging
@@ -92,7 +92,7 @@ class RobuxReminderSystem:
             # Actualizar la lista de usuarios recordados
             if newly_reminded:
                 data['reminded_users'] = list(reminded_users.union(newly_reminded))
-                save_data(data)
+                store.commit(('reminded_users',))
                 logger.info(f"Recordatorios enviados a {len(newly_reminded)} usuarios")
                 
         except Exception as e:
@@ -184,7 +184,7 @@ class RobuxReminderSystem:
                 reminded_users = set(data.get('reminded_users', []))
                 reminded_users.add(discord_user_id)
                 data['reminded_users'] = list(reminded_users)
-                save_data(data)
+                store.commit(('reminded_users',))
                 return True, "Recordatorio enviado exitosamente"
             else:
                 return False, "Error al enviar el recordatorio"
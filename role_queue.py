@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import discord
+
+from api_retry import retry_api_call
+
+logger = logging.getLogger(__name__)
+
+# Longitud máxima del motivo en el registro de auditoría de Discord
+_MAX_REASON = 512
+
+
+class RoleChange:
+    """Cambio de rol pendiente: dar (``add``) o quitar (``remove``) un rol a un miembro.
+
+    ``on_done`` se llama con True o False cuando el cambio se ha aplicado
+    (o descartado).
+    """
+
+    __slots__ = ("guild_id", "user_id", "role_id", "action", "reason", "on_done")
+
+    def __init__(self, guild_id: int, user_id: int, role_id: int, action: str,
+                 reason: Optional[str] = None, on_done: Optional[Callable[[bool], None]] = None):
+        if action not in ("add", "remove"):
+            raise ValueError(f"Acción de rol no válida: {action}")
+        self.guild_id = int(guild_id)
+        self.user_id = int(user_id)
+        self.role_id = int(role_id)
+        self.action = action
+        self.reason = reason
+        self.on_done = on_done
+
+
+class RoleQueue:
+    """Cola en segundo plano para los cambios de roles de los miembros.
+
+    Quien encola no espera a Discord: la compra responde en cuanto se
+    registra y el rol se aplica después. Los cambios pendientes de un mismo
+    miembro se agrupan en una sola llamada ``member.edit(roles=...)`` (si
+    llegan dar y quitar el mismo rol, gana el último). Cada servidor tiene
+    como mucho ``guild_concurrency`` miembros en curso y entre todos los
+    servidores no hay más de ``global_concurrency`` peticiones a la vez,
+    con una pausa de ``interval`` segundos tras cada una, de modo que una
+    oleada de compras no agota el límite global de la API. Ante un 429 se
+    espera el ``retry_after`` indicado (o un retroceso exponencial) y se
+    reintenta.
+    """
+
+    def __init__(self, guild_concurrency: int = 2, global_concurrency: int = 5,
+                 interval: float = 0.25, max_retries: int = 5, backoff: float = 1.0):
+        self.guild_concurrency = guild_concurrency
+        self.global_concurrency = global_concurrency
+        self.interval = interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.client: Optional[discord.Client] = None
+        # (servidor, miembro) -> {rol: [cambios en orden de llegada]}
+        self._pending: Dict[Tuple[int, int], Dict[int, List[RoleChange]]] = {}
+        # Miembros con cambios pendientes de cada servidor, en orden de llegada
+        self._order: Dict[int, deque] = {}
+        self._in_flight = set()
+        self._workers: Dict[int, int] = {}
+        self._global = None
+
+    def start(self, client: discord.Client):
+        """Empieza a procesar la cola (se puede llamar varias veces)."""
+        self.client = client
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.global_concurrency)
+        for guild_id in list(self._order):
+            self._spawn(guild_id)
+
+    def enqueue(self, change: RoleChange):
+        key = (change.guild_id, change.user_id)
+        member_changes = self._pending.get(key)
+        if member_changes is None:
+            member_changes = self._pending[key] = {}
+            if key not in self._in_flight:
+                self._order.setdefault(change.guild_id, deque()).append(change.user_id)
+        member_changes.setdefault(change.role_id, []).append(change)
+        self._spawn(change.guild_id)
+
+    def __len__(self) -> int:
+        return sum(len(changes) for member in self._pending.values() for changes in member.values())
+
+    def _spawn(self, guild_id: int):
+        if self._global is None:
+            return  # Aún no arrancada: se procesará en start()
+        queued = len(self._order.get(guild_id, ()))
+        while self._workers.get(guild_id, 0) < min(self.guild_concurrency, queued):
+            self._workers[guild_id] = self._workers.get(guild_id, 0) + 1
+            asyncio.get_running_loop().create_task(self._guild_worker(guild_id))
+
+    async def _guild_worker(self, guild_id: int):
+        order = self._order[guild_id]
+        try:
+            while order:
+                user_id = order.popleft()
+                key = (guild_id, user_id)
+                changes = self._pending.pop(key)
+                self._in_flight.add(key)
+                try:
+                    async with self._global:
+                        await self._apply_member(guild_id, user_id, changes)
+                        await asyncio.sleep(self.interval)
+                except Exception as e:
+                    logger.error(f"Error al aplicar cambios de roles de {user_id}: {e}")
+                    self._finish(changes, {})
+                finally:
+                    self._in_flight.discard(key)
+                    if key in self._pending:
+                        # Llegaron cambios mientras se aplicaban los anteriores
+                        order.append(user_id)
+        finally:
+            self._workers[guild_id] -= 1
+            if not self._workers[guild_id]:
+                del self._workers[guild_id]
+                if not order:
+                    del self._order[guild_id]
+
+    async def _apply_member(self, guild_id: int, user_id: int, changes: Dict[int, List[RoleChange]]):
+        guild = self.client.get_guild(guild_id) if self.client else None
+        if guild is None:
+            logger.warning(f"Servidor {guild_id} no disponible para cambiar roles")
+            self._finish(changes, {})
+            return
+
+        # Acción final de cada rol: el último cambio encolado
+        wanted = {role_id: role_changes[-1].action for role_id, role_changes in changes.items()}
+        for role_id in [role_id for role_id in wanted if guild.get_role(role_id) is None]:
+            logger.warning(f"Rol {role_id} no encontrado en el servidor {guild_id}")
+            del wanted[role_id]
+        reason = "; ".join(dict.fromkeys(c.reason for cs in changes.values() for c in cs if c.reason))[:_MAX_REASON] or None
+
+        async def apply():
+            member = guild.get_member(user_id) or await guild.fetch_member(user_id)
+            current = {role.id for role in member.roles if not role.is_default()}
+            roles = set(current)
+            for role_id, action in wanted.items():
+                if action == "add":
+                    roles.add(role_id)
+                else:
+                    roles.discard(role_id)
+            if roles != current:
+                await member.edit(roles=[discord.Object(id=role_id) for role_id in roles], reason=reason)
+
+        try:
+            await retry_api_call(apply, self.max_retries, self.backoff, "cambiar roles")
+        except discord.NotFound:
+            # El miembro ya no está en el servidor: sus roles ya no existen
+            self._finish(changes, {role_id: action for role_id, action in wanted.items() if action == "remove"})
+            return
+        except discord.Forbidden:
+            logger.error(f"Sin permisos para cambiar los roles de {user_id} en el servidor {guild_id}")
+        except (discord.RateLimited, discord.HTTPException) as e:
+            logger.error(f"Error al cambiar los roles de {user_id}: {e}")
+        else:
+            self._finish(changes, wanted)
+            return
+        self._finish(changes, {})
+
+    @staticmethod
+    def _finish(changes: Dict[int, List[RoleChange]], applied: Dict[int, str]):
+        """Avisa a cada cambio de si quedó aplicado (los sustituidos por otro posterior fallan)."""
+        for role_id, role_changes in changes.items():
+            for change in role_changes:
+                if change.on_done is None:
+                    continue
+                try:
+                    change.on_done(applied.get(role_id) == change.action)
+                except Exception as e:
+                    logger.error(f"Error al registrar el cambio de rol: {e}")
+
+
+# Instancia global de la cola de roles
+role_queue = RoleQueue()
@@ -0,0 +1,246 @@
+import bisect
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from data_manager import load_data
+
+# Tipos de documento del catálogo
+VIRTUAL = "virtual"   # Tienda virtual (GameCoins)
+PRODUCT = "product"   # Productos de pago real
+GIFT = "gift"         # Regalos de la tienda de Fortnite
+
+# Fracción mínima de trigramas de la búsqueda que debe tener un nombre para
+# aceptarlo con erratas
+FUZZY_MIN_OVERLAP = 0.5
+
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin acentos, para comparar "Cosméticos" con "cosmeticos"."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower().strip()
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Índice en memoria con búsqueda por prefijo, subcadena y con erratas.
+
+    Cada documento se identifica por ``(tipo, id)``. Los tokens del nombre
+    se guardan en una lista ordenada (prefijos con ``bisect``) y los
+    trigramas en listas invertidas, de modo que una búsqueda solo revisa
+    los documentos que comparten algo con el texto buscado.
+    """
+
+    def __init__(self):
+        self._docs: Dict[Tuple[str, str], Dict] = {}
+        self._tokens: List[Tuple[str, Tuple[str, str]]] = []
+        self._trigrams: Dict[str, set] = {}
+        self._ids: Dict[str, set] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def upsert(self, kind: str, doc_id: str, name: str, label: Optional[str] = None, **extra):
+        """Añade o reemplaza un documento."""
+        key = (kind, doc_id)
+        self.remove(kind, doc_id)
+        norm = normalize(name)
+        norm_id = normalize(doc_id)
+        doc = {
+            "kind": kind,
+            "id": doc_id,
+            "name": name,
+            "label": label or name,
+            "norm": norm,
+            "norm_id": norm_id,
+            "tokens": sorted(set(norm.split())),
+            # También el ID, para encontrar un producto pegando parte de él
+            "trigrams": trigrams(norm) | trigrams(norm_id),
+            **extra
+        }
+        self._docs[key] = doc
+        for token in doc["tokens"]:
+            bisect.insort(self._tokens, (token, key))
+        for gram in doc["trigrams"]:
+            self._trigrams.setdefault(gram, set()).add(key)
+        self._ids.setdefault(norm_id, set()).add(key)
+
+    def remove(self, kind: str, doc_id: str):
+        key = (kind, doc_id)
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for token in doc["tokens"]:
+            index = bisect.bisect_left(self._tokens, (token, key))
+            if index < len(self._tokens) and self._tokens[index] == (token, key):
+                del self._tokens[index]
+        for gram in doc["trigrams"]:
+            keys = self._trigrams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._trigrams[gram]
+        keys = self._ids.get(doc["norm_id"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._ids[doc["norm_id"]]
+
+    def remove_kind(self, kind: str):
+        for doc_kind, doc_id in [key for key in self._docs if key[0] == kind]:
+            self.remove(doc_kind, doc_id)
+
+    def _prefix_matches(self, query: str) -> Iterable[Tuple[str, str]]:
+        index = bisect.bisect_left(self._tokens, (query,))
+        while index < len(self._tokens) and self._tokens[index][0].startswith(query):
+            yield self._tokens[index][1]
+            index += 1
+
+    def search(self, query: str, kinds: Optional[Iterable[str]] = None, limit: int = 25) -> List[Dict]:
+        """Documentos que coinciden con ``query``, de mejor a peor.
+
+        Orden: nombre o ID exacto, nombre que empieza por la búsqueda,
+        palabra que empieza por la búsqueda, subcadena y, por último,
+        coincidencias aproximadas por trigramas. Con menos de tres
+        caracteres solo cuentan los prefijos de palabra y el ID exacto.
+        """
+        kinds = set(kinds) if kinds else None
+        query = normalize(query)
+
+        def allowed(key):
+            return kinds is None or key[0] in kinds
+
+        if not query:
+            docs = sorted((doc for key, doc in self._docs.items() if allowed(key)), key=lambda d: d["norm"])
+            return [self._result(doc, 0) for doc in docs[:limit]]
+
+        scores: Dict[Tuple[str, str], int] = {}
+
+        def score(key, value):
+            if allowed(key) and value > scores.get(key, -1):
+                scores[key] = value
+
+        for key in self._prefix_matches(query):
+            doc = self._docs[key]
+            score(key, 100 if doc["norm"] == query else 80 if doc["norm"].startswith(query) else 60)
+
+        query_grams = trigrams(query)
+        candidates = Counter()
+        if len(query) < 3:
+            # Demasiado corta para los trigramas (es lo que llega al teclear la
+            # primera letra): basta con los prefijos de palabra y el ID exacto
+            for key in self._ids.get(query, ()):
+                score(key, 100)
+        else:
+            for gram in query_grams:
+                for key in self._trigrams.get(gram, ()):
+                    candidates[key] += 1
+
+        for key, shared in candidates.items():
+            if key in scores or not allowed(key):
+                continue
+            doc = self._docs[key]
+            if doc["norm_id"] == query:
+                score(key, 100)
+            elif query in doc["norm"] or query in doc["norm_id"]:
+                score(key, 40)
+            elif len(query) >= 3:
+                overlap = shared / len(query_grams)
+                if overlap >= FUZZY_MIN_OVERLAP:
+                    score(key, int(overlap * 30))
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self._docs[item[0]]["norm"]), self._docs[item[0]]["norm"]))
+        return [self._result(self._docs[key], value) for key, value in ranked[:limit]]
+
+    @staticmethod
+    def _result(doc: Dict, score: int) -> Dict:
+        result = {k: v for k, v in doc.items() if k not in ("norm", "norm_id", "tokens", "trigrams")}
+        result["score"] = score
+        return result
+
+
+class CatalogIndex(SearchIndex):
+    """Índice de la tienda virtual, los productos de pago y los regalos.
+
+    Se construye la primera vez que se busca y después se mantiene con
+    ``update_virtual_product``, ``update_product`` y ``refresh_gifts``
+    cada vez que cambian esos datos.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._built = False
+
+    def ensure_built(self):
+        if self._built:
+            return
+        data = load_data()
+        for product_id, product in data.get("virtual_shop", {}).get("products", {}).items():
+            self._index_virtual(product_id, product)
+        for product_id, product in data.get("products", {}).items():
+            self._index_product(product_id, product)
+        for gift_id, gift in data.get("gifts", {}).items():
+            self._index_gift(gift_id, gift)
+        self._built = True
+
+    def _index_virtual(self, product_id: str, product: Dict):
+        self.upsert(
+            VIRTUAL, product_id, product["name"],
+            label=f"{product['name']} ({product['price']:,} GameCoins)",
+            price=product["price"],
+            enabled=product.get("enabled", True)
+        )
+
+    def _index_product(self, product_id: str, product: Dict):
+        self.upsert(
+            PRODUCT, product_id, product["name"],
+            label=f"{product['name']} (${product['price']:.2f} MXN)",
+            price=product["price"]
+        )
+
+    def _index_gift(self, gift_id: str, gift: Dict):
+        self.upsert(
+            GIFT, gift_id, gift.get("name", "Desconocido"),
+            label=f"{gift.get('name', 'Desconocido')} ({gift.get('price', 0)} V-Bucks)",
+            price=gift.get("price", 0)
+        )
+
+    def update_virtual_product(self, product_id: str):
+        """Vuelve a indexar un producto virtual tras crearlo, editarlo o eliminarlo."""
+        if not self._built:
+            return
+        product = load_data().get("virtual_shop", {}).get("products", {}).get(product_id)
+        if product is None:
+            self.remove(VIRTUAL, product_id)
+        else:
+            self._index_virtual(product_id, product)
+
+    def update_product(self, product_id: str):
+        """Vuelve a indexar un producto de pago tras crearlo, editarlo o eliminarlo."""
+        if not self._built:
+            return
+        product = load_data().get("products", {}).get(product_id)
+        if product is None:
+            self.remove(PRODUCT, product_id)
+        else:
+            self._index_product(product_id, product)
+
+    def refresh_gifts(self):
+        """Reindexa los regalos; la tienda de Fortnite se reemplaza completa al sincronizar."""
+        if not self._built:
+            return
+        self.remove_kind(GIFT)
+        for gift_id, gift in load_data().get("gifts", {}).items():
+            self._index_gift(gift_id, gift)
+
+    def search(self, query: str, kinds: Optional[Iterable[str]] = None, limit: int = 25) -> List[Dict]:
+        self.ensure_built()
+        return super().search(query, kinds, limit)
+
+
+# Instancia global del índice del catálogo
+catalog_index = CatalogIndex()
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+import discord
+
+from api_retry import retry_api_call
+from perf_metrics import metrics, percentile
+
+logger = logging.getLogger(__name__)
+
+
+class TicketRequest:
+    """Ticket pendiente de que se cree su canal.
+
+    ``create_channel`` hace la llamada a Discord y se reintenta si hay un
+    429 o un error 5xx. Un 5xx puede llegar después de que Discord haya
+    creado el canal, así que debe poder repetirse sin duplicarlo (p. ej.
+    devolviendo el canal con ese nombre si ya existe). Después se llama
+    una sola vez a ``on_created(channel)`` o, si no se pudo crear, a
+    ``on_failed()``.
+    """
+
+    __slots__ = ("user_id", "create_channel", "on_created", "on_failed", "enqueued_at")
+
+    def __init__(self, user_id: str, create_channel: Callable[[], Awaitable[discord.abc.GuildChannel]],
+                 on_created: Callable[[discord.abc.GuildChannel], Awaitable[None]],
+                 on_failed: Optional[Callable[[], Awaitable[None]]] = None):
+        self.user_id = str(user_id)
+        self.create_channel = create_channel
+        self.on_created = on_created
+        self.on_failed = on_failed
+        self.enqueued_at = time.monotonic()
+
+
+class TicketQueue:
+    """Cola de creación de canales de ticket.
+
+    El botón de confirmar responde al momento y deja aquí la petición; como
+    mucho ``concurrency`` canales se crean a la vez, con una pausa de
+    ``interval`` segundos tras cada uno, para que una avalancha de tickets
+    (promociones) no choque con el límite de creación de canales. Ante un
+    429 se espera el ``retry_after`` indicado (o un retroceso exponencial)
+    y se reintenta. ``stats`` da la profundidad de la cola y los tiempos de
+    espera, que se muestran en ``/perf`` y se vuelcan con las métricas.
+    """
+
+    def __init__(self, concurrency: int = 2, interval: float = 0.5,
+                 max_retries: int = 5, backoff: float = 1.0, samples: int = 512):
+        self.concurrency = concurrency
+        self.interval = interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue: deque = deque()
+        self._queued_users = set()
+        self._workers = 0
+        self._in_progress = 0
+        self.created = 0
+        self.failed = 0
+        self.retries = 0
+        # Últimas esperas en cola y duraciones de creación, para los percentiles
+        self._waits = deque(maxlen=samples)
+        self._create_times = deque(maxlen=samples)
+
+    def enqueue(self, request: TicketRequest) -> int:
+        """Encola la petición y devuelve su posición (1 = la siguiente)."""
+        self._queue.append(request)
+        self._queued_users.add(request.user_id)
+        while self._workers < min(self.concurrency, len(self._queue)):
+            self._workers += 1
+            asyncio.get_running_loop().create_task(self._worker())
+        return len(self._queue)
+
+    def is_queued(self, user_id: str) -> bool:
+        """True si el usuario tiene un ticket esperando o creándose."""
+        return str(user_id) in self._queued_users
+
+    def __len__(self) -> int:
+        return len(self._queue) + self._in_progress
+
+    def stats(self) -> Dict:
+        return {
+            "depth": len(self._queue),
+            "in_progress": self._in_progress,
+            "created": self.created,
+            "failed": self.failed,
+            "retries": self.retries,
+            "wait_p50_ms": percentile(self._waits, 50) * 1000,
+            "wait_p95_ms": percentile(self._waits, 95) * 1000,
+            "wait_max_ms": max(self._waits, default=0.0) * 1000,
+            "create_p95_ms": percentile(self._create_times, 95) * 1000
+        }
+
+    async def _worker(self):
+        try:
+            while self._queue:
+                request = self._queue.popleft()
+                self._in_progress += 1
+                try:
+                    await self._process(request)
+                except Exception as e:
+                    logger.error(f"Error al procesar el ticket de {request.user_id}: {e}")
+                finally:
+                    self._in_progress -= 1
+                    self._queued_users.discard(request.user_id)
+                await asyncio.sleep(self.interval)
+        finally:
+            self._workers -= 1
+
+    async def _process(self, request: TicketRequest):
+        wait = time.monotonic() - request.enqueued_at
+        self._waits.append(wait)
+        started = time.monotonic()
+        channel = await self._create(request)
+        if channel is None:
+            self.failed += 1
+            if request.on_failed is not None:
+                await request.on_failed()
+            return
+        self.created += 1
+        self._create_times.append(time.monotonic() - started)
+        logger.info(f"Canal de ticket {channel.id} creado para {request.user_id} tras {wait:.1f}s en cola")
+        await request.on_created(channel)
+
+    async def _create(self, request: TicketRequest) -> Optional[discord.abc.GuildChannel]:
+        try:
+            return await retry_api_call(request.create_channel, self.max_retries, self.backoff,
+                                        "crear un canal de ticket", on_retry=self._count_retry)
+        except discord.Forbidden:
+            logger.error(f"Sin permisos para crear el canal del ticket de {request.user_id}")
+        except (discord.RateLimited, discord.HTTPException) as e:
+            logger.error(f"No se pudo crear el canal del ticket de {request.user_id}: {e}")
+        return None
+
+    def _count_retry(self):
+        self.retries += 1
+
+
+# Instancia global de la cola de tickets
+ticket_queue = TicketQueue()
+metrics.register_queue("tickets", ticket_queue.stats)
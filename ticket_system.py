@@ -0,0 +1,114 @@
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from data_manager import load_data
+
+# Estados detallados con los que un ticket "abierto" ya cuenta como cerrado
+CLOSED_STATES = ("cerrado_por_owner", "cerrado")
+
+
+def is_open(ticket: Dict) -> bool:
+    return ticket.get("status") == "abierto" and ticket.get("estado_detallado") not in CLOSED_STATES
+
+
+class TicketIndex:
+    """Tickets abiertos indexados por usuario, estado y antigüedad.
+
+    El historial de tickets crece sin límite (los cerrados no se borran),
+    así que comprobar si un usuario ya tiene un ticket abierto no debe
+    recorrerlo. Aquí solo están los abiertos: por usuario, por
+    ``estado_detallado`` y en una lista ordenada por fecha de creación.
+    Se construye en la primera consulta y se mantiene con ``update`` cada
+    vez que se crea o se cierra un ticket.
+    """
+
+    def __init__(self):
+        self._tickets = None
+        self._by_user: Dict[str, set] = {}
+        self._by_status: Dict[str, set] = {}
+        self._by_age: List[Tuple[str, str]] = []
+        self._keys: Dict[str, Tuple[str, str, Tuple[str, str]]] = {}
+
+    def _ensure_built(self) -> Dict:
+        tickets = load_data().get("tickets", {})
+        # Reconstruir si el estado se volvió a cargar desde disco
+        if self._tickets is tickets:
+            return tickets
+        self._tickets = tickets
+        self._by_user = {}
+        self._by_status = {}
+        self._by_age = []
+        self._keys = {}
+        for ticket_id, ticket in tickets.items():
+            self._add(ticket_id, ticket)
+        self._by_age.sort()
+        return tickets
+
+    def _add(self, ticket_id: str, ticket: Dict, insort: bool = False):
+        if not isinstance(ticket, dict) or not is_open(ticket):
+            return
+        user_id = ticket.get("user_id")
+        status = ticket.get("estado_detallado") or "abierto"
+        age_key = (ticket.get("timestamp", ""), ticket_id)
+        self._keys[ticket_id] = (user_id, status, age_key)
+        self._by_user.setdefault(user_id, set()).add(ticket_id)
+        self._by_status.setdefault(status, set()).add(ticket_id)
+        if insort:
+            bisect.insort(self._by_age, age_key)
+        else:
+            self._by_age.append(age_key)
+
+    def update(self, ticket_id: str):
+        """Reindexa un ticket tras crearlo, cambiar su estado o cerrarlo."""
+        tickets = load_data().get("tickets", {})
+        if self._tickets is not tickets:
+            # Aún no construido o estado recargado: se hará completo en la próxima consulta
+            return
+        old = self._keys.pop(ticket_id, None)
+        if old is not None:
+            user_id, status, age_key = old
+            for index, key in ((self._by_user, user_id), (self._by_status, status)):
+                index[key].discard(ticket_id)
+                if not index[key]:
+                    del index[key]
+            position = bisect.bisect_left(self._by_age, age_key)
+            if position < len(self._by_age) and self._by_age[position] == age_key:
+                del self._by_age[position]
+        ticket = tickets.get(ticket_id)
+        if ticket is not None:
+            self._add(ticket_id, ticket, insort=True)
+
+    def open_ticket_ids(self, user_id: str) -> List[str]:
+        """IDs de los tickets abiertos de un usuario."""
+        self._ensure_built()
+        return list(self._by_user.get(user_id, ()))
+
+    def has_open_ticket(self, user_id: str) -> bool:
+        self._ensure_built()
+        return user_id in self._by_user
+
+    def status_counts(self) -> Dict[str, int]:
+        """Número de tickets abiertos por ``estado_detallado``."""
+        self._ensure_built()
+        return {status: len(ticket_ids) for status, ticket_ids in self._by_status.items()}
+
+    def open_tickets(self, status: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[str, Dict]]:
+        """Tickets abiertos ``(id, ticket)`` del más antiguo al más reciente."""
+        tickets = self._ensure_built()
+        allowed = self._by_status.get(status, set()) if status else None
+        result = []
+        for _, ticket_id in self._by_age:
+            if allowed is not None and ticket_id not in allowed:
+                continue
+            result.append((ticket_id, tickets[ticket_id]))
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def __len__(self) -> int:
+        self._ensure_built()
+        return len(self._keys)
+
+
+# Instancia global del índice de tickets
+ticket_index = TicketIndex()
@@ -73,7 +73,8 @@ async def handle_interaction_response(interaction: discord.Interaction, message:
             pass
 
 from config import OWNER_ROLE_ID, FORTNITE_API_URL, FORTNITE_HEADERS
-from data_manager import load_data, save_data  # Esto está bien porque utils.py está en el directorio raíz
+from data_manager import load_data, store  # Esto está bien porque utils.py está en el directorio raíz
+from search_index import catalog_index
 
 def is_owner():
     async def predicate(interaction: discord.Interaction) -> bool:
@@ -146,7 +147,8 @@ def sync_fortnite_shop():
         with open('fortnite_shop_cache.json', 'w', encoding='utf-8') as f:
             json.dump(data["gifts"], f)
             
-        save_data(data)
+        store.commit(("gifts",), ("shop",))
+        catalog_index.refresh_gifts()
         return True
     except requests.RequestException as e:
         logger.error(f"Error al sincronizar tienda: {e}")
@@ -167,59 +167,57 @@ class BlackjackView(discord.ui.View):
         # Verificar blackjack del dealer primero (para insurance)
         dealer_blackjack = dealer_value == 21 and len(self.dealer_hand) == 2
         
-        # Procesar insurance si aplica
-        if dealer_blackjack and self.has_insurance:
-            # Insurance paga 2:1
-            insurance_payout = (self.original_bet // 2) * 3
-            self.economy.add_coins(self.user_id, insurance_payout, "Blackjack insurance win")
-        
-        # El dealer toma cartas hasta 17 (solo si el jugador no se pasó y no tiene blackjack)
-        if player_value <= 21 and not dealer_blackjack:
-            while dealer_value < 17:
-                self.dealer_hand.append(self.deck.pop())
-                dealer_value = self.calculate_hand_value(self.dealer_hand)
-        
-        # Procesar resultado económico
-        if player_value > 21:
-            # Jugador se pasó - ya perdió la apuesta al inicio
-            self.economy._update_game_stats(self.user_id, False)
-        elif dealer_blackjack and player_value != 21:
-            # Dealer tiene blackjack y jugador no
-            self.economy._update_game_stats(self.user_id, False)
-        elif dealer_value > 21:
-            # Dealer se pasó - jugador gana
-            winnings = self.bet * 2
-            self.economy.add_coins(self.user_id, winnings, "Blackjack win")
-            self.economy._update_game_stats(self.user_id, True)
-        elif player_value == 21 and len(self.player_hand) == 2 and not dealer_blackjack:
-            # Blackjack natural del jugador
-            winnings = int(self.bet * 2.5)
-            self.economy.add_coins(self.user_id, winnings, "Blackjack win")
-            self.economy._update_game_stats(self.user_id, True)
-        elif player_value > dealer_value:
-            # Jugador gana
-            winnings = self.bet * 2
-            self.economy.add_coins(self.user_id, winnings, "Blackjack win")
-            self.economy._update_game_stats(self.user_id, True)
-        elif player_value == dealer_value:
-            # Empate - devolver apuesta
-            self.economy.add_coins(self.user_id, self.bet, "Blackjack tie")
-            self.economy._update_game_stats(self.user_id, False)
-        else:
-            # Dealer gana - ya perdió la apuesta al inicio
-            self.economy._update_game_stats(self.user_id, False)
-        
-        # Actualizar progreso de tarea de minijuegos
-        self.economy.update_task_progress(self.user_id, "play_minigames")
+        # Liquidar la partida en una sola transacción
+        async with self.economy.transaction(self.user_id) as tx:
+            payouts = []
+            
+            # Procesar insurance si aplica
+            if dealer_blackjack and self.has_insurance:
+                # Insurance paga 2:1
+                insurance_payout = (self.original_bet // 2) * 3
+                payouts.append((insurance_payout, "Blackjack insurance win"))
+            
+            # El dealer toma cartas hasta 17 (solo si el jugador no se pasó y no tiene blackjack)
+            if player_value <= 21 and not dealer_blackjack:
+                while dealer_value < 17:
+                    self.dealer_hand.append(self.deck.pop())
+                    dealer_value = self.calculate_hand_value(self.dealer_hand)
+            
+            # Procesar resultado económico
+            won = False
+            if player_value > 21:
+                # Jugador se pasó - ya perdió la apuesta al inicio
+                pass
+            elif dealer_blackjack and player_value != 21:
+                # Dealer tiene blackjack y jugador no
+                pass
+            elif dealer_value > 21:
+                # Dealer se pasó - jugador gana
+                payouts.append((self.bet * 2, "Blackjack win"))
+                won = True
+            elif player_value == 21 and len(self.player_hand) == 2 and not dealer_blackjack:
+                # Blackjack natural del jugador
+                payouts.append((int(self.bet * 2.5), "Blackjack win"))
+                won = True
+            elif player_value > dealer_value:
+                # Jugador gana
+                payouts.append((self.bet * 2, "Blackjack win"))
+                won = True
+            elif player_value == dealer_value:
+                # Empate - devolver apuesta
+                payouts.append((self.bet, "Blackjack tie"))
+            # Si no, el dealer gana - ya perdió la apuesta al inicio
+            
+            # Pagos, estadísticas y progreso de la tarea de minijuegos
+            new_balance = self.economy._settle_game(tx, self.user_id, won, payouts)
         
         self.update_buttons()
         
         # Mostrar balance actualizado
-        user_economy = self.economy.get_user_economy(self.user_id)
         embed = self.create_embed()
         embed.add_field(
             name="💳 Balance",
-            value=f"{user_economy['coins']:,} GameCoins",
+            value=f"{new_balance:,} GameCoins",
             inline=True
         )
         
@@ -263,17 +261,13 @@ class BlackjackView(discord.ui.View):
             await interaction.response.send_message("❌ No puedes doblar en este momento.", ephemeral=True)
             return
         
-        # Verificar si tiene fondos para doblar
-        user_economy = self.economy.get_user_economy(self.user_id)
-        if user_economy['coins'] < self.bet:
+        # Verificar fondos y cobrar la apuesta adicional en un solo paso
+        async with self.economy.transaction(self.user_id) as tx:
+            charged = tx.debit(self.user_id, self.bet, "Blackjack double bet")
+        if not charged:
             await interaction.response.send_message("❌ No tienes suficientes GameCoins para doblar.", ephemeral=True)
             return
         
-        # Cobrar la apuesta adicional
-        if not self.economy.remove_coins(self.user_id, self.bet, "Blackjack double bet"):
-            await interaction.response.send_message("❌ Error al procesar la apuesta adicional.", ephemeral=True)
-            return
-        
         # Duplicar apuesta y tomar exactamente una carta
         self.bet *= 2
         self.can_double = False
@@ -295,17 +289,13 @@ class BlackjackView(discord.ui.View):
         # El seguro cuesta la mitad de la apuesta original
         insurance_cost = self.original_bet // 2
         
-        # Verificar si tiene fondos para el seguro
-        user_economy = self.economy.get_user_economy(self.user_id)
-        if user_economy['coins'] < insurance_cost:
+        # Verificar fondos y cobrar el seguro en un solo paso
+        async with self.economy.transaction(self.user_id) as tx:
+            charged = tx.debit(self.user_id, insurance_cost, "Blackjack insurance bet")
+        if not charged:
             await interaction.response.send_message("❌ No tienes suficientes GameCoins para el seguro.", ephemeral=True)
             return
         
-        # Cobrar el seguro
-        if not self.economy.remove_coins(self.user_id, insurance_cost, "Blackjack insurance bet"):
-            await interaction.response.send_message("❌ Error al procesar el seguro.", ephemeral=True)
-            return
-        
         self.has_insurance = True
         self.insurance_offered = True
         
@@ -330,17 +320,13 @@ class BlackjackView(discord.ui.View):
             await interaction.response.send_message("❌ No puedes dividir en este momento.", ephemeral=True)
             return
         
-        # Verificar si tiene fondos para la segunda apuesta
-        user_economy = self.economy.get_user_economy(self.user_id)
-        if user_economy['coins'] < self.bet:
+        # Verificar fondos y cobrar la segunda apuesta en un solo paso
+        async with self.economy.transaction(self.user_id) as tx:
+            charged = tx.debit(self.user_id, self.bet, "Blackjack split bet")
+        if not charged:
             await interaction.response.send_message("❌ No tienes suficientes GameCoins para dividir.", ephemeral=True)
             return
         
-        # Cobrar la segunda apuesta
-        if not self.economy.remove_coins(self.user_id, self.bet, "Blackjack split bet"):
-            await interaction.response.send_message("❌ Error al procesar la segunda apuesta.", ephemeral=True)
-            return
-        
         # Por simplicidad, en esta implementación el split solo duplica la apuesta
         # y continúa con una sola mano (implementación completa requeriría más lógica)
         self.has_split = True
@@ -1,6 +1,9 @@
 import discord
 from typing import List, Dict, Tuple
 
+from data_manager import get_all_categories, store
+from embed_cache import embed_cache
+
 class EnhancedProductView(discord.ui.View):
     def __init__(self, products: List[Tuple[str, Dict]], pages: List[List], current_page: int = 0):
         super().__init__(timeout=180)  # 3 minutos de timeout
@@ -9,23 +12,26 @@ class EnhancedProductView(discord.ui.View):
         self.current_page = current_page
         self.selected_product = None
         self.selected_category = None
+        # Versión de los datos con los que se construyeron las páginas (clave de la caché de embeds)
+        self.data_version = (store.version("products"), store.version("categories"))
+        self.category_names = {cat_id: cat_info['name'] for cat_id, cat_info in get_all_categories().items()}
         self.categories = self._get_categories()
         self.update_buttons()
         self._setup_category_select()
 
     def _get_categories(self) -> List[str]:
-        # Obtener todas las categorías del sistema
-        from data_manager import get_all_categories
-        categories_data = get_all_categories()
         categories = ['Sin categoría']  # Asegurar que siempre exista la categoría por defecto
         
         # Añadir todas las categorías existentes
-        for category_id, category in categories_data.items():
-            categories.append(category['name'])
+        categories.extend(self.category_names.values())
         
         return sorted(categories)
 
     def create_embed(self) -> discord.Embed:
+        key = ("products", self.current_page, self.selected_category, len(self.pages), self.data_version)
+        return embed_cache.get(key, self._build_embed)
+
+    def _build_embed(self) -> discord.Embed:
         embed = discord.Embed(
             title="🛍️ Catálogo de Productos",
             description="Explora nuestros productos por categoría\n\n**Comprar:** Usa '🛒 Seleccionar' para elegir un producto",
@@ -37,11 +43,7 @@ class EnhancedProductView(discord.ui.View):
             return embed
 
         current_page_products = self.pages[self.current_page]
-        
-        # Obtener el mapeo de categorías
-        from data_manager import get_all_categories
-        categories_data = get_all_categories()
-        category_name_map = {cat_id: cat_info['name'] for cat_id, cat_info in categories_data.items()}
+        category_name_map = self.category_names
 
         # Filtrar productos por categoría seleccionada
         filtered_products = []
@@ -3,8 +3,10 @@ from typing import Optional
 from datetime import datetime
 import uuid
 from utils import check_user_permissions, handle_interaction_response, logger
-from data_manager import load_data, save_data
+from data_manager import load_data, store
 from config import TICKET_CHANNEL_ID, OWNER_ROLE_ID
+from ticket_system import ticket_index
+from ticket_queue import TicketRequest, ticket_queue
 
 class EnhancedTicketView(discord.ui.View):
     payment_emojis = {
@@ -95,114 +97,147 @@ class EnhancedTicketView(discord.ui.View):
             )
             return
 
-        try:
-            # Crear el ticket en el canal apropiado
-            overwrites = {
-                interaction.guild.default_role: discord.PermissionOverwrite(view_channel=False),
-                interaction.user: discord.PermissionOverwrite(view_channel=True, send_messages=True),
-                interaction.guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True, manage_channels=True)
-            }
-            
-            owner_role = interaction.guild.get_role(OWNER_ROLE_ID)
-            if owner_role:
-                overwrites[owner_role] = discord.PermissionOverwrite(view_channel=True, send_messages=True, manage_channels=True)
-            
-            # Obtener o crear el canal del ticket
-            guild = interaction.guild
-            category = None
-            ticket_channel = guild.get_channel(TICKET_CHANNEL_ID)
-            if isinstance(ticket_channel, discord.CategoryChannel):
-                category = ticket_channel
-            elif ticket_channel:
-                category = ticket_channel.category
-
-            # Generar ID único para el ticket
-            ticket_id = f"ticket-{uuid.uuid4().hex[:8]}"
-            
-            # Crear el canal del ticket
-            channel = await guild.create_text_channel(
-                name=ticket_id,
-                category=category,
-                overwrites=overwrites,
-                topic=f"Ticket de {interaction.user.name} (ID: {ticket_id})"
-            )
-            
-            # Guardar la información del ticket
-            data = load_data()
-            data["tickets"][ticket_id] = {
-                "user_id": str(interaction.user.id),
-                "channel_id": str(channel.id),
-                "product_id": self.product_id,
-                "product_name": self.product_name,
-                "payment_method": self.payment_method,
-                "status": "abierto",
-                "estado_detallado": "esperando_revision",
-                "timestamp": datetime.utcnow().isoformat(),
-                "historial": [{
-                    "estado": "creado",
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "detalles": "Ticket creado por el usuario"
-                }]
-            }
-            save_data(data)
-            
-            # Actualizar la vista
-            self.confirmed = True
-            for child in self.children:
-                child.disabled = True
-
-            embed = discord.Embed(
-                title="✅ Ticket Creado",
-                description=f"Tu ticket ha sido creado exitosamente en {channel.mention}.",
-                color=0x00FF00
-            )
-            await interaction.response.edit_message(embed=embed, view=self)
-            
-            # Enviar mensaje inicial en el canal del ticket
-            ticket_embed = discord.Embed(
-                title=f"🌟 Nuevo Ticket | {ticket_id}",
-                description=f"¡Hola <@&{OWNER_ROLE_ID}>! Un nuevo ticket requiere tu atención.",
-                color=0xA100F2,
-                timestamp=datetime.utcnow()
-            )
-            ticket_embed.add_field(
-                name="👤 Cliente",
-                value=f"{interaction.user.mention}\nID: `{interaction.user.id}`",
-                inline=True
-            )
-            ticket_embed.add_field(
-                name="📦 Producto",
-                value=f"**{self.product_name}**\nID: `{self.product_id}`",
-                inline=True
-            )
-            ticket_embed.add_field(
-                name="💳 Método de Pago",
-                value=f"{self.payment_emojis.get(self.payment_method, '💰')} **{self.payment_method}**",
-                inline=True
-            )
-            ticket_embed.add_field(
-                name="📋 Estado Actual",
-                value="🔍 Esperando revisión del owner",
-                inline=False
-            )
-            ticket_embed.set_footer(text=f"Ticket ID: {ticket_id} • Creado")
-            # Crear y enviar la vista de gestión del ticket
-            from views.ticket_management_view import TicketManagementView
-            management_view = TicketManagementView(ticket_id)
-            await channel.send(f"<@&{OWNER_ROLE_ID}>", embed=ticket_embed, view=management_view)
-            
-            logger.info(f'Ticket {ticket_id} creado para usuario {interaction.user.id}')
-            
-        except Exception as e:
-            logger.error(f'Error al crear ticket: {str(e)}')
-            await interaction.response.send_message(
-                "❌ Hubo un error al crear el ticket. Por favor, contacta a un owner.",
-                ephemeral=True
-            )
+        # Comprobación barata por si ya abrió otro ticket desde que se mostró esta vista
+        if ticket_index.has_open_ticket(self.user_id) or ticket_queue.is_queued(self.user_id):
+            await handle_interaction_response(interaction, "Ya tienes un ticket abierto. Por favor, espera a que se resuelva.")
             return
-        
+
+        # Responder ya: el canal se crea en segundo plano y luego se edita este mensaje
+        self.confirmed = True
+        for child in self.children:
+            child.disabled = True
+        embed = discord.Embed(
+            title="⏳ Creando tu Ticket",
+            description=f"Tu ticket está en cola (posición {len(ticket_queue) + 1}). "
+                        "En cuanto el canal esté listo actualizaremos este mensaje con el enlace.",
+            color=0xA100F2
+        )
+        await interaction.response.edit_message(embed=embed, view=self)
+
+        ticket_id = f"ticket-{uuid.uuid4().hex[:8]}"
+        ticket_queue.enqueue(TicketRequest(
+            self.user_id,
+            create_channel=lambda: self._create_channel(interaction, ticket_id),
+            on_created=lambda channel: self._on_channel_created(interaction, ticket_id, channel),
+            on_failed=lambda: self._on_channel_failed(interaction)
+        ))
         self.stop()
 
+    async def _create_channel(self, interaction: discord.Interaction, ticket_id: str) -> discord.TextChannel:
+        guild = interaction.guild
+        # La cola reintenta tras un 5xx, que puede llegar cuando Discord ya creó
+        # el canal: si existe se reutiliza en lugar de crear un duplicado
+        existing = discord.utils.get(guild.text_channels, name=ticket_id)
+        if existing is not None:
+            return existing
+
+        overwrites = {
+            guild.default_role: discord.PermissionOverwrite(view_channel=False),
+            interaction.user: discord.PermissionOverwrite(view_channel=True, send_messages=True),
+            guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True, manage_channels=True)
+        }
+
+        owner_role = guild.get_role(OWNER_ROLE_ID)
+        if owner_role:
+            overwrites[owner_role] = discord.PermissionOverwrite(view_channel=True, send_messages=True, manage_channels=True)
+
+        # Categoría donde se crean los tickets
+        category = None
+        ticket_channel = guild.get_channel(TICKET_CHANNEL_ID)
+        if isinstance(ticket_channel, discord.CategoryChannel):
+            category = ticket_channel
+        elif ticket_channel:
+            category = ticket_channel.category
+
+        return await guild.create_text_channel(
+            name=ticket_id,
+            category=category,
+            overwrites=overwrites,
+            topic=f"Ticket de {interaction.user.name} (ID: {ticket_id})"
+        )
+
+    async def _on_channel_created(self, interaction: discord.Interaction, ticket_id: str, channel: discord.TextChannel):
+        # Guardar la información del ticket
+        data = load_data()
+        data["tickets"][ticket_id] = {
+            "user_id": str(interaction.user.id),
+            "channel_id": str(channel.id),
+            "product_id": self.product_id,
+            "product_name": self.product_name,
+            "payment_method": self.payment_method,
+            "status": "abierto",
+            "estado_detallado": "esperando_revision",
+            "timestamp": datetime.utcnow().isoformat(),
+            "historial": [{
+                "estado": "creado",
+                "timestamp": datetime.utcnow().isoformat(),
+                "detalles": "Ticket creado por el usuario"
+            }]
+        }
+        store.commit(("tickets", ticket_id))
+        ticket_index.update(ticket_id)
+
+        # Enviar mensaje inicial en el canal del ticket
+        ticket_embed = discord.Embed(
+            title=f"🌟 Nuevo Ticket | {ticket_id}",
+            description=f"¡Hola <@&{OWNER_ROLE_ID}>! Un nuevo ticket requiere tu atención.",
+            color=0xA100F2,
+            timestamp=datetime.utcnow()
+        )
+        ticket_embed.add_field(
+            name="👤 Cliente",
+            value=f"{interaction.user.mention}\nID: `{interaction.user.id}`",
+            inline=True
+        )
+        ticket_embed.add_field(
+            name="📦 Producto",
+            value=f"**{self.product_name}**\nID: `{self.product_id}`",
+            inline=True
+        )
+        ticket_embed.add_field(
+            name="💳 Método de Pago",
+            value=f"{self.payment_emojis.get(self.payment_method, '💰')} **{self.payment_method}**",
+            inline=True
+        )
+        ticket_embed.add_field(
+            name="📋 Estado Actual",
+            value="🔍 Esperando revisión del owner",
+            inline=False
+        )
+        ticket_embed.set_footer(text=f"Ticket ID: {ticket_id} • Creado")
+        # Crear y enviar la vista de gestión del ticket
+        from views.ticket_management_view import TicketManagementView
+        management_view = TicketManagementView(ticket_id)
+        await channel.send(f"<@&{OWNER_ROLE_ID}> {interaction.user.mention}", embed=ticket_embed, view=management_view)
+
+        embed = discord.Embed(
+            title="✅ Ticket Creado",
+            description=f"Tu ticket ha sido creado exitosamente en {channel.mention}.",
+            color=0x00FF00
+        )
+        await self._notify(interaction, embed)
+        logger.info(f'Ticket {ticket_id} creado para usuario {interaction.user.id}')
+
+    async def _on_channel_failed(self, interaction: discord.Interaction):
+        embed = discord.Embed(
+            title="❌ Error al Crear el Ticket",
+            description="No se pudo crear el canal del ticket. Por favor, inténtalo de nuevo o contacta a un owner.",
+            color=0xFF0000
+        )
+        await self._notify(interaction, embed)
+
+    async def _notify(self, interaction: discord.Interaction, embed: discord.Embed):
+        """Edita la respuesta original; si el token de la interacción ya caducó, avisa por MD."""
+        try:
+            await interaction.edit_original_response(embed=embed, view=self)
+            return
+        except discord.HTTPException as e:
+            logger.warning(f'No se pudo editar la respuesta del ticket de {interaction.user.id}: {e}')
+        try:
+            await interaction.user.send(embed=embed)
+        except discord.HTTPException:
+            pass
+
     @discord.ui.button(label="❌ Cancelar", style=discord.ButtonStyle.danger, row=1)
     async def cancel_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not check_user_permissions(interaction.user.id, self.user_id):
@@ -1,5 +1,8 @@
 import discord
 
+from data_manager import store
+from embed_cache import embed_cache
+
 class ShopView(discord.ui.View):
     def __init__(self, gifts, last_updated, sync_success, pages, current_page=0):
         super().__init__(timeout=60)
@@ -8,9 +11,14 @@ class ShopView(discord.ui.View):
         self.sync_success = sync_success
         self.pages = pages
         self.current_page = current_page
+        self.data_version = store.version("gifts")
         self.update_buttons()
 
     def create_embed(self):
+        key = ("gifts", self.current_page, len(self.pages), self.last_updated, self.sync_success, self.data_version)
+        return embed_cache.get(key, self._build_embed)
+
+    def _build_embed(self):
         embed = discord.Embed(
             title="🛒 Tienda de Regalos (Fortnite)",
             description=f"Mostrando {len(self.pages[self.current_page])} de {len(self.gifts)} ítems",
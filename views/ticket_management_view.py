@@ -2,16 +2,35 @@ import discord
 import asyncio
 from datetime import datetime
 from utils import check_user_permissions, handle_interaction_response, logger
-from data_manager import load_data, save_data
+from data_manager import load_data, store
 from config import OWNER_ROLE_ID
+from ticket_system import ticket_index
+from archive import export_transcript
+
+class CloseTicketButton(discord.ui.DynamicItem[discord.ui.Button], template=r"ticket:close:(?P<ticket_id>[\w-]+)"):
+    """Botón de cerrar ticket que sigue funcionando tras reiniciar el bot.
+
+    El ID del ticket va en el ``custom_id`` (``ticket:close:<id>``), así que
+    basta con registrar la clase una vez al arrancar
+    (``client.add_dynamic_items``) y no hace falta una vista en memoria por
+    cada ticket abierto.
+    """
 
-class TicketManagementView(discord.ui.View):
     def __init__(self, ticket_id: str):
-        super().__init__(timeout=None)  # Sin timeout para botones persistentes
+        super().__init__(
+            discord.ui.Button(
+                label="🔒 Cerrar Ticket",
+                style=discord.ButtonStyle.danger,
+                custom_id=f"ticket:close:{ticket_id}"
+            )
+        )
         self.ticket_id = ticket_id
 
-    @discord.ui.button(label="🔒 Cerrar Ticket", style=discord.ButtonStyle.danger)
-    async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["ticket_id"])
+
+    async def callback(self, interaction: discord.Interaction):
         # Verificar si el usuario tiene el rol de owner
         if not interaction.user.get_role(OWNER_ROLE_ID):
             await handle_interaction_response(interaction, "❌ Solo los owners pueden cerrar tickets.")
@@ -39,12 +58,13 @@ class TicketManagementView(discord.ui.View):
                 "detalles": f"Ticket cerrado por {interaction.user.name}"
             })
             
-            save_data(data)
+            store.commit(("tickets", self.ticket_id))
+            ticket_index.update(self.ticket_id)
 
             # Crear embed de cierre
             embed = discord.Embed(
                 title="🔒 Ticket Cerrado",
-                description=f"Este ticket ha sido cerrado por {interaction.user.mention}. El canal será eliminado en 5 segundos.",
+                description=f"Este ticket ha sido cerrado por {interaction.user.mention}. El canal se eliminará en cuanto se guarde la transcripción.",
                 color=0xFF0000,
                 timestamp=datetime.utcnow()
             )
@@ -56,10 +76,20 @@ class TicketManagementView(discord.ui.View):
             embed.set_footer(text="El ticket será archivado próximamente")
 
             # Deshabilitar el botón
-            button.disabled = True
-            button.label = "Ticket Cerrado"
+            self.item.disabled = True
+            self.item.label = "Ticket Cerrado"
             
-            await interaction.response.edit_message(embed=embed, view=self)
+            await interaction.response.edit_message(embed=embed, view=self.view)
+            
+            # Guardar la conversación antes de eliminar el canal
+            try:
+                ticket_data["transcript"] = await export_transcript(interaction.channel, self.ticket_id)
+                store.commit(("tickets", self.ticket_id))
+                logger.info(f"Transcripción del ticket {self.ticket_id} guardada ({ticket_data['transcript']['messages']} mensajes)")
+            except Exception as e:
+                logger.error(f"Error al exportar la transcripción del ticket {self.ticket_id}: {e}")
+                await interaction.channel.send("⚠️ No se pudo guardar la transcripción; el canal no se eliminará.")
+                return
             
             # Esperar 5 segundos y eliminar el canal
             await asyncio.sleep(5)
@@ -86,4 +116,13 @@ class TicketManagementView(discord.ui.View):
             await handle_interaction_response(
                 interaction,
                 "❌ Hubo un error al cerrar el ticket. Por favor, inténtalo de nuevo."
-            )
\ No newline at end of file
+            )
+
+
+class TicketManagementView(discord.ui.View):
+    """Botones de gestión que se envían al crear el canal del ticket."""
+
+    def __init__(self, ticket_id: str):
+        super().__init__(timeout=None)  # Sin timeout para botones persistentes
+        self.ticket_id = ticket_id
+        self.add_item(CloseTicketButton(ticket_id))
@@ -3,13 +3,18 @@ from discord.ext import commands
 from discord import ui
 from typing import List, Dict, Optional
 import logging
+import uuid
 from virtual_shop import virtual_shop
-from data_manager import load_data, save_data
-from economy_system import EconomySystem
-from datetime import datetime, timedelta
+from economy_system import economy
+from role_queue import RoleChange, role_queue
+from embed_cache import embed_cache
+from datetime import datetime, timedelta, timezone
 
 logger = logging.getLogger(__name__)
 
+# Campos fijos (categoría, página y total) antes de los productos en el embed de la tienda
+SHOP_HEADER_FIELDS = 3
+
 class VirtualShopView(discord.ui.View):
     """Vista principal de la tienda virtual"""
     
@@ -19,6 +24,8 @@ class VirtualShopView(discord.ui.View):
         self.current_category = "all"
         self.current_page = 0
         self.products_per_page = 5
+        # Base de la clave de idempotencia: cambia tras cada compra completada
+        self.purchase_nonce = uuid.uuid4().hex
     
     async def on_timeout(self):
         """Deshabilita los botones cuando expira el tiempo"""
@@ -30,35 +37,46 @@ class VirtualShopView(discord.ui.View):
         except:
             pass
     
+    def get_catalog(self):
+        """Instantánea del catálogo (se reutiliza mientras no cambie ningún producto)"""
+        catalog = virtual_shop.catalog_snapshot()
+        # Si el catálogo se redujo, no quedarse en una página que ya no existe
+        self.current_page = min(self.current_page, catalog.total_pages(self.current_category, self.products_per_page) - 1)
+        return catalog
+    
     def get_filtered_products(self):
         """Obtiene productos filtrados por categoría"""
-        all_products = virtual_shop.get_virtual_products()
-        
-        # Filtrar solo productos habilitados
-        enabled_products = {k: v for k, v in all_products.items() if v.get('enabled', True)}
-        
-        if self.current_category == "all":
-            return enabled_products
-        
-        return {k: v for k, v in enabled_products.items() if v.get('category') == self.current_category}
+        return self.get_catalog().available(self.current_category)
     
     def create_shop_embed(self):
         """Crea el embed principal de la tienda"""
-        economy = EconomySystem()
         user_coins = economy.get_balance(str(self.user_id))
         
-        filtered_products = self.get_filtered_products()
-        total_products = len(filtered_products)
+        catalog = self.get_catalog()
+        products_list = catalog.page(self.current_category, self.current_page, self.products_per_page)
         
-        # Calcular paginación
+        # La página se cachea sin datos del usuario; el stock forma parte de la clave
+        key = ("virtual_shop", self.current_category, self.current_page, self.products_per_page,
+               catalog.version, tuple(product.get('stock') for _, product in products_list))
+        embed = embed_cache.get(key, lambda: self._build_shop_page(catalog, products_list))
+        
+        embed.description = f"💰 Tus GameCoins: **{user_coins:,}**"
+        # Marcar los productos que el usuario no puede pagar
+        for i, (_, product) in enumerate(products_list, SHOP_HEADER_FIELDS):
+            if user_coins < product['price']:
+                field = embed.fields[i]
+                price_display, rest = field.value.split("\n", 1)
+                embed.set_field_at(i, name=field.name, value=f"{price_display} ❌\n{rest}", inline=field.inline)
+        return embed
+    
+    def _build_shop_page(self, catalog, products_list):
+        """Embed de una página de la tienda, común a todos los usuarios"""
+        total_products = catalog.count(self.current_category)
         start_idx = self.current_page * self.products_per_page
-        end_idx = start_idx + self.products_per_page
-        products_list = list(filtered_products.items())[start_idx:end_idx]
         
         # Crear embed
         embed = discord.Embed(
             title="🛒 Tienda Virtual de GameCoins",
-            description=f"💰 Tus GameCoins: **{user_coins:,}**",
             color=0x3498db
         )
         
@@ -76,9 +94,7 @@ class VirtualShopView(discord.ui.View):
         )
         
         # Información de paginación
-        total_pages = (total_products + self.products_per_page - 1) // self.products_per_page
-        if total_pages == 0:
-            total_pages = 1
+        total_pages = catalog.total_pages(self.current_category, self.products_per_page)
         
         embed.add_field(
             name="📄 Página",
@@ -101,11 +117,7 @@ class VirtualShopView(discord.ui.View):
             )
         else:
             for i, (product_id, product) in enumerate(products_list, 1):
-                # Determinar si el usuario puede comprar
-                can_afford = user_coins >= product['price']
                 price_display = f"💰 **{product['price']:,}** GameCoins"
-                if not can_afford:
-                    price_display += " ❌"
                 
                 # Información adicional
                 extra_info = []
@@ -113,6 +125,10 @@ class VirtualShopView(discord.ui.View):
                     extra_info.append("🎭 Incluye rol")
                 if product.get('duration_days'):
                     extra_info.append(f"⏰ {product['duration_days']} días")
+                if product.get('stock') is not None:
+                    extra_info.append(f"📦 Quedan {product['stock']:,}" if product['stock'] > 0 else "🚫 Agotado")
+                if product.get('per_user_limit') is not None:
+                    extra_info.append(f"👤 Máx. {product['per_user_limit']} por usuario")
                 
                 value = f"{price_display}\n📝 {product['description']}"
                 if extra_info:
@@ -130,9 +146,9 @@ class VirtualShopView(discord.ui.View):
     
     def update_buttons(self):
         """Actualiza el estado de los botones"""
-        filtered_products = self.get_filtered_products()
-        total_products = len(filtered_products)
-        total_pages = max(1, (total_products + self.products_per_page - 1) // self.products_per_page)
+        catalog = self.get_catalog()
+        total_products = catalog.count(self.current_category)
+        total_pages = catalog.total_pages(self.current_category, self.products_per_page)
         
         # Botones de navegación
         self.previous_page.disabled = self.current_page == 0
@@ -188,8 +204,7 @@ class VirtualShopView(discord.ui.View):
             await interaction.response.send_message("❌ Solo quien abrió la tienda puede usarla.", ephemeral=True)
             return
         
-        filtered_products = self.get_filtered_products()
-        total_pages = max(1, (len(filtered_products) + self.products_per_page - 1) // self.products_per_page)
+        total_pages = self.get_catalog().total_pages(self.current_category, self.products_per_page)
         
         if self.current_page < total_pages - 1:
             self.current_page += 1
@@ -211,7 +226,7 @@ class VirtualShopView(discord.ui.View):
             await interaction.response.send_message("❌ No hay productos disponibles para comprar.", ephemeral=True)
             return
         
-        modal = PurchaseModal(self.user_id, filtered_products)
+        modal = PurchaseModal(self.user_id, filtered_products, shop_view=self)
         await interaction.response.send_modal(modal)
     
     @discord.ui.button(label="🔄 Actualizar", style=discord.ButtonStyle.primary)
@@ -246,10 +261,14 @@ class VirtualShopView(discord.ui.View):
 class PurchaseModal(discord.ui.Modal):
     """Modal para realizar compras"""
     
-    def __init__(self, user_id: int, available_products: dict):
+    def __init__(self, user_id: int, available_products: dict, shop_view: Optional[VirtualShopView] = None):
         super().__init__(title="🛍️ Comprar Producto")
         self.user_id = user_id
         self.available_products = available_products
+        self.shop_view = shop_view
+        # Dos modales abiertos desde la misma tienda antes de comprar comparten
+        # la clave, así que un doble clic no cobra dos veces el mismo producto
+        self.purchase_nonce = shop_view.purchase_nonce if shop_view else uuid.uuid4().hex
         
         self.product_id = discord.ui.TextInput(
             label="ID del Producto",
@@ -271,78 +290,66 @@ class PurchaseModal(discord.ui.Modal):
                 await interaction.followup.send("❌ Producto no encontrado o no disponible.", ephemeral=True)
                 return
             
-            product = self.available_products[product_id]
-            
-            # Verificar GameCoins del usuario
-            economy = EconomySystem()
-            user_coins = economy.get_balance(str(self.user_id))
-            
-            if user_coins < product['price']:
-                needed = product['price'] - user_coins
-                await interaction.followup.send(
-                    f"❌ No tienes suficientes GameCoins.\n"
-                    f"💰 Tienes: {user_coins:,}\n"
-                    f"💰 Necesitas: {product['price']:,}\n"
-                    f"💰 Te faltan: {needed:,}",
-                    ephemeral=True
-                )
-                return
-            
-            # Procesar compra
+            # Procesar compra: validación del saldo, cobro y registro en un único commit.
+            # No se comprueba el saldo antes: un reintento ya cobrado debe devolver
+            # la compra original aunque ahora no alcance
             purchase_result = virtual_shop.purchase_virtual_product(
                 user_id=str(self.user_id),
                 product_id=product_id,
-                guild_id=str(interaction.guild.id) if interaction.guild else None
+                guild_id=str(interaction.guild.id) if interaction.guild else None,
+                idempotency_key=f"{self.purchase_nonce}:{product_id}"
             )
             
             if purchase_result['success']:
-                # Deducir coins usando el sistema de economía
-                economy.remove_coins(str(self.user_id), product['price'], f"Compra: {product['name']}")
-                new_balance = economy.get_balance(str(self.user_id))
+                product = purchase_result['product']
+                new_balance = purchase_result['new_balance']
+                if self.shop_view is not None and self.shop_view.purchase_nonce == self.purchase_nonce:
+                    # La siguiente compra desde esta tienda es una compra nueva
+                    self.shop_view.purchase_nonce = uuid.uuid4().hex
                 
-                # Otorgar rol si es necesario
-                role_granted = False
-                if product.get('role_id') and interaction.guild:
-                    try:
-                        role = interaction.guild.get_role(int(product['role_id']))
-                        if role and role not in interaction.user.roles:
-                            await interaction.user.add_roles(role)
-                            role_granted = True
-                    except Exception as e:
-                        logger.error(f"Error al otorgar rol: {e}")
+                # El rol se entrega en segundo plano: la compra no espera a Discord
+                purchase = purchase_result['purchase']
+                role_queued = purchase.get('role_status') == "pending" and interaction.guild is not None
+                if role_queued:
+                    role_queue.enqueue(RoleChange(
+                        interaction.guild.id, self.user_id, purchase['role_id'], "add",
+                        reason=f"Compra de {product['name']} en la tienda virtual",
+                        on_done=virtual_shop.role_status_callback(purchase_result['purchase_id'], "granted", "failed")
+                    ))
                 
                 # Crear embed de confirmación
                 embed = discord.Embed(
                     title="✅ Compra Exitosa",
-                    description=f"¡Has comprado **{product['name']}** exitosamente!",
+                    description=purchase_result['message'] if purchase_result['duplicate'] else f"¡Has comprado **{product['name']}** exitosamente!",
                     color=0x00ff00
                 )
                 
                 embed.add_field(name="💰 Precio", value=f"{product['price']:,} GameCoins", inline=True)
                 embed.add_field(name="💰 Saldo Restante", value=f"{new_balance:,} GameCoins", inline=True)
                 
-                if role_granted:
-                    embed.add_field(name="🎭 Rol Otorgado", value=f"<@&{product['role_id']}>", inline=False)
+                if role_queued:
+                    embed.add_field(name="🎭 Rol", value=f"<@&{purchase['role_id']}> se asignará en unos segundos", inline=False)
                 
-                if product.get('duration_days'):
-                    expiry_date = datetime.now() + timedelta(days=product['duration_days'])
+                if purchase.get('expires_at'):
+                    expiry_date = datetime.fromisoformat(purchase['expires_at']).replace(tzinfo=timezone.utc)
                     embed.add_field(
                         name="⏰ Válido hasta",
                         value=f"<t:{int(expiry_date.timestamp())}:F>",
                         inline=False
                     )
                 
-                embed.add_field(name="📝 Descripción", value=product['description'], inline=False)
+                embed.add_field(name="📝 Descripción", value=product.get('description', ''), inline=False)
                 embed.set_footer(text=f"Compra ID: {purchase_result['purchase_id']}")
                 
                 await interaction.followup.send(embed=embed, ephemeral=True)
                 
                 # Log de la compra
-                logger.info(f"Usuario {self.user_id} compró {product['name']} por {product['price']} GameCoins")
+                if not purchase_result['duplicate']:
+                    logger.info(f"Usuario {self.user_id} compró {product['name']} por {product['price']} GameCoins")
                 
             else:
                 await interaction.followup.send(
-                    f"❌ Error al procesar la compra: {purchase_result.get('error', 'Error desconocido')}",
+                    f"❌ Error al procesar la compra: {purchase_result.get('message', 'Error desconocido')}",
                     ephemeral=True
                 )
         
@@ -358,6 +365,9 @@ class MyPurchasesView(discord.ui.View):
         self.user_id = user_id
         self.current_page = 0
         self.purchases_per_page = 5
+        # Cursor de inicio de cada página visitada; la primera empieza por la más reciente
+        self.page_cursors = [None]
+        self.page_data = None
     
     async def on_timeout(self):
         """Deshabilita los botones cuando expira el tiempo"""
@@ -369,19 +379,21 @@ class MyPurchasesView(discord.ui.View):
         except:
             pass
     
-    def get_user_purchases(self):
-        """Obtiene las compras del usuario"""
-        return virtual_shop.get_user_purchases(str(self.user_id))
+    def load_page(self):
+        """Carga solo la página actual de compras desde el índice por usuario"""
+        self.page_data = virtual_shop.get_user_purchases_page(
+            str(self.user_id), self.purchases_per_page, self.page_cursors[self.current_page]
+        )
+        return self.page_data
     
     def create_purchases_embed(self):
         """Crea el embed de compras del usuario"""
-        purchases = self.get_user_purchases()
-        total_purchases = len(purchases)
+        page = self.page_data or self.load_page()
+        total_purchases = page["total"]
         
         # Calcular paginación
         start_idx = self.current_page * self.purchases_per_page
-        end_idx = start_idx + self.purchases_per_page
-        purchases_list = purchases[start_idx:end_idx]
+        purchases_list = page["purchases"]
         
         embed = discord.Embed(
             title="🛍️ Mis Compras",
@@ -398,7 +410,7 @@ class MyPurchasesView(discord.ui.View):
         )
         
         # Calcular total gastado
-        total_spent = sum(purchase.get('price_paid', 0) for purchase in purchases)
+        total_spent = page["total_spent"]
         embed.add_field(
             name="💰 Total Gastado",
             value=f"{total_spent:,} GameCoins",
@@ -417,7 +429,7 @@ class MyPurchasesView(discord.ui.View):
                 status = "✅ Activo" if purchase.get('active', True) else "❌ Inactivo"
                 
                 # Formatear fecha
-                purchase_date = datetime.fromisoformat(purchase['purchase_date'])
+                purchase_date = datetime.fromisoformat(purchase.get('purchased_at') or purchase['purchase_date'])
                 date_str = f"<t:{int(purchase_date.timestamp())}:d>"
                 
                 value = f"💰 {purchase.get('price_paid', 0):,} GameCoins\n"
@@ -435,12 +447,10 @@ class MyPurchasesView(discord.ui.View):
     
     def update_buttons(self):
         """Actualiza el estado de los botones"""
-        purchases = self.get_user_purchases()
-        total_purchases = len(purchases)
-        total_pages = max(1, (total_purchases + self.purchases_per_page - 1) // self.purchases_per_page)
+        page = self.load_page()
         
         self.previous_page.disabled = self.current_page == 0
-        self.next_page.disabled = self.current_page >= total_pages - 1
+        self.next_page.disabled = page["next_cursor"] is None
     
     @discord.ui.button(label="⬅️ Anterior", style=discord.ButtonStyle.secondary)
     async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -451,6 +461,7 @@ class MyPurchasesView(discord.ui.View):
         
         if self.current_page > 0:
             self.current_page -= 1
+            del self.page_cursors[self.current_page + 1:]
             self.update_buttons()
             embed = self.create_purchases_embed()
             await interaction.response.edit_message(embed=embed, view=self)
@@ -464,10 +475,10 @@ class MyPurchasesView(discord.ui.View):
             await interaction.response.send_message("❌ Solo quien solicitó la información puede usarla.", ephemeral=True)
             return
         
-        purchases = self.get_user_purchases()
-        total_pages = max(1, (len(purchases) + self.purchases_per_page - 1) // self.purchases_per_page)
+        next_cursor = self.page_data["next_cursor"] if self.page_data else None
         
-        if self.current_page < total_pages - 1:
+        if next_cursor is not None:
+            self.page_cursors.append(next_cursor)
             self.current_page += 1
             self.update_buttons()
             embed = self.create_purchases_embed()
@@ -1,12 +1,209 @@
+import bisect
+import copy
 import json
 import uuid
-from datetime import datetime
-from typing import Dict, List, Optional, Any
-from data_manager import load_data, save_data
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from data_manager import load_data, store
 from economy_system import economy
+from search_index import catalog_index
+
+# Cursor de paginación: clave (fecha de compra, id) de la última compra mostrada
+PurchaseCursor = Tuple[str, str]
+
+# Versión del formato de ``virtual_shop["stats"]``; si cambia se recalcula
+STATS_VERSION = 1
+
+
+class PurchaseIndex:
+    """Compras activas de cada usuario ordenadas por fecha.
+
+    Cada usuario tiene una lista ordenada de claves ``(purchased_at, id)``
+    y los totales de compras y GameCoins gastados, de modo que una página
+    de ``/mis_compras`` cuesta O(log n + tamaño de página) sin recorrer
+    todas las compras del servidor. Se construye en la primera consulta y
+    se mantiene con ``update`` en cada compra y desactivación.
+
+    También resuelve las claves de idempotencia ``(usuario, clave)`` de
+    todas las compras, activas o no, para no cobrar dos veces un reintento,
+    y cuenta las compras de cada usuario por producto (para
+    ``per_user_limit``).
+    """
+
+    def __init__(self):
+        self._purchases = None
+        self._keys: Dict[str, Tuple[str, PurchaseCursor, int]] = {}
+        self._by_user: Dict[str, List[PurchaseCursor]] = {}
+        self._spent: Dict[str, int] = {}
+        self._by_idempotency_key: Dict[Tuple[str, str], str] = {}
+        self._by_product: Dict[Tuple[str, str], set] = {}
+
+    def _ensure_built(self, purchases: Dict):
+        # Reconstruir si el estado se volvió a cargar desde disco
+        if self._purchases is purchases:
+            return
+        self._purchases = purchases
+        self._keys = {}
+        self._by_user = {}
+        self._spent = {}
+        self._by_idempotency_key = {}
+        self._by_product = {}
+        for purchase_id, purchase in purchases.items():
+            self._add(purchase_id, purchase)
+        for keys in self._by_user.values():
+            keys.sort()
+
+    def _add(self, purchase_id: str, purchase: Dict, insort: bool = False):
+        if not isinstance(purchase, dict):
+            return
+        user_id = purchase.get("user_id")
+        if purchase.get("idempotency_key"):
+            self._by_idempotency_key[(user_id, purchase["idempotency_key"])] = purchase_id
+        self._by_product.setdefault((user_id, purchase.get("product_id")), set()).add(purchase_id)
+        if not purchase.get("active", True):
+            return
+        key = (purchase.get("purchased_at", ""), purchase_id)
+        price = purchase.get("price_paid", 0)
+        self._keys[purchase_id] = (user_id, key, price)
+        keys = self._by_user.setdefault(user_id, [])
+        if insort:
+            bisect.insort(keys, key)
+        else:
+            keys.append(key)
+        self._spent[user_id] = self._spent.get(user_id, 0) + price
+
+    def update(self, purchases: Dict, purchase_id: str):
+        """Reindexa una compra tras crearla o desactivarla"""
+        if self._purchases is not purchases:
+            # Aún no construido o estado recargado: se hará completo en la próxima consulta
+            return
+        old = self._keys.pop(purchase_id, None)
+        if old is not None:
+            user_id, key, price = old
+            keys = self._by_user[user_id]
+            del keys[bisect.bisect_left(keys, key)]
+            self._spent[user_id] -= price
+            if not keys:
+                del self._by_user[user_id]
+                del self._spent[user_id]
+        purchase = purchases.get(purchase_id)
+        if purchase is not None:
+            self._add(purchase_id, purchase, insort=True)
+
+    def forget(self, purchases: Dict, purchase_id: str, purchase: Dict):
+        """Quita del índice una compra que ya no está en el estado (p. ej. archivada)"""
+        if self._purchases is not purchases:
+            return
+        self.update(purchases, purchase_id)
+        user_id = purchase.get("user_id")
+        key = (user_id, purchase.get("idempotency_key"))
+        if self._by_idempotency_key.get(key) == purchase_id:
+            del self._by_idempotency_key[key]
+        product_key = (user_id, purchase.get("product_id"))
+        purchase_ids = self._by_product.get(product_key)
+        if purchase_ids is not None:
+            purchase_ids.discard(purchase_id)
+            if not purchase_ids:
+                del self._by_product[product_key]
+
+    def find_by_key(self, purchases: Dict, user_id: str, idempotency_key: str) -> Optional[str]:
+        """ID de la compra que el usuario ya hizo con esa clave de idempotencia"""
+        self._ensure_built(purchases)
+        return self._by_idempotency_key.get((user_id, idempotency_key))
+
+    def count_product(self, purchases: Dict, user_id: str, product_id: str) -> int:
+        """Veces que el usuario ha comprado el producto (activas o no)"""
+        self._ensure_built(purchases)
+        return len(self._by_product.get((user_id, product_id), ()))
+
+    def totals(self, purchases: Dict, user_id: str) -> Tuple[int, int]:
+        """Número de compras activas y GameCoins gastados en ellas"""
+        self._ensure_built(purchases)
+        return len(self._by_user.get(user_id, ())), self._spent.get(user_id, 0)
+
+    def page(self, purchases: Dict, user_id: str, limit: int,
+             before: Optional[PurchaseCursor] = None) -> Tuple[List[str], Optional[PurchaseCursor]]:
+        """IDs de hasta ``limit`` compras anteriores a ``before``, de la más reciente a la más antigua.
+
+        Devuelve también el cursor para pedir la página siguiente (None si no hay más).
+        """
+        self._ensure_built(purchases)
+        keys = self._by_user.get(user_id, [])
+        end = bisect.bisect_left(keys, before) if before is not None else len(keys)
+        start = max(0, end - limit)
+        purchase_ids = [purchase_id for _, purchase_id in reversed(keys[start:end])]
+        return purchase_ids, (keys[start] if start > 0 else None)
+
+
+class CatalogSnapshot:
+    """Vista de solo lectura del catálogo para una versión concreta.
+
+    Guarda los productos habilitados de cada categoría ya ordenados (más
+    antiguos primero) y las páginas que se van pidiendo, de modo que
+    cambiar de página o de categoría en la tienda no recorre el catálogo.
+    Los productos son los mismos diccionarios del estado, así que el stock
+    y los contadores que se muestran están siempre al día.
+    """
+
+    def __init__(self, version: int, products: Dict):
+        self.version = version
+        self.products = products
+        enabled = sorted(
+            ((product_id, product) for product_id, product in products.items()
+             if isinstance(product, dict) and product.get("enabled", True)),
+            key=lambda item: (item[1].get("created_at", ""), item[1].get("name", ""))
+        )
+        self._by_category: Dict[str, List[Tuple[str, Dict]]] = {"all": enabled}
+        for item in enabled:
+            self._by_category.setdefault(item[1].get("category", "other"), []).append(item)
+        self._dicts: Dict[str, Dict] = {}
+        self._pages: Dict[Tuple[str, int, int], List[Tuple[str, Dict]]] = {}
+
+    def count(self, category: str = "all") -> int:
+        return len(self._by_category.get(category, ()))
+
+    def total_pages(self, category: str, per_page: int) -> int:
+        return max(1, (self.count(category) + per_page - 1) // per_page)
+
+    def page(self, category: str, page: int, per_page: int) -> List[Tuple[str, Dict]]:
+        """Productos ``(id, producto)`` de una página de la categoría"""
+        key = (category, page, per_page)
+        items = self._pages.get(key)
+        if items is None:
+            start = page * per_page
+            items = self._pages[key] = self._by_category.get(category, [])[start:start + per_page]
+        return items
+
+    def available(self, category: str = "all") -> Dict[str, Dict]:
+        """Productos habilitados de la categoría como diccionario ``id -> producto``"""
+        products = self._dicts.get(category)
+        if products is None:
+            products = self._dicts[category] = dict(self._by_category.get(category, []))
+        return products
+
+
+def purchase_expiry(purchase: Dict, products: Optional[Dict] = None) -> Optional[datetime]:
+    """Fecha (UTC) en que caduca una compra temporal, o None si es permanente.
+
+    Las compras anteriores a ``expires_at`` se calculan con la duración
+    actual del producto.
+    """
+    if purchase.get("expires_at"):
+        return datetime.fromisoformat(purchase["expires_at"])
+    duration_days = (products or {}).get(purchase.get("product_id"), {}).get("duration_days")
+    if not duration_days or not purchase.get("purchased_at"):
+        return None
+    return datetime.fromisoformat(purchase["purchased_at"]) + timedelta(days=duration_days)
+
 
 class VirtualShop:
     def __init__(self):
+        self.purchase_index = PurchaseIndex()
+        # Sube con cada alta, edición o baja de producto (invalida la instantánea del catálogo)
+        self.catalog_version = 0
+        self._catalog_snapshot: Optional[CatalogSnapshot] = None
+        # Se llama con cada compra temporal nueva (lo usa el programador de caducidad)
+        self.expiry_listener = None
         self.categories = {
             "roles": {"name": "Roles", "emoji": "🎭"},
             "perks": {"name": "Beneficios", "emoji": "⭐"},
@@ -18,13 +215,13 @@ class VirtualShop:
     def get_virtual_products(self) -> Dict:
         """Obtiene todos los productos virtuales"""
         data = load_data()
-        if "virtual_shop" not in data:
-            data["virtual_shop"] = {
-                "products": {},
-                "purchases": {},
-                "settings": {"enabled": True, "tax_rate": 0.0}
-            }
-            save_data(data)
+        if "virtual_shop" not in data or "products" not in data["virtual_shop"]:
+            # Con SQLite puede existir "virtual_shop" solo con la tabla de compras
+            shop = data.setdefault("virtual_shop", {})
+            shop.setdefault("products", {})
+            shop.setdefault("purchases", {})
+            shop.setdefault("settings", {"enabled": True, "tax_rate": 0.0})
+            store.commit(("virtual_shop",))
         
         products = data["virtual_shop"]["products"]
         
@@ -32,24 +229,33 @@ class VirtualShop:
         if isinstance(products, list):
             products_dict = {str(i): product for i, product in enumerate(products)}
             data["virtual_shop"]["products"] = products_dict
-            save_data(data)
+            store.commit(("virtual_shop", "products"))
             return products_dict
         elif not isinstance(products, dict):
             # Si no es ni lista ni diccionario, inicializar como diccionario vacío
             data["virtual_shop"]["products"] = {}
-            save_data(data)
+            store.commit(("virtual_shop", "products"))
             return {}
         
         return products
     
+    def catalog_snapshot(self) -> CatalogSnapshot:
+        """Instantánea del catálogo actual; solo se reconstruye si el catálogo cambió"""
+        snapshot = self._catalog_snapshot
+        products = load_data().get("virtual_shop", {}).get("products")
+        if snapshot is None or snapshot.version != self.catalog_version or snapshot.products is not products:
+            # También si el estado se volvió a cargar desde disco
+            products = self.get_virtual_products()
+            snapshot = self._catalog_snapshot = CatalogSnapshot(self.catalog_version, products)
+        return snapshot
+    
     def add_virtual_product(self, name: str, price: int, description: str, 
                            category: str = "other", image_url: str = None,
-                           role_id: str = None, duration_days: int = None) -> str:
+                           role_id: str = None, duration_days: int = None,
+                           stock: int = None, per_user_limit: int = None) -> str:
         """Añade un producto virtual a la tienda"""
         data = load_data()
-        
-        if "virtual_shop" not in data:
-            data["virtual_shop"] = {"products": {}, "purchases": {}, "settings": {"enabled": True, "tax_rate": 0.0}}
+        self.get_virtual_products()
         
         product_id = str(uuid.uuid4())
         
@@ -62,13 +268,18 @@ class VirtualShop:
             "image_url": image_url,
             "role_id": role_id,
             "duration_days": duration_days,
+            "stock": stock,
+            "per_user_limit": per_user_limit,
             "created_at": datetime.utcnow().isoformat(),
             "enabled": True,
             "purchases_count": 0
         }
         
         data["virtual_shop"]["products"][product_id] = product_data
-        save_data(data)
+        stat_paths = self._count_product(data["virtual_shop"], product_data, 1)
+        store.commit(("virtual_shop", "products", product_id), *stat_paths)
+        self.catalog_version += 1
+        catalog_index.update_virtual_product(product_id)
         
         return product_id
     
@@ -76,9 +287,12 @@ class VirtualShop:
         """Elimina un producto virtual"""
         data = load_data()
         
-        if "virtual_shop" in data and product_id in data["virtual_shop"]["products"]:
-            del data["virtual_shop"]["products"][product_id]
-            save_data(data)
+        if product_id in self.get_virtual_products():
+            product = data["virtual_shop"]["products"].pop(product_id)
+            stat_paths = self._count_product(data["virtual_shop"], product, -1)
+            store.commit(("virtual_shop", "products", product_id), *stat_paths)
+            self.catalog_version += 1
+            catalog_index.update_virtual_product(product_id)
             return True
         return False
     
@@ -86,85 +300,188 @@ class VirtualShop:
         """Edita un producto virtual"""
         data = load_data()
         
-        if "virtual_shop" in data and product_id in data["virtual_shop"]["products"]:
+        if product_id in self.get_virtual_products():
             product = data["virtual_shop"]["products"][product_id]
             
             # Actualizar campos permitidos
             allowed_fields = ['name', 'price', 'description', 'category', 'image_url', 
-                            'role_id', 'duration_days', 'enabled']
+                            'role_id', 'duration_days', 'enabled', 'stock', 'per_user_limit']
+            # Un límite negativo lo quita (stock o compras por usuario ilimitados)
+            for field in ('stock', 'per_user_limit'):
+                if kwargs.get(field) is not None and kwargs[field] < 0:
+                    kwargs[field] = None
+                    product[field] = None
             
+            # Los agregados dependen de la categoría y de si está habilitado
+            stat_paths = self._count_product(data["virtual_shop"], product, -1)
             for field, value in kwargs.items():
                 if field in allowed_fields and value is not None:
                     product[field] = value
+            stat_paths += self._count_product(data["virtual_shop"], product, 1)
             
-            save_data(data)
+            store.commit(("virtual_shop", "products", product_id), *stat_paths)
+            self.catalog_version += 1
+            catalog_index.update_virtual_product(product_id)
             return True
         return False
     
-    def purchase_virtual_product(self, user_id: str, product_id: str) -> Dict[str, Any]:
-        """Procesa la compra de un producto virtual"""
+    def purchase_virtual_product(self, user_id: str, product_id: str, guild_id: Optional[str] = None,
+                                 idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Procesa la compra de un producto virtual
+        
+        Valida, cobra, registra la compra, incrementa ``purchases_count``,
+        descuenta el ``stock`` (si lo hay), actualiza las estadísticas y
+        deja pendiente la entrega del rol (si el producto tiene uno) en un
+        único commit. Con ``idempotency_key`` un reintento de la misma
+        compra devuelve el resultado original en lugar de cobrar otra vez.
+        
+        El camino es síncrono de principio a fin (sin ``await``), por lo que
+        la comprobación de ``stock`` y ``per_user_limit`` y su descuento son
+        atómicos en el event loop: dos clics simultáneos no pueden vender la
+        misma unidad.
+        """
         data = load_data()
+        products = self.get_virtual_products()
+        
+        if idempotency_key:
+            purchase_id = self.purchase_index.find_by_key(self._get_purchases(), user_id, idempotency_key)
+            if purchase_id is not None:
+                purchase = data["virtual_shop"]["purchases"][purchase_id]
+                product = products.get(purchase["product_id"], {"name": purchase["product_name"], "price": purchase["price_paid"]})
+                return {
+                    "success": True,
+                    "duplicate": True,
+                    "message": f"Ya habías comprado **{purchase['product_name']}** con esta solicitud",
+                    "purchase_id": purchase_id,
+                    "purchase": purchase,
+                    "product": product,
+                    "new_balance": economy.get_balance(user_id)
+                }
         
         # Verificar que el producto existe
-        if "virtual_shop" not in data or product_id not in data["virtual_shop"]["products"]:
+        if product_id not in products:
             return {"success": False, "message": "Producto no encontrado"}
         
-        product = data["virtual_shop"]["products"][product_id]
+        product = products[product_id]
         
         # Verificar que el producto está habilitado
         if not product.get("enabled", True):
             return {"success": False, "message": "Producto no disponible"}
         
-        # Verificar balance del usuario
-        user_balance = economy.get_balance(user_id)
-        if user_balance < product["price"]:
-            return {
-                "success": False, 
-                "message": f"Saldo insuficiente. Necesitas {product['price']:,} GameCoins, tienes {user_balance:,}"
-            }
+        # Stock y límite por usuario: entre esta comprobación y el descuento
+        # dentro de la transacción no hay ningún await, así que en el event
+        # loop nadie más puede comprar la misma unidad en medio
+        if product.get("stock") is not None and product["stock"] <= 0:
+            return {"success": False, "message": "Producto agotado"}
+        per_user_limit = product.get("per_user_limit")
+        if per_user_limit is not None and self.purchase_index.count_product(self._get_purchases(), user_id, product_id) >= per_user_limit:
+            return {"success": False, "message": f"Ya alcanzaste el límite de {per_user_limit} compras de este producto"}
         
-        # Procesar la compra
+        # Procesar la compra: cobro, registro y estadísticas se guardan en un único commit
         try:
-            # Deducir GameCoins
-            economy.remove_coins(user_id, product["price"])
-            
-            # Registrar la compra
-            purchase_id = str(uuid.uuid4())
-            purchase_data = {
-                "id": purchase_id,
-                "user_id": user_id,
-                "product_id": product_id,
-                "product_name": product["name"],
-                "price_paid": product["price"],
-                "purchased_at": datetime.utcnow().isoformat(),
-                "active": True
-            }
-            
-            if "purchases" not in data["virtual_shop"]:
-                data["virtual_shop"]["purchases"] = {}
-            data["virtual_shop"]["purchases"][purchase_id] = purchase_data
-            
-            # Incrementar contador de compras del producto
-            data["virtual_shop"]["products"][product_id]["purchases_count"] += 1
-            
-            save_data(data)
+            with economy.transaction(user_id) as tx:
+                # Verificar balance del usuario y deducir GameCoins
+                user_balance = tx.balance(user_id)
+                if not tx.debit(user_id, product["price"], f"Compra: {product['name']}"):
+                    return {
+                        "success": False, 
+                        "message": f"Saldo insuficiente. Necesitas {product['price']:,} GameCoins, tienes {user_balance:,}"
+                    }
+                
+                # Registrar la compra
+                purchase_id = str(uuid.uuid4())
+                purchased_at = datetime.utcnow()
+                purchase_data = {
+                    "id": purchase_id,
+                    "user_id": user_id,
+                    "product_id": product_id,
+                    "product_name": product["name"],
+                    "price_paid": product["price"],
+                    "category": product.get("category", "other"),
+                    "purchased_at": purchased_at.isoformat(),
+                    "active": True,
+                    "guild_id": guild_id,
+                    "idempotency_key": idempotency_key
+                }
+                if product.get("duration_days"):
+                    purchase_data["expires_at"] = (purchased_at + timedelta(days=product["duration_days"])).isoformat()
+                if product.get("role_id"):
+                    # La entrega del rol queda pendiente hasta que se confirme en Discord
+                    purchase_data["role_id"] = product["role_id"]
+                    purchase_data["role_status"] = "pending"
+                
+                # Si el commit no llega a hacerse, la transacción deshace también
+                # el producto, la compra y los agregados, no solo el saldo
+                shop = data["virtual_shop"]
+                product_before = {field: product[field] for field in ("purchases_count", "stock") if field in product}
+                
+                def restore_product():
+                    product.pop("purchases_count", None)
+                    product.update(product_before)
+                
+                tx.on_rollback(restore_product)
+                tx.on_rollback(lambda: shop.get("purchases", {}).pop(purchase_id, None))
+                tx.on_rollback(self._sale_snapshot(shop, purchase_data))
+                
+                # Incrementar contador de compras del producto
+                product["purchases_count"] = product.get("purchases_count", 0) + 1
+                if product.get("stock") is not None:
+                    product["stock"] -= 1
+                
+                shop.setdefault("purchases", {})[purchase_id] = purchase_data
+                
+                tx.touch(("virtual_shop", "purchases", purchase_id),
+                         ("virtual_shop", "products", product_id),
+                         *self._record_sale(shop, purchase_data, 1, daily=True))
+                new_balance = tx.balance(user_id)
+            self.purchase_index.update(data["virtual_shop"]["purchases"], purchase_id)
+            if "expires_at" in purchase_data and self.expiry_listener is not None:
+                self.expiry_listener(purchase_data)
             
             return {
                 "success": True,
+                "duplicate": False,
                 "message": f"¡Compra exitosa! Has adquirido **{product['name']}**",
                 "purchase_id": purchase_id,
-                "product": product
+                "purchase": purchase_data,
+                "product": product,
+                "new_balance": new_balance
             }
             
         except Exception as e:
             return {"success": False, "message": f"Error al procesar la compra: {str(e)}"}
     
-    def get_user_purchases(self, user_id: str) -> List[Dict]:
-        """Obtiene las compras de un usuario"""
+    def pending_role_grants(self) -> List[Dict]:
+        """Compras activas cuyo rol sigue pendiente (p. ej. el bot se reinició antes de entregarlo)"""
+        return [purchase for purchase in self._get_purchases().values()
+                if isinstance(purchase, dict) and purchase.get("active", True)
+                and purchase.get("role_status") == "pending" and purchase.get("guild_id")]
+    
+    def set_role_status(self, purchase_id: str, status: str) -> bool:
+        """Actualiza el estado de entrega del rol de una compra ("pending", "granted", "failed", "revoked")"""
+        purchases = self._get_purchases()
+        purchase = purchases.get(purchase_id)
+        if purchase is None or "role_status" not in purchase:
+            return False
+        purchase["role_status"] = status
+        store.commit(("virtual_shop", "purchases", purchase_id))
+        return True
+    
+    def role_status_callback(self, purchase_id: str, done_status: str,
+                             failed_status: Optional[str] = None) -> Callable[[bool], None]:
+        """Callback para la cola de roles que guarda el resultado en la compra"""
+        def on_done(ok: bool):
+            status = done_status if ok else failed_status
+            if status is not None:
+                self.set_role_status(purchase_id, status)
+        return on_done
+    
+    def _get_purchases(self) -> Dict:
+        """Diccionario de compras, convirtiendo el formato antiguo en lista si hace falta"""
         data = load_data()
         
         if "virtual_shop" not in data or "purchases" not in data["virtual_shop"]:
-            return []
+            return {}
         
         purchases = data["virtual_shop"]["purchases"]
         
@@ -172,27 +489,74 @@ class VirtualShop:
         if isinstance(purchases, list):
             purchases_dict = {str(i): purchase for i, purchase in enumerate(purchases)}
             data["virtual_shop"]["purchases"] = purchases_dict
-            save_data(data)
+            store.commit(("virtual_shop", "purchases"))
             purchases = purchases_dict
         elif not isinstance(purchases, dict):
-            return []
-        
-        user_purchases = []
-        for purchase_id, purchase in purchases.items():
-            if isinstance(purchase, dict) and purchase.get("user_id") == user_id and purchase.get("active", True):
-                user_purchases.append(purchase)
+            return {}
+        return purchases
+    
+    def get_user_purchases(self, user_id: str) -> List[Dict]:
+        """Obtiene las compras activas de un usuario, de la más reciente a la más antigua"""
+        purchases = self._get_purchases()
+        total, _ = self.purchase_index.totals(purchases, user_id)
+        purchase_ids, _ = self.purchase_index.page(purchases, user_id, total)
+        return [purchases[purchase_id] for purchase_id in purchase_ids]
+    
+    def get_user_purchases_page(self, user_id: str, limit: int = 5,
+                                cursor: Optional[PurchaseCursor] = None) -> Dict[str, Any]:
+        """Una página de compras activas de un usuario a partir de ``cursor``.
         
-        return sorted(user_purchases, key=lambda x: x.get("purchased_at", ""), reverse=True)
+        Devuelve las compras, el cursor de la página siguiente (None si es
+        la última) y los totales del usuario.
+        """
+        purchases = self._get_purchases()
+        purchase_ids, next_cursor = self.purchase_index.page(purchases, user_id, limit, cursor)
+        total, total_spent = self.purchase_index.totals(purchases, user_id)
+        return {
+            "purchases": [purchases[purchase_id] for purchase_id in purchase_ids],
+            "next_cursor": next_cursor,
+            "total": total,
+            "total_spent": total_spent
+        }
     
     def deactivate_purchase(self, purchase_id: str) -> bool:
         """Desactiva una compra (para productos temporales)"""
-        data = load_data()
-        
-        if "virtual_shop" in data and "purchases" in data["virtual_shop"] and purchase_id in data["virtual_shop"]["purchases"]:
-            data["virtual_shop"]["purchases"][purchase_id]["active"] = False
-            save_data(data)
-            return True
-        return False
+        return bool(self.deactivate_purchases([purchase_id]))
+    
+    def deactivate_purchases(self, purchase_ids: List[str]) -> List[Dict]:
+        """Desactiva varias compras en un único commit y devuelve las que estaban activas"""
+        purchases = self._get_purchases()
+        shop = load_data().get("virtual_shop", {})
+        paths = []
+        deactivated = []
+        for purchase_id in purchase_ids:
+            purchase = purchases.get(purchase_id)
+            if purchase is None:
+                continue
+            if purchase.get("active", True):
+                paths += self._record_sale(shop, purchase, -1)
+                deactivated.append(purchase)
+            purchase["active"] = False
+            paths.append(("virtual_shop", "purchases", purchase_id))
+        if paths:
+            # Las rutas de estadísticas se repiten entre compras del mismo producto
+            store.commit(*dict.fromkeys(paths))
+            for purchase_id in purchase_ids:
+                self.purchase_index.update(purchases, purchase_id)
+        return deactivated
+    
+    def remove_purchases(self, purchase_ids: List[str]) -> List[Dict]:
+        """Elimina compras del estado en un único commit (las archivadas) y las devuelve"""
+        purchases = self._get_purchases()
+        removed = {}
+        for purchase_id in purchase_ids:
+            purchase = purchases.pop(purchase_id, None)
+            if purchase is not None:
+                self.purchase_index.forget(purchases, purchase_id, purchase)
+                removed[purchase_id] = purchase
+        if removed:
+            store.commit(*(("virtual_shop", "purchases", purchase_id) for purchase_id in removed))
+        return list(removed.values())
     
     def get_products_by_category(self) -> Dict[str, List[Dict]]:
         """Organiza productos por categoría"""
@@ -208,37 +572,136 @@ class VirtualShop:
         
         return categorized
     
-    def get_shop_stats(self) -> Dict:
-        """Obtiene estadísticas de la tienda virtual"""
+    def _built_stats(self, shop: Dict) -> Optional[Dict]:
+        stats = shop.get("stats")
+        if isinstance(stats, dict) and stats.get("version") == STATS_VERSION:
+            return stats
+        return None
+    
+    def _get_stats(self) -> Optional[Dict]:
+        """Agregados de la tienda; se calculan recorriendo todo solo la primera vez"""
         data = load_data()
         if "virtual_shop" not in data:
-            return {"total_products": 0, "total_purchases": 0, "total_revenue": 0, "enabled_products": 0}
+            return None
+        shop = data["virtual_shop"]
+        stats = self._built_stats(shop)
+        if stats is not None:
+            return stats
         
-        products = data["virtual_shop"].get("products", {})
-        purchases = data["virtual_shop"].get("purchases", {})
+        products = self.get_virtual_products()
+        purchases = self._get_purchases()
+        shop["stats"] = {
+            "version": STATS_VERSION,
+            "totals": {"products": 0, "enabled_products": 0, "active_purchases": 0, "revenue": 0},
+            "by_product": {},
+            "by_category": {},
+            "daily": {}
+        }
+        for product in products.values():
+            if isinstance(product, dict):
+                self._count_product(shop, product, 1)
+        for purchase in purchases.values():
+            if isinstance(purchase, dict):
+                self._record_sale(shop, purchase, 1 if purchase.get("active", True) else 0, daily=True)
+        store.commit(("virtual_shop", "stats"))
+        return shop["stats"]
+    
+    @staticmethod
+    def _bucket(group: Dict, key: str) -> Dict:
+        return group.setdefault(key, {"products": 0, "purchases": 0, "revenue": 0})
+    
+    def _count_product(self, shop: Dict, product: Dict, sign: int) -> List[tuple]:
+        """Suma (``sign`` = 1) o resta (-1) un producto en los agregados; devuelve las rutas a guardar"""
+        stats = self._built_stats(shop)
+        if stats is None:
+            # Aún no calculados: se harán completos en la primera consulta
+            return []
+        category = product.get("category", "other")
+        enabled = sign if product.get("enabled", True) else 0
+        stats["totals"]["products"] += sign
+        stats["totals"]["enabled_products"] += enabled
+        self._bucket(stats["by_category"], category)["products"] += enabled
+        return [("virtual_shop", "stats", "totals"), ("virtual_shop", "stats", "by_category", category)]
+    
+    def _record_sale(self, shop: Dict, purchase: Dict, sign: int, daily: bool = False) -> List[tuple]:
+        """Suma o resta una compra activa en los agregados; devuelve las rutas a guardar
         
-        # Verificar si purchases es un diccionario, si no, convertirlo
-        if isinstance(purchases, list):
-            # Si es una lista, convertir a diccionario usando índices
-            purchases = {str(i): purchase for i, purchase in enumerate(purchases)}
-        elif not isinstance(purchases, dict):
-            purchases = {}
+        Con ``daily`` también se anota en la serie diaria, que registra las
+        ventas del día aunque la compra se desactive después.
+        """
+        stats = self._built_stats(shop)
+        if stats is None:
+            return []
+        price = purchase.get("price_paid", 0)
+        product_id = purchase.get("product_id")
+        category = self._sale_category(shop, purchase)
         
-        # Verificar si products es un diccionario
-        if isinstance(products, list):
-            products = {str(i): product for i, product in enumerate(products)}
-        elif not isinstance(products, dict):
-            products = {}
+        stats["totals"]["active_purchases"] += sign
+        stats["totals"]["revenue"] += sign * price
+        for bucket in (self._bucket(stats["by_product"], product_id), self._bucket(stats["by_category"], category)):
+            bucket["purchases"] += sign
+            bucket["revenue"] += sign * price
+        paths = [("virtual_shop", "stats", "totals"),
+                 ("virtual_shop", "stats", "by_product", product_id),
+                 ("virtual_shop", "stats", "by_category", category)]
         
-        total_revenue = sum(purchase["price_paid"] for purchase in purchases.values() if isinstance(purchase, dict) and purchase.get("active", True))
-        active_purchases = len([p for p in purchases.values() if isinstance(p, dict) and p.get("active", True)])
+        if daily:
+            day = purchase.get("purchased_at", "")[:10]
+            entry = stats["daily"].setdefault(day, {"purchases": 0, "revenue": 0})
+            entry["purchases"] += 1
+            entry["revenue"] += price
+            paths.append(("virtual_shop", "stats", "daily", day))
+        return paths
+    
+    @staticmethod
+    def _sale_category(shop: Dict, purchase: Dict) -> str:
+        return purchase.get("category") or shop.get("products", {}).get(purchase.get("product_id"), {}).get("category", "other")
+    
+    def _sale_snapshot(self, shop: Dict, purchase: Dict) -> Callable[[], None]:
+        """Copia los agregados que modificaría ``_record_sale`` y devuelve la función que los restaura"""
+        stats = self._built_stats(shop)
+        if stats is None:
+            return lambda: None
+        entries = [(stats, "totals"),
+                   (stats["by_product"], purchase.get("product_id")),
+                   (stats["by_category"], self._sale_category(shop, purchase)),
+                   (stats["daily"], purchase.get("purchased_at", "")[:10])]
+        saved = [(group, key, copy.deepcopy(group.get(key))) for group, key in entries]
         
+        def restore():
+            for group, key, value in saved:
+                if value is None:
+                    group.pop(key, None)
+                else:
+                    group[key] = value
+        return restore
+    
+    def get_shop_stats(self) -> Dict:
+        """Obtiene estadísticas de la tienda virtual desde los agregados (O(1))"""
+        stats = self._get_stats()
+        if stats is None:
+            return {"total_products": 0, "total_purchases": 0, "total_revenue": 0, "enabled_products": 0}
+        
+        totals = stats["totals"]
         return {
-            "total_products": len(products),
-            "total_purchases": active_purchases,
-            "total_revenue": total_revenue,
-            "enabled_products": len([p for p in products.values() if isinstance(p, dict) and p.get("enabled", True)])
+            "total_products": totals["products"],
+            "total_purchases": totals["active_purchases"],
+            "total_revenue": totals["revenue"],
+            "enabled_products": totals["enabled_products"],
+            "by_category": stats["by_category"],
+            "by_product": stats["by_product"]
         }
+    
+    def get_daily_sales(self, days: int = 7) -> List[Tuple[str, Dict]]:
+        """Ventas de los últimos ``days`` días: ``[(fecha, {"purchases", "revenue"}), ...]``"""
+        stats = self._get_stats()
+        daily = stats["daily"] if stats else {}
+        today = datetime.utcnow().date()
+        result = []
+        for offset in range(days - 1, -1, -1):
+            day = (today - timedelta(days=offset)).isoformat()
+            result.append((day, daily.get(day, {"purchases": 0, "revenue": 0})))
+        return result
 
 # Instancia global de la tienda virtual
 virtual_shop = VirtualShop()
\ No newline at end of file